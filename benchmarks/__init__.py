@@ -0,0 +1,7 @@
+"""
+Benchmarks for the PDF engine on a synthetic, reproducible corpus.
+
+Run from the project root with::
+
+    python -m benchmarks --output results.json --baseline baseline.json
+"""
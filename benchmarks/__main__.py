@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(os.path.abspath(__file__)).parent.parent
+
+# The benchmarks run against the sources, not an installed version.
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from benchmarks import corpus, runner  # noqa: E402
+
+
+def setup_arg_parser() -> argparse.ArgumentParser:
+
+    parser = argparse.ArgumentParser(
+        "python -m benchmarks",
+        description="Times the PDF engine on a synthetic, reproducible corpus.",
+    )
+
+    parser.add_argument(
+        "--corpus-dir",
+        help="Where the corpus is generated. Defaults to a temporary directory.",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the corpus. Defaults to 0."
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Factor for the number of pages in the corpus. Defaults to 1.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Runs per case. The fastest one is reported. Defaults to 3.",
+    )
+    parser.add_argument("--output", help="Writes the results to this JSON file.")
+    parser.add_argument(
+        "--baseline", help="Compares the results against this JSON file."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help=(
+            "Relative slowdown against the baseline, which counts as a "
+            "regression. Defaults to 0.1."
+        ),
+    )
+
+    return parser
+
+
+def run():
+
+    args = setup_arg_parser().parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="addnotespace_bench_")
+
+    try:
+
+        corpus_dir = Path(args.corpus_dir or Path(tmp_dir) / "corpus")
+        print(f"Generating corpus in '{corpus_dir}'")
+        corpus_files = corpus.generate_corpus(corpus_dir, args.seed, args.scale)
+
+        results = runner.run_benchmarks(
+            corpus_files, Path(tmp_dir) / "out", repeat=args.repeat
+        )
+        results["meta"]["seed"] = args.seed
+        results["meta"]["scale"] = args.scale
+
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    runner.print_results(results)
+
+    if args.output is not None:
+        with open(args.output, "w+") as f:
+            json.dump(results, f, indent=4)
+
+    if args.baseline is not None:
+
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+        regressions = runner.compare(results, baseline, args.threshold)
+        if len(regressions) > 0:
+            print(f"\n{len(regressions)} cases are slower than the baseline.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
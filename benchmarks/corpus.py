@@ -0,0 +1,282 @@
+import zlib
+import random
+from pathlib import Path
+from typing import Callable
+
+import PyPDF2 as pypdf
+from PyPDF2.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    FloatObject,
+    NameObject,
+    NumberObject,
+    StreamObject,
+)
+
+
+# Page sizes in points
+A4 = (595.28, 841.89)
+A5 = (419.53, 595.28)
+LETTER = (612.0, 792.0)
+A3_LANDSCAPE = (1190.55, 841.89)
+SLIDE_16_9 = (453.54, 255.12)
+
+#: Maps each byte to its lowest 3 bits.
+NOISE_TABLE = bytes(i & 0b111 for i in range(256))
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua theorem proof lemma "
+    "matrix vector integral derivative function space operator"
+).split()
+
+
+class CorpusWriter:
+    """
+    Builds a PDF from raw content streams and resources.
+    All randomness comes from a seeded generator, so the same seed
+    always produces the same bytes.
+    """
+
+    def __init__(self, seed: int):
+        self.writer = pypdf.PdfWriter()
+        self.rng = random.Random(seed)
+        self.font = self.writer._add_object(
+            DictionaryObject(
+                {
+                    NameObject("/Type"): NameObject("/Font"),
+                    NameObject("/Subtype"): NameObject("/Type1"),
+                    NameObject("/BaseFont"): NameObject("/Helvetica"),
+                }
+            )
+        )
+
+    def add_image(self, width: int, height: int) -> pypdf.generic.IndirectObject:
+        """
+        Adds a Flate compressed RGB image made of noisy color blocks, which
+        compresses about as well as a photo.
+        """
+
+        block = 16
+        n_blocks = width // block + 1
+
+        rows = []
+        for y in range(height):
+
+            if y % block == 0:
+                colors = [self.rng.randbytes(3) for _ in range(n_blocks)]
+                base = b"".join(color * block for color in colors)[: width * 3]
+                base = int.from_bytes(base, "big")
+
+            # Flips the lowest bits as noise, using integer operations
+            # on the whole row for speed.
+            noise = self.rng.randbytes(width * 3).translate(NOISE_TABLE)
+            noise = int.from_bytes(noise, "big")
+            rows.append((base ^ noise).to_bytes(width * 3, "big"))
+
+        image = StreamObject()
+        image._data = zlib.compress(b"".join(rows))
+        image.update(
+            {
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Image"),
+                NameObject("/Width"): NumberObject(width),
+                NameObject("/Height"): NumberObject(height),
+                NameObject("/ColorSpace"): NameObject("/DeviceRGB"),
+                NameObject("/BitsPerComponent"): NumberObject(8),
+                NameObject("/Filter"): NameObject("/FlateDecode"),
+            }
+        )
+        return self.writer._add_object(image)
+
+    def create_text(self, n_lines: int, x: float, y: float, size: float) -> str:
+        """
+        Returns content stream operators drawing :code:`n_lines` of text.
+        """
+
+        lines = [f"BT /F1 {size} Tf {x} {y} Td {size * 1.3:.1f} TL"]
+        for _ in range(n_lines):
+            text = " ".join(self.rng.choice(WORDS) for _ in range(10))
+            lines.append(f"({text}) '")
+        lines.append("ET")
+        return "\n".join(lines)
+
+    def add_page(
+        self,
+        size: tuple[float, float],
+        content: str,
+        images: dict[str, pypdf.generic.IndirectObject] | None = None,
+        rotate: int = 0,
+        crop_inset: float = 0.0,
+    ):
+        """
+        Adds a page with the given content stream and resources.
+        """
+
+        page = pypdf.PageObject.create_blank_page(None, *size)
+
+        stream = DecodedStreamObject()
+        stream.set_data(content.encode())
+        page[NameObject("/Contents")] = self.writer._add_object(stream)
+
+        resources = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): self.font})}
+        )
+        if images:
+            resources[NameObject("/XObject")] = DictionaryObject(
+                {NameObject(name): ref for name, ref in images.items()}
+            )
+        page[NameObject("/Resources")] = resources
+
+        if rotate:
+            page[NameObject("/Rotate")] = NumberObject(rotate)
+
+        if crop_inset:
+            page[NameObject("/CropBox")] = ArrayObject(
+                [
+                    FloatObject(crop_inset),
+                    FloatObject(crop_inset),
+                    FloatObject(size[0] - crop_inset),
+                    FloatObject(size[1] - crop_inset),
+                ]
+            )
+
+        self.writer.add_page(page)
+
+    def write(self, pdf_path: str | Path):
+        with open(pdf_path, "wb") as f:
+            self.writer.write(f)
+
+
+def create_text_only(pdf_path: Path, seed: int, scale: float = 1.0):
+    """
+    Lecture notes: A4 pages full of text.
+    """
+
+    corpus = CorpusWriter(seed)
+    for _ in range(max(int(50 * scale), 1)):
+        corpus.add_page(A4, corpus.create_text(45, 56, 780, 11))
+    corpus.write(pdf_path)
+
+
+def create_image_heavy(pdf_path: Path, seed: int, scale: float = 1.0):
+    """
+    Scans or photo slides: every page has its own large image.
+    """
+
+    corpus = CorpusWriter(seed)
+    for _ in range(max(int(12 * scale), 1)):
+        image = corpus.add_image(480, 360)
+        content = "q 500 0 0 375 47 400 cm /Im0 Do Q\n"
+        content += corpus.create_text(5, 56, 350, 12)
+        corpus.add_page(A4, content, images={"/Im0": image})
+    corpus.write(pdf_path)
+
+
+def create_many_pages(pdf_path: Path, seed: int, scale: float = 1.0):
+    """
+    A long document with little content per page, where the per page
+    overhead dominates.
+    """
+
+    corpus = CorpusWriter(seed)
+    for i in range(max(int(1000 * scale), 1)):
+        content = f"BT /F1 24 Tf 72 720 Td (Page {i + 1}) Tj ET\n"
+        content += corpus.create_text(3, 72, 680, 11)
+        corpus.add_page(LETTER, content)
+    corpus.write(pdf_path)
+
+
+def create_mixed_sizes(pdf_path: Path, seed: int, scale: float = 1.0):
+    """
+    Different page sizes, rotated pages and cropped pages. This mixes pages
+    which can expand their MediaBox with pages which have to be merged.
+    """
+
+    sizes = (A4, LETTER, A3_LANDSCAPE, SLIDE_16_9, A5)
+
+    corpus = CorpusWriter(seed)
+    for i in range(max(int(40 * scale), 1)):
+        size = sizes[i % len(sizes)]
+        content = corpus.create_text(10, 30, size[1] - 40, 10)
+        corpus.add_page(
+            size,
+            content,
+            rotate=90 if i % 7 == 3 else 0,
+            crop_inset=10.0 if i % 11 == 5 else 0.0,
+        )
+    corpus.write(pdf_path)
+
+
+def create_beamer_overlays(pdf_path: Path, seed: int, scale: float = 1.0):
+    """
+    Beamer style slides: each frame is repeated once per overlay step with
+    one more bullet point. Like Beamer output, every page carries its own
+    identical copy of the logo.
+    """
+
+    n_steps = 5
+
+    corpus = CorpusWriter(seed)
+    logo_seed = corpus.rng.randrange(2**32)
+
+    for _ in range(max(int(24 * scale), 1)):
+
+        title = " ".join(corpus.rng.choice(WORDS) for _ in range(4))
+        bullets = [corpus.create_text(1, 40, 0, 12) for _ in range(n_steps)]
+
+        for step in range(1, n_steps + 1):
+
+            # The same seed gives identical image bytes for every copy.
+            logo_rng = corpus.rng
+            corpus.rng = random.Random(logo_seed)
+            logo = corpus.add_image(64, 64)
+            corpus.rng = logo_rng
+
+            content = "0.2 0.2 0.5 rg 0 225 453.54 30.12 re f 1 1 1 rg\n"
+            content += f"BT /F1 16 Tf 20 234 Td ({title}) Tj ET 0 0 0 rg\n"
+            content += "q 40 0 0 40 400 10 cm /Logo Do Q\n"
+            for i, bullet in enumerate(bullets[:step]):
+                content += f"q 1 0 0 1 0 {190 - i * 30} cm {bullet} Q\n"
+
+            corpus.add_page(SLIDE_16_9, content, images={"/Logo": logo})
+
+    corpus.write(pdf_path)
+
+
+#: All kinds of files in the corpus, mapped to the function creating them.
+CORPUS: dict[str, Callable[[Path, int, float], None]] = {
+    "text_only": create_text_only,
+    "image_heavy": create_image_heavy,
+    "many_pages": create_many_pages,
+    "mixed_sizes": create_mixed_sizes,
+    "beamer_overlays": create_beamer_overlays,
+}
+
+
+def generate_corpus(
+    folder: str | Path, seed: int = 0, scale: float = 1.0
+) -> dict[str, Path]:
+    """
+    Writes one PDF per kind in :code:`CORPUS` into :code:`folder`.
+
+    Args:
+        folder (str | Path): output directory, created if necessary
+        seed (int): seed for all generated content
+        scale (float): factor for the number of pages
+
+    Returns:
+        dict[str, Path]: the name of each kind mapped to its file
+    """
+
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    paths = dict()
+    for i, (name, create) in enumerate(CORPUS.items()):
+        pdf_path = folder / f"{name}.pdf"
+        create(pdf_path, seed + i, scale)
+        paths[name] = pdf_path
+
+    return paths
@@ -0,0 +1,221 @@
+import os
+import time
+import shutil
+import platform
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2 as pypdf
+
+from addnotespace import engine, memory, pdf, settings
+
+
+#: Margins used for all cases: 10% top, right and bot, 50% left.
+MODS = (0.1, 0.1, 0.1, 0.5)
+
+#: Modes every corpus file is timed with.
+MODES = (pdf.MODE_MERGE, pdf.MODE_AUTO)
+
+
+def time_add_margin(in_path: str, out_path: str, mode: str, repeat: int) -> dict:
+    """
+    Times :py:func:`addnotespace.pdf.add_margin` on a single file.
+    Meant to run in a fresh process, so the peak RSS belongs to this case.
+
+    Args:
+        in_path (str):
+        out_path (str):
+        mode (str): see :py:data:`addnotespace.pdf.MODES`
+        repeat (int): number of timed runs after one warm up run,
+            the fastest one is reported
+
+    Returns:
+        dict: :code:`pages`, :code:`seconds` and :code:`peak_rss`
+    """
+
+    # Warm up run, which also pays for lazy imports inside PyPDF2.
+    pdf.add_margin(in_path, out_path, *MODS, mode=mode)
+
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n_pages = pdf.add_margin(in_path, out_path, *MODS, mode=mode)
+        durations.append(time.perf_counter() - start)
+
+    return {
+        "pages": n_pages,
+        "seconds": min(durations),
+        "peak_rss": memory.peak_rss_bytes(),
+    }
+
+
+def time_bulk(in_paths: list[str], out_folder: str, jobs: str, repeat: int) -> dict:
+    """
+    Times :py:func:`addnotespace.engine.process_files` on all files.
+
+    Args:
+        in_paths (list[str]):
+        out_folder (str): where the outputs are written
+        jobs (str): number of worker processes or :code:`"auto"`
+        repeat (int): number of timed runs after one warm up run,
+            the fastest one is reported
+
+    Returns:
+        dict: :code:`pages`, :code:`seconds` and :code:`peak_rss`
+    """
+
+    out_paths = [str(Path(out_folder) / Path(p).name) for p in in_paths]
+
+    # Warm up run, see time_add_margin.
+    engine.process_files(in_paths, out_paths, *MODS, jobs=jobs)
+
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = engine.process_files(in_paths, out_paths, *MODS, jobs=jobs)
+        durations.append(time.perf_counter() - start)
+
+    peak_rss = [memory.peak_rss_bytes(), engine.get_peak_rss(results)]
+    peak_rss = [rss for rss in peak_rss if rss is not None]
+
+    return {
+        "pages": sum(r.n_pages for r in results),
+        "seconds": min(durations),
+        "peak_rss": max(peak_rss) if len(peak_rss) > 0 else None,
+    }
+
+
+def run_isolated(function, *args) -> dict:
+    """
+    Runs :code:`function` in a newly spawned process.
+    """
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(function, *args).result()
+
+
+def add_rates(case: dict, n_bytes: int) -> dict:
+    """
+    Adds pages/s and MB/s to the measurement of a case.
+    """
+
+    seconds = max(case["seconds"], 1e-9)
+    case["bytes"] = n_bytes
+    case["pages_per_s"] = case["pages"] / seconds
+    case["mb_per_s"] = n_bytes / 2**20 / seconds
+    return case
+
+
+def run_benchmarks(
+    corpus: dict[str, Path], work_folder: str | Path, repeat: int = 3
+) -> dict:
+    """
+    Times every corpus file with every mode, and the bulk path over the
+    whole corpus with one and with :code:`auto` worker processes.
+
+    Args:
+        corpus (dict[str, Path]): see
+            :py:func:`benchmarks.corpus.generate_corpus`
+        work_folder (str | Path): where outputs are written
+        repeat (int): runs per case
+
+    Returns:
+        dict: :code:`meta` information and the :code:`cases`
+    """
+
+    work_folder = Path(work_folder)
+    work_folder.mkdir(parents=True, exist_ok=True)
+
+    cases = dict()
+
+    for name, in_path in corpus.items():
+        for mode in MODES:
+            case_name = f"{name}/{mode}"
+            print(f"Running {case_name}", flush=True)
+            out_path = work_folder / f"{name}_{mode}.pdf"
+            case = run_isolated(
+                time_add_margin, str(in_path), str(out_path), mode, repeat
+            )
+            cases[case_name] = add_rates(case, os.path.getsize(in_path))
+
+    in_paths = [str(p) for p in corpus.values()]
+    n_bytes = sum(os.path.getsize(p) for p in in_paths)
+
+    for jobs in ("1", engine.AUTO_JOBS):
+        case_name = f"bulk/jobs={jobs}"
+        print(f"Running {case_name}", flush=True)
+        out_folder = work_folder / f"bulk_{jobs}"
+        out_folder.mkdir(exist_ok=True)
+        case = run_isolated(time_bulk, in_paths, str(out_folder), jobs, repeat)
+        cases[case_name] = add_rates(case, n_bytes)
+        shutil.rmtree(out_folder)
+
+    return {
+        "meta": {
+            "addnotespace": settings.VERSION,
+            "pypdf2": pypdf.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+        },
+        "cases": cases,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compares the durations of all cases which are part of both results.
+
+    Args:
+        results (dict): see :py:func:`run_benchmarks`
+        baseline (dict): results of an earlier run
+        threshold (float): relative slowdown which counts as regression,
+            f.e. :code:`0.1` for 10%
+
+    Returns:
+        list[str]: the names of the cases which regressed
+    """
+
+    regressions = []
+
+    print(f"\n{'case':32} {'baseline':>10} {'current':>10} {'change':>8}")
+
+    for name, case in results["cases"].items():
+
+        base_case = baseline["cases"].get(name)
+        if base_case is None:
+            continue
+
+        change = case["seconds"] / max(base_case["seconds"], 1e-9) - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+
+        print(
+            f"{name:32} {base_case['seconds']:9.3f}s {case['seconds']:9.3f}s "
+            f"{change:+7.1%}{flag}"
+        )
+
+    return regressions
+
+
+def print_results(results: dict):
+    """
+    Prints the cases as a table.
+    """
+
+    print(
+        f"\n{'case':32} {'pages':>6} {'seconds':>8} {'pages/s':>9} "
+        f"{'MB/s':>7} {'peak RSS':>10}"
+    )
+
+    for name, case in results["cases"].items():
+        print(
+            f"{name:32} {case['pages']:6} {case['seconds']:8.3f} "
+            f"{case['pages_per_s']:9.1f} {case['mb_per_s']:7.2f} "
+            f"{memory.format_bytes(case['peak_rss']):>10}"
+        )
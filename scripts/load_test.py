@@ -0,0 +1,224 @@
+"""
+Sends PDFs to a running :code:`addnotespace --serve` instance and reports
+throughput, latency percentiles and the status codes of the responses.
+
+The requests are sent by a fixed number of concurrent clients, each using
+its own keep-alive connection. Only the standard library is used.
+
+Usage:
+    python scripts/load_test.py file.pdf [--port 8080] [--requests 100]
+        [--concurrency 8] [--query "left=50&mode=auto"]
+
+Exits with status 1 if any request failed.
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from collections import Counter
+
+
+async def send_request(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    host: str,
+    target: str,
+    body: bytes,
+) -> tuple[int, int]:
+    """
+    Sends a single upload over an open connection and reads the response.
+
+    Args:
+        reader (asyncio.StreamReader):
+        writer (asyncio.StreamWriter):
+        host (str): value of the Host header
+        target (str): path and query of the request
+        body (bytes): the PDF
+
+    Returns:
+        tuple[int, int]: the status code and the length of the response body
+    """
+
+    writer.write(
+        (
+            f"POST {target} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            "Content-Type: application/pdf\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "\r\n"
+        ).encode()
+        + body
+    )
+    await writer.drain()
+
+    status_line = await reader.readuntil(b"\r\n")
+    status = int(status_line.split(b" ")[1])
+
+    length = 0
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+
+    await reader.readexactly(length)
+    return status, length
+
+
+async def run_client(
+    host: str,
+    port: int,
+    target: str,
+    body: bytes,
+    remaining: list[int],
+    latencies: list[float],
+    statuses: Counter,
+):
+    """
+    Sends requests until :code:`remaining` reaches 0. A new connection is
+    opened whenever the server closes the current one, f.e. after an error.
+
+    Args:
+        host (str):
+        port (int):
+        target (str): path and query of the requests
+        body (bytes): the PDF
+        remaining (list[int]): shared count of requests left to send
+        latencies (list[float]): the latency of each request in seconds
+            is appended to it
+        statuses (Counter): counts the status codes
+    """
+
+    connection = None
+
+    while remaining[0] > 0:
+        remaining[0] -= 1
+
+        if connection is None:
+            connection = await asyncio.open_connection(host, port)
+
+        reader, writer = connection
+        start = time.perf_counter()
+        try:
+            status, _ = await send_request(reader, writer, host, target, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            statuses["connection error"] += 1
+            writer.close()
+            connection = None
+            continue
+
+        latencies.append(time.perf_counter() - start)
+        statuses[status] += 1
+
+        # Errors close the connection on the server side.
+        if status != 200:
+            writer.close()
+            connection = None
+
+    if connection is not None:
+        connection[1].close()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """
+    Args:
+        values (list[float]): sorted values
+        fraction (float): between 0 and 1
+
+    Returns:
+        float: the nearest-rank percentile
+    """
+
+    index = min(int(fraction * len(values)), len(values) - 1)
+    return values[index]
+
+
+async def run_load_test(
+    host: str, port: int, target: str, body: bytes, n_requests: int, concurrency: int
+) -> bool:
+    """
+    Runs the load test and prints the results.
+
+    Returns:
+        bool: Whether all requests succeeded.
+    """
+
+    remaining = [n_requests]
+    latencies: list[float] = []
+    statuses = Counter()
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            run_client(host, port, target, body, remaining, latencies, statuses)
+            for _ in range(concurrency)
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    n_ok = statuses.get(200, 0)
+
+    print(f"requests:    {n_requests} with {concurrency} concurrent clients")
+    print(f"duration:    {elapsed:.2f} s")
+    print(f"throughput:  {n_ok / elapsed:.1f} PDFs/s")
+    print(f"upload:      {len(body) * n_ok / elapsed / 2**20:.1f} MB/s")
+
+    if len(latencies) > 0:
+        print(
+            "latency ms:  "
+            f"p50 {percentile(latencies, 0.50) * 1000:.1f}  "
+            f"p95 {percentile(latencies, 0.95) * 1000:.1f}  "
+            f"p99 {percentile(latencies, 0.99) * 1000:.1f}  "
+            f"max {latencies[-1] * 1000:.1f}"
+        )
+
+    print("status:      " + ", ".join(f"{k}: {v}" for k, v in statuses.items()))
+
+    return n_ok == n_requests
+
+
+def run():
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("pdf", help="PDF which is uploaded with every request.")
+    parser.add_argument("--host", default="127.0.0.1", help="Defaults to 127.0.0.1.")
+    parser.add_argument("--port", type=int, default=8080, help="Defaults to 8080.")
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=100,
+        help="Total number of requests. Defaults to 100.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Number of concurrent clients. Defaults to 8.",
+    )
+    parser.add_argument(
+        "--query",
+        default="",
+        help="Query string with the margin parameters, f.e. 'left=50'.",
+    )
+    args = parser.parse_args()
+
+    body = Path(args.pdf).read_bytes()
+    target = f"/margin?{args.query}" if args.query else "/margin"
+
+    is_good = asyncio.run(
+        run_load_test(
+            args.host, args.port, target, body, args.requests, args.concurrency
+        )
+    )
+
+    if not is_good:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
@@ -1,8 +1,8 @@
 import sys
-import os
+import threading
+import dataclasses
 from pathlib import Path
 from logging import getLogger
-from typing import Union
 
 from PyQt5 import uic
 from PyQt5.QtWidgets import (
@@ -19,8 +19,10 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtGui import QIntValidator, QIcon
 from PyQt5.QtCore import QSize, Qt, QThread, pyqtSignal
 
-from addnotespace import settings, pdf, updates
+from addnotespace import settings, engine, updates, validation, console, progress
 from addnotespace.defaults import NoteValues, load_defaults, dump_defaults
+from addnotespace.manifest import BulkManifest
+from addnotespace.journal import open_journal
 from addnotespace.widgets import DragLineEditBulk, DragLineEditSingle, PreviewSketch
 
 
@@ -229,19 +231,9 @@ class MainWindow(QMainWindow):
             str: The out file name.
         """
 
-        file_suffix = self.bulk_ending_line_edit.text().strip()
-        if file_suffix == "":
-            file_suffix = "_notes"
-
-        out_file_name = Path(single_path).absolute()
-        out_file_name = str(out_file_name).split(".")
-        out_file_name = ".".join(out_file_name[:-1])
-        out_file_name = f"{out_file_name}{file_suffix}.pdf"
-
-        # windows path conversion. Would work without it, but for
-        # consistency of display, it is still done
-        if sys.platform == "win32":
-            out_file_name = out_file_name.replace("/", "\\")
+        out_file_name = engine.get_single_out_name(
+            single_path, self.bulk_ending_line_edit.text()
+        )
 
         self.single_new_name_line_edit.setText(out_file_name)
         return out_file_name
@@ -356,6 +348,7 @@ class MainWindow(QMainWindow):
         """
         Checks the paths in the default values and sets them to an empty string
         if the directory does not exist.
+        See :py:func:`addnotespace.validation.validate_and_modify_defaults`.
 
         Args:
             defaults (NoteValues):
@@ -364,59 +357,13 @@ class MainWindow(QMainWindow):
             bool: True if nothing was changed. False otherwise.
         """
 
-        all_good = True
-
-        if not Path(defaults.single_file_folder).exists():
-            defaults.single_file_folder = ""
-            all_good = False
-
-        if not Path(defaults.single_file_target_folder).exists():
-            self.defaults.single_file_target_folder = ""
-            all_good = False
-
-        if not Path(defaults.bulk_folder).exists():
-            defaults.bulk_folder = ""
-            all_good = False
-
-        return all_good
-
-    def validate_margin_values(self, values: NoteValues) -> Union["InfoDialog", None]:
-        """
-        Checks whether the margin values are integers greater than 0.
-
-        Args:
-            values (NoteValues): Values to check
+        return validation.validate_and_modify_defaults(defaults)
 
-        Returns:
-            InfoDialog or None: If :code:`None` no errors where found.
-                Otherwise the InfoDialog with the error message is returned.
-        """
-
-        def is_correct(val: int) -> bool:
-            return val >= 0 and type(val) is int
-
-        is_good = is_correct(values.margin_top)
-        is_good = is_good and is_correct(values.margin_right)
-        is_good = is_good and is_correct(values.margin_bot)
-        is_good = is_good and is_correct(values.margin_left)
-
-        if is_good:
-            return
-
-        message = (
-            "Please check the validity of the margin value. "
-            "They need to be integers greater than 0."
-        )
-
-        error = InfoDialog("error", message)
-        return error
-
-    def clean_and_validate_single_run(
-        self, values: NoteValues
-    ) -> list["InfoDialog"] | None:
+    def clean_and_validate_single_run(self, values: NoteValues) -> list["InfoDialog"]:
         """
         Given a set of :code:`NoteValues` for a single run, the values
         will be cleaned inplace and potential errors will be returned.
+        See :py:func:`addnotespace.validation.clean_and_validate_single_run`.
 
         Args:
             values (NoteValues): Values to be checked.
@@ -425,43 +372,14 @@ class MainWindow(QMainWindow):
             list[InfoDialog]: A list of errors.
         """
 
-        errors = []
-
-        margin_error = self.validate_margin_values(values)
-        if margin_error is not None:
-            errors.append(margin_error)
-
-        file_name = values.single_file_folder
-        new_file_name = values.single_file_target_folder
-
-        # is curr pdf?
-        if not file_name.endswith(".pdf"):
-            message = f"The selected file '{file_name}' is not a valid PDF file."
-            errors.append(InfoDialog("error", message))
-
-        # does curr exist?
-        if not Path(file_name).exists():
-            message = f"The file '{file_name}' does not exist."
-            errors.append(InfoDialog("error", message))
-
-        # is name pdf?
-        if not new_file_name.endswith(".pdf"):
-            new_file_name += ".pdf"
-            values.single_file_target_folder = new_file_name
+        errors = validation.clean_and_validate_single_run(values)
+        return [InfoDialog("error", message) for message in errors]
 
-        # does new folder exist?
-        if not Path(new_file_name).parent.exists():
-            message = "The folder for the new file does not exist."
-            errors.append(InfoDialog("error", message))
-
-        return errors
-
-    def clean_and_validate_bulk_run(
-        self, values: NoteValues
-    ) -> list["InfoDialog"] | None:
+    def clean_and_validate_bulk_run(self, values: NoteValues) -> list["InfoDialog"]:
         """
         Given a set of :code:`NoteValues` for a bulk run, the values
         will be cleaned inplace and potential errors will be returned.
+        See :py:func:`addnotespace.validation.clean_and_validate_bulk_run`.
 
         Args:
             values (NoteValues): Values to be checked.
@@ -470,28 +388,8 @@ class MainWindow(QMainWindow):
             list[InfoDialog]: A list of errors.
         """
 
-        errors = []
-
-        margin_error = self.validate_margin_values(values)
-        if margin_error is not None:
-            errors.append(margin_error)
-
-        folder = values.bulk_folder
-        ending = values.bulk_name_ending
-
-        # does folder exist?
-        if not Path(folder).exists():
-            message = f"The bulk folder '{folder}' does not exist."
-            errors.append(InfoDialog("error", message))
-
-        # is ending not empty?
-        ending = ending.strip()
-        values.bulk_name_ending = ending
-        if ending == "":
-            message = f"The bulk file ending cannot be empty."
-            errors.append(InfoDialog("error", message))
-
-        return errors
+        errors = validation.clean_and_validate_bulk_run(values)
+        return [InfoDialog("error", message) for message in errors]
 
     ##########################
     ### DEFAULTS - NOTESET ###
@@ -557,7 +455,9 @@ class MainWindow(QMainWindow):
 
         sketch_ratio = self.preview_ratio_button_group.checkedButton().text()
 
-        note_values = NoteValues(
+        # Settings which have no field in the GUI are taken from the defaults.
+        note_values = dataclasses.replace(
+            self.defaults,
             margin_top=int(top if top != "" else 0),
             margin_right=int(right if right != "" else 0),
             margin_bot=int(bot if bot != "" else 0),
@@ -664,21 +564,63 @@ def run_bulk(values: NoteValues, is_gui: bool = True):
     """
 
     bulk_folder = Path(values.bulk_folder).absolute()
-    file_suffix = values.bulk_name_ending
 
-    file_list = []
-    out_files = []
-    for file in os.listdir(bulk_folder):
+    file_list, out_files = engine.collect_bulk_files(values)
+
+    engine_kwargs = engine.get_engine_kwargs(values)
+
+    if values.skip_up_to_date and len(file_list) > 0:
+
+        manifest = BulkManifest.for_folder(bulk_folder)
+        engine_kwargs["manifest"] = manifest
+
+        n_files = len(file_list)
+        file_list, out_files = engine.filter_up_to_date(
+            file_list, out_files, values, manifest
+        )
+        n_skipped = n_files - len(file_list)
+
+        msg_string = f"Skipped {n_skipped} PDFs which are up to date."
+        logger.info(msg_string)
+
+        if len(file_list) == 0:
+            msg_string = f"All PDFs in '{bulk_folder}' are up to date."
+            if is_gui:
+                InfoDialog("info", msg_string).exec_()
+            else:
+                print(msg_string)
+            return
+
+        if not is_gui:
+            print(msg_string)
+
+    journal = None
+    if len(file_list) > 0:
+        journal = open_journal(bulk_folder, values.resume)
+        engine_kwargs["journal"] = journal
 
-        if not file.endswith(".pdf"):
-            continue
+    if journal is not None and values.resume:
 
-        out_file_name = file.split(".")
-        out_file_name = ".".join(out_file_name[:-1])
-        out_file_name = f"{out_file_name}{file_suffix}.pdf"
+        n_files = len(file_list)
+        file_list, out_files = engine.filter_finished(
+            file_list, out_files, values, journal
+        )
+        n_skipped = n_files - len(file_list)
+
+        msg_string = f"Skipped {n_skipped} PDFs which were already finished."
+        logger.info(msg_string)
+
+        if len(file_list) == 0:
+            journal.close()
+            msg_string = f"All PDFs in '{bulk_folder}' were already finished."
+            if is_gui:
+                InfoDialog("info", msg_string).exec_()
+            else:
+                print(msg_string)
+            return
 
-        file_list.append(str(bulk_folder / file))
-        out_files.append(str(bulk_folder / out_file_name))
+        if not is_gui:
+            print(msg_string)
 
     if len(file_list) == 0:
 
@@ -699,6 +641,7 @@ def run_bulk(values: NoteValues, is_gui: bool = True):
         int(values.margin_bot) / 100,
         int(values.margin_left) / 100,
         is_gui=is_gui,
+        engine_kwargs=engine_kwargs,
     )
 
     progress_dialogue.exec_()
@@ -729,6 +672,7 @@ def run_single(values: NoteValues, is_gui: bool = True):
         int(values.margin_bot) / 100,
         int(values.margin_left) / 100,
         is_gui=is_gui,
+        engine_kwargs=engine.get_engine_kwargs(values),
     )
 
     progress_dialogue.exec_()
@@ -808,6 +752,7 @@ class MarginProgressDialog(QDialog):
     """
 
     finish_button: QPushButton  #:
+    cancel_button: QPushButton  #:
     progress_bar: QProgressBar  #:
     progress_text: QLabel  #:
 
@@ -822,6 +767,7 @@ class MarginProgressDialog(QDialog):
         bot_mod: float,
         left_mod: float,
         is_gui: bool = True,
+        engine_kwargs: dict | None = None,
         *args,
         **kwargs,
     ):
@@ -839,22 +785,36 @@ class MarginProgressDialog(QDialog):
             left_mod (float): left mod as fraction
             is_gui (bool): If True the progress will be displayed
                 as a GUI, otherwise only print statements will be made.
+            engine_kwargs (dict | None): Additional keyword arguments for
+                :py:func:`addnotespace.engine.process_files`.
         """
         super(MarginProgressDialog, self).__init__(*args, **kwargs)
 
         self.is_gui = is_gui
 
+        #: Whether the thread stopped, so the dialog can be closed.
+        self.is_finished = False
+
         self.setWindowFlag(Qt.WindowType.FramelessWindowHint)
         uic.loadUi(settings.PROGRESS_DIALOGUE_UI_PATH, self)
 
         self.finish_button.pressed.connect(self.close)
+        self.cancel_button.pressed.connect(self.cancel)
 
         self.margin_thread = AddMarginThread(
-            in_paths, out_paths, top_mod, right_mod, bot_mod, left_mod
+            in_paths,
+            out_paths,
+            top_mod,
+            right_mod,
+            bot_mod,
+            left_mod,
+            engine_kwargs=engine_kwargs,
         )
 
         self.margin_thread.progress_signal.connect(self.update_progress_bar)
         self.margin_thread.progress_text_signal.connect(self.update_working_on_text)
+        self.margin_thread.cancelled_signal.connect(self.finish)
+        self.margin_thread.failed_signal.connect(self.fail)
 
         if is_gui:
             self.margin_thread.start()
@@ -886,14 +846,57 @@ class MarginProgressDialog(QDialog):
         self.progress_text.setText(display_text)
 
         if not self.is_gui:
-            terminal_size = os.get_terminal_size()
-            sys.stdout.write(f"{display_text.ljust(terminal_size.columns, ' ')}\r")
+            console.print_progress(display_text)
+
+    def cancel(self):
+        """
+        Asks the thread to stop. It stops within one page, and the file it
+        was working on leaves no output.
+        """
+
+        self.cancel_button.setText("Cancelling...")
+        self.cancel_button.setEnabled(False)
+        self.margin_thread.cancel()
+
+    def reject(self):
+        """
+        Cancels the thread instead of closing the dialog, f.e. when Escape
+        is pressed, while it is still working. Otherwise the dialog closes.
+        """
+
+        if not self.is_finished and self.margin_thread.isRunning():
+            self.cancel()
+            return
+
+        super(MarginProgressDialog, self).reject()
+
+    def fail(self, error_text: str):
+        """
+        Shows the error which stopped the thread and enables the Close
+        button.
+
+        Args:
+            error_text (str):
+        """
+
+        self.finish()
+
+        msg_string = f"Stopped because of an error:\n{error_text}"
+        if self.is_gui:
+            InfoDialog("error", msg_string).exec_()
+        else:
+            print(msg_string)
 
     def finish(self):
         """
         Enables Close button and finishes processes.
         """
 
+        self.is_finished = True
+
+        if self.margin_thread.cancel_event.is_set():
+            self.cancel_button.setText("Cancelled")
+        self.cancel_button.setEnabled(False)
         self.finish_button.setText("Close")
         self.finish_button.setEnabled(True)
 
@@ -941,6 +944,13 @@ class AddMarginThread(QThread):
     #: Sends signal of which PDF it is working on
     progress_text_signal = pyqtSignal(str)
 
+    #: Sent instead of the final progress if the run was cancelled
+    cancelled_signal = pyqtSignal()
+
+    #: Sent with the error text instead of the final progress if the run
+    #: stopped because of an error
+    failed_signal = pyqtSignal(str)
+
     def __init__(
         self,
         in_paths: list[str],
@@ -949,6 +959,7 @@ class AddMarginThread(QThread):
         right_mod: float,
         bot_mod: float,
         left_mod: float,
+        engine_kwargs: dict | None = None,
         *args,
         **kwargs,
     ):
@@ -962,6 +973,8 @@ class AddMarginThread(QThread):
             right_mod (float): right mod as fraction
             bot_mod (float): bot mod as fraction
             left_mod (float): left mod as fraction
+            engine_kwargs (dict | None): Additional keyword arguments for
+                :py:func:`addnotespace.engine.process_files`.
         """
         super(AddMarginThread, self).__init__(*args, **kwargs)
 
@@ -971,34 +984,110 @@ class AddMarginThread(QThread):
         self.right_mod = right_mod
         self.bot_mod = bot_mod
         self.left_mod = left_mod
+        self.engine_kwargs = engine_kwargs or dict()
+
+        #: Set by :py:meth:`cancel`
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """
+        Stops the run at the next page. Can be called from any thread.
+        """
+        self.cancel_event.set()
 
     def run(self):
         """
         Runs adding space on multiple pdf files.
 
         Sends signals with :code:`progress_signal` and
-        :code:`progress_text_signal`.
-        The :code:`progress_signal` will send -1 if the process is finished.
+        :code:`progress_text_signal`. The progress includes the pages of
+        the files being worked on, but is only sent when its percentage
+        changes. The :code:`progress_signal` will send -1 if the process is
+        finished. :code:`cancelled_signal` is sent instead if it was
+        cancelled, and :code:`failed_signal` if a file raised an error.
         """
 
-        for i in range(len(self.in_paths)):
+        n_files = len(self.in_paths)
+        n_finished = 0
+        last_percentage = 0
+
+        # Processed fraction of each file which was started but not finished
+        page_fractions: dict[int, float] = dict()
 
+        def emit_percentage():
+            nonlocal last_percentage
+            done = n_finished + sum(page_fractions.values())
+            percentage = int(done / n_files * 100)
+            if percentage != last_percentage:
+                last_percentage = percentage
+                self.progress_signal.emit(percentage)
+
+        def on_start(i: int):
+            page_fractions[i] = 0.0
             display_path = self.in_paths[i].split("/")[-1]
-            display_path = f"Working on: {display_path} ({i+1}/{len(self.in_paths)})"
+            display_path = f"Working on: {display_path} ({i+1}/{n_files})"
+            self.progress_text_signal.emit(display_path)
 
+        def on_page(i: int, n_done: int, n_pages: int):
+            # Reports of workers can arrive after their file finished.
+            if i not in page_fractions:
+                return
+            page_fractions[i] = n_done / n_pages
+            display_path = self.in_paths[i].split("/")[-1]
+            display_path = (
+                f"Working on: {display_path} ({i+1}/{n_files}), "
+                f"page {n_done}/{n_pages}"
+            )
+            self.progress_text_signal.emit(display_path)
+            emit_percentage()
+
+        def on_finish(result: engine.FileResult, n_done: int):
+            nonlocal n_finished
+            n_finished = n_done
+            page_fractions.pop(result.index, None)
+
+            display_path = self.in_paths[result.index].split("/")[-1]
+            display_path = f"Finished: {display_path} ({n_finished}/{n_files})"
             self.progress_text_signal.emit(display_path)
+            emit_percentage()
+
+        # The journal was opened for this thread, so it is closed here.
+        journal = self.engine_kwargs.get("journal")
 
-            pdf.add_margin(
-                self.in_paths[i],
-                self.out_paths[i],
+        try:
+            results = engine.process_files(
+                self.in_paths,
+                self.out_paths,
                 self.top_mod,
                 self.right_mod,
                 self.bot_mod,
                 self.left_mod,
+                on_start=on_start,
+                on_finish=on_finish,
+                on_page=on_page,
+                cancel_event=self.cancel_event,
+                **self.engine_kwargs,
             )
+        except progress.Cancelled:
+            msg_string = f"Cancelled after finishing {n_finished} of {n_files} PDFs."
+            logger.info(msg_string)
+            self.progress_text_signal.emit(msg_string)
+            self.cancelled_signal.emit()
+            return
+        except Exception as e:
+            logger.exception(f"Stopped after finishing {n_finished} of {n_files} PDFs.")
+            self.progress_text_signal.emit(
+                f"Stopped after finishing {n_finished} of {n_files} PDFs."
+            )
+            self.failed_signal.emit(str(e))
+            return
+        finally:
+            if journal is not None:
+                journal.close()
+
+        summary = engine.get_summary(results, self.engine_kwargs.get("cache"))
 
-            percentage = (i + 1) / len(self.in_paths) * 100
-            self.progress_signal.emit(int(percentage))
+        logger.info(f"Finished {n_files} PDFs ({summary})")
 
         self.progress_signal.emit(-1)
-        self.progress_text_signal.emit(f"Finished all {len(self.in_paths)} PDFs")
+        self.progress_text_signal.emit(f"Finished all {n_files} PDFs ({summary})")
@@ -0,0 +1,287 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+from logging import getLogger
+
+from addnotespace import settings, streams
+
+
+logger = getLogger(__name__)
+
+#: Increase this whenever the output of the engine changes for the same
+#: input, so old cache entries are not used anymore.
+CACHE_FORMAT_VERSION = 1
+
+#: Size of the chunks in which input files are read for hashing.
+HASH_CHUNK_SIZE = 2**20
+
+CACHE_FILE_SUFFIX = ".pdf"
+
+#: Once the cache grows above its limit, entries are evicted until it is
+#: this fraction of the limit, so the directory is not listed again for
+#: every following entry.
+EVICTION_TARGET = 0.9
+
+
+def hash_file(file_path: str | Path) -> str:
+    """
+    Args:
+        file_path (str | Path):
+
+    Returns:
+        str: hex digest of the sha256 hash of the file content
+    """
+
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+class ResultCache:
+    """
+    An on-disk cache for processed PDFs.
+
+    Entries are keyed by the hash of the input content, the margins, the
+    options for :py:func:`addnotespace.pdf.add_margin` and the version of
+    the engine. The last access of an entry is tracked via its modification
+    time, which is used to evict the least recently used entries once the
+    cache grows above :code:`max_bytes`.
+
+    Instances only hold plain attributes, so they can be sent to
+    worker processes. Workers only fetch and store entries. The process
+    running the bulk run passes the size of every stored entry to
+    :py:meth:`add_stored`, which keeps the running size of the cache and
+    evicts in that process, so the statistics are counted in one place.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path = settings.CACHE_DIR_PATH,
+        max_bytes: int = 1024 * 2**20,
+        use_hardlinks: bool = False,
+    ):
+        """
+        Args:
+            cache_dir (str | Path): directory of the entries
+            max_bytes (int): size limit of all entries in bytes
+            use_hardlinks (bool): If True, hits are hardlinked to the output
+                instead of copied. Changes to the output in place then also
+                change the entry.
+        """
+
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.use_hardlinks = use_hardlinks
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        #: Size of all entries in bytes, see :py:meth:`add_stored`.
+        self.total_bytes = self.get_size()
+
+    def create_key(
+        self,
+        pdf_path: str | Path,
+        mods: tuple[float, float, float, float],
+        add_margin_kwargs: dict | None = None,
+        input_hash: str | None = None,
+    ) -> str:
+        """
+        Creates the key for processing :code:`pdf_path` with the given
+        margins and options.
+
+        Args:
+            pdf_path (str | Path): the input file
+            mods (tuple[float, float, float, float]): top, right, bot and left
+                margin fractions
+            add_margin_kwargs (dict | None): options for
+                :py:func:`addnotespace.pdf.add_margin`
+            input_hash (str | None): :py:func:`hash_file` of the input, if
+                it is known already
+
+        Returns:
+            str:
+        """
+
+        if input_hash is None:
+            input_hash = hash_file(pdf_path)
+
+        description = {
+            "input": input_hash,
+            "mods": list(mods),
+            "options": add_margin_kwargs or dict(),
+            "engine": settings.VERSION,
+            "format": CACHE_FORMAT_VERSION,
+        }
+        description = json.dumps(description, sort_keys=True).encode()
+
+        return hashlib.sha256(description).hexdigest()
+
+    def get_entry_path(self, key: str) -> Path:
+        """
+        Args:
+            key (str):
+
+        Returns:
+            Path: path of the entry for the key
+        """
+        return self.cache_dir / f"{key}{CACHE_FILE_SUFFIX}"
+
+    def fetch(self, key: str, pdf_out_path: str | Path) -> bool:
+        """
+        Places the cached result for :code:`key` at :code:`pdf_out_path`.
+
+        Args:
+            key (str):
+            pdf_out_path (str | Path):
+
+        Returns:
+            bool: Whether there was an entry for the key.
+        """
+
+        entry_path = self.get_entry_path(key)
+
+        try:
+            # marks the entry as recently used
+            os.utime(entry_path)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+
+        self._place(entry_path, Path(pdf_out_path))
+        self.hits += 1
+        return True
+
+    def store(self, key: str, pdf_out_path: str | Path):
+        """
+        Adds the processed file :code:`pdf_out_path` as the entry for
+        :code:`key`. Old entries are not evicted here, see
+        :py:meth:`add_stored`.
+
+        Args:
+            key (str):
+            pdf_out_path (str | Path):
+        """
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Written to a temporary file first, so other processes never
+        # see half written entries.
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+
+        try:
+            shutil.copyfile(pdf_out_path, tmp_path)
+            os.replace(tmp_path, self.get_entry_path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def add_stored(self, n_bytes: int):
+        """
+        Adds an entry which was stored by :py:meth:`store`, possibly in
+        another process, to the running size of the cache, and evicts old
+        entries once it grows above :code:`max_bytes`.
+
+        The directory is only listed when evicting. Entries which replaced
+        an existing one or were removed by other processes make the running
+        size too large, which is corrected by the next eviction.
+
+        Args:
+            n_bytes (int): size of the stored entry
+        """
+
+        self.total_bytes += n_bytes
+
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self, target_bytes: int | None = None) -> int:
+        """
+        Removes the least recently used entries until the cache is at most
+        :code:`target_bytes` large.
+
+        Args:
+            target_bytes (int | None): Defaults to :py:data:`EVICTION_TARGET`
+                of :code:`max_bytes`.
+
+        Returns:
+            int: the number of removed entries
+        """
+
+        if target_bytes is None:
+            target_bytes = int(self.max_bytes * EVICTION_TARGET)
+
+        entries = []
+        total_size = 0
+
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(CACHE_FILE_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # evicted by another process in the meantime
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+
+        entries.sort()
+
+        n_evicted = 0
+        for _, size, path in entries:
+
+            if total_size <= target_bytes:
+                break
+
+            try:
+                os.remove(path)
+                n_evicted += 1
+            except FileNotFoundError:
+                pass
+
+            total_size -= size
+
+        self.evictions += n_evicted
+        self.total_bytes = total_size
+
+        return n_evicted
+
+    def get_size(self) -> int:
+        """
+        Returns:
+            int: the size of all entries in bytes
+        """
+
+        if not self.cache_dir.exists():
+            return 0
+
+        return sum(
+            entry.stat().st_size
+            for entry in os.scandir(self.cache_dir)
+            if entry.name.endswith(CACHE_FILE_SUFFIX)
+        )
+
+    def _place(self, entry_path: Path, pdf_out_path: Path):
+        """
+        Copies or hardlinks the entry to the output path.
+        """
+
+        with streams.atomic_path(pdf_out_path) as tmp_path:
+
+            if self.use_hardlinks:
+                try:
+                    os.link(entry_path, tmp_path)
+                    return
+                except OSError as e:
+                    # f.e. if the cache is on another file system
+                    logger.info(f"Could not hardlink cache entry, copying instead: {e}")
+
+            shutil.copyfile(entry_path, tmp_path)
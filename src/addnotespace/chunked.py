@@ -0,0 +1,131 @@
+from logging import getLogger
+from typing import BinaryIO
+
+import PyPDF2 as pypdf
+
+from addnotespace import optimize, trace
+
+
+logger = getLogger(__name__)
+
+#: Number of pages which are added before their objects are written and
+#: dropped from memory.
+CHUNK_PAGES = 16
+
+
+class ChunkedWriter:
+    """
+    Writes a document while its pages are still being added.
+
+    :code:`PdfWriter.write` can only write once every page was added, so
+    all pages and everything they use stay in memory until the end. Here,
+    :py:meth:`flush` writes the objects added since the last call right
+    away and replaces them in the writer by small placeholders, which
+    keep their object numbers. Pages added later can still reference them,
+    f.e. a font shared by all pages is written with the first page and
+    only referenced afterwards.
+
+    Only the page tree, the catalog and the info dictionary, which change
+    until the last page was added, are written by :py:meth:`close`,
+    together with the cross reference table. What stays in memory is one
+    placeholder and one offset per written object.
+    """
+
+    def __init__(self, fo: BinaryIO, compress: bool = False):
+        """
+        Args:
+            fo (BinaryIO): the output, positioned at 0
+            compress (bool): Whether to compress streams which are stored
+                uncompressed, see :py:func:`addnotespace.optimize.compress_streams`.
+        """
+
+        self.fo = fo
+        self.compress = compress
+
+        self.writer = pypdf.PdfWriter()
+
+        #: Maps the number of each written object to its position in the output.
+        self.offsets: dict[int, int] = dict()
+
+        #: Number of objects of the writer which were handled by :py:meth:`flush`.
+        self.n_flushed = 0
+
+        # The header takes the version of the source, which is only known
+        # once the first page was added.
+        self.is_header_written = False
+
+    def add_page(self, page: pypdf.PageObject):
+        """
+        Copies the page and everything it references into the writer.
+
+        Args:
+            page (pypdf.PageObject):
+        """
+
+        new_page = self.writer.add_page(page)
+
+        # Streams stored directly in the page, like the content of merged
+        # pages, have to become indirect objects.
+        self.writer._sweep_indirect_references(new_page)
+
+    def flush(self):
+        """
+        Writes all objects added since the last call, except for the ones
+        which still change, and drops them from memory.
+        """
+
+        writer = self.writer
+
+        if not self.is_header_written:
+            self.fo.write(optimize.get_header(writer, (1, 0)))
+            self.is_header_written = True
+
+        kept = self._get_kept()
+        new = set(range(self.n_flushed + 1, len(writer._objects) + 1)) - kept
+
+        if self.compress:
+            with trace.span("compress_streams"):
+                optimize.compress_streams(writer, new)
+
+        with trace.span("write_chunk"):
+            for idnum in sorted(new):
+                obj = writer._objects[idnum - 1]
+                if obj is None:
+                    continue
+
+                self.offsets[idnum] = self.fo.tell()
+                optimize.write_object(self.fo, idnum, obj)
+
+                placeholder = pypdf.generic.NullObject()
+                placeholder.indirect_reference = pypdf.generic.IndirectObject(
+                    idnum, 0, writer
+                )
+                writer._objects[idnum - 1] = placeholder
+
+        self.n_flushed = len(writer._objects)
+
+    def close(self):
+        """
+        Writes the remaining objects, the cross reference table and the
+        trailer. No pages can be added afterwards.
+        """
+
+        writer = self.writer
+
+        writer._sweep_indirect_references(writer._root)
+        self.flush()
+
+        for idnum in sorted(self._get_kept()):
+            self.offsets[idnum] = self.fo.tell()
+            optimize.write_object(self.fo, idnum, writer._objects[idnum - 1])
+
+        optimize.write_xref_table(writer, self.offsets, self.fo)
+
+    def _get_kept(self) -> set[int]:
+        """
+        Returns the numbers of the objects which change until the last page
+        was added.
+        """
+
+        writer = self.writer
+        return {writer._pages.idnum, writer._root.idnum, writer._info.idnum}
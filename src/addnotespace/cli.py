@@ -1,7 +1,21 @@
+import sys
+import logging
 import argparse
 from logging import getLogger
 from pathlib import Path
-from addnotespace.app_windows import MainWindow, run_single, run_bulk
+from contextlib import redirect_stdout
+from addnotespace import (
+    settings,
+    modes,
+    watch,
+    console,
+    engine,
+    validation,
+    trace,
+    metrics,
+    streams,
+)
+from addnotespace.defaults import NoteValues, load_defaults
 
 
 logger = getLogger(__name__)
@@ -20,7 +34,14 @@ def setup_arg_parser() -> argparse.ArgumentParser:
         "addnotespace", description="Add white space to your pdf files."
     )
 
-    parser.add_argument("-f", "--file", help="Specify a file to add margins to.")
+    parser.add_argument(
+        "-f",
+        "--file",
+        help=(
+            "Specify a file to add margins to. '-' reads it from stdin and "
+            "writes the result to stdout, unless an output is given."
+        ),
+    )
 
     parser.add_argument(
         "-d",
@@ -42,7 +63,9 @@ def setup_arg_parser() -> argparse.ArgumentParser:
     )
 
     parser.add_argument(
-        "-o", "--output", help="The output file name for a single file run."
+        "-o",
+        "--output",
+        help="The output file name for a single file run. '-' writes to stdout.",
     )
 
     parser.add_argument(
@@ -77,6 +100,317 @@ def setup_arg_parser() -> argparse.ArgumentParser:
         help="Percentage of how much whitespace to add to the left of the pdf.",
     )
 
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help=(
+            "Number of worker processes for a bulk run. "
+            "Use 'auto' for one process per cpu core."
+        ),
+    )
+
+    parser.add_argument(
+        "-lm",
+        "--low-memory",
+        action="store_true",
+        default=None,
+        help=(
+            "Stores true. Writes rewritten documents in chunks of pages, "
+            "so the memory does not grow with the page count, and "
+            "compresses the content of merged pages right away."
+        ),
+    )
+
+    parser.add_argument(
+        "-m",
+        "--mode",
+        choices=modes.MODES,
+        help=(
+            "How the whitespace is added. 'mediabox' only grows the page "
+            "boundaries, 'merge' places the page onto a new blank page and "
+            "'auto' uses 'mediabox' wherever a page allows it."
+        ),
+    )
+
+    parser.add_argument(
+        "-om",
+        "--output-mode",
+        choices=modes.OUTPUT_MODES,
+        help=(
+            "'incremental' keeps the original bytes and only appends the "
+            "changed pages. Falls back to 'rewrite' if that is not possible."
+        ),
+    )
+
+    parser.add_argument(
+        "-op",
+        "--optimize",
+        choices=modes.OPTIMIZE_LEVELS,
+        help=(
+            "'compress' compresses uncompressed streams and drops unused "
+            "objects. 'max' also packs objects into compressed object "
+            "streams. Defaults to 'none'."
+        ),
+    )
+
+    parser.add_argument(
+        "-ln",
+        "--linearize",
+        action="store_true",
+        default=None,
+        help=(
+            "Stores true. Writes linearized PDFs, which viewers can show "
+            "before the whole file was downloaded. Always rewrites the "
+            "files. Needs pikepdf."
+        ),
+    )
+
+    parser.add_argument(
+        "-ip",
+        "--in-place",
+        action="store_true",
+        default=None,
+        help=(
+            "Stores true. Modifies the input files inplace. "
+            "Requires the 'incremental' output mode."
+        ),
+    )
+
+    parser.add_argument(
+        "-dd",
+        "--deduplicate",
+        action="store_true",
+        default=None,
+        help=(
+            "Stores true. Writes objects with identical content, "
+            "like repeated fonts and images, only once."
+        ),
+    )
+
+    parser.add_argument(
+        "-c",
+        "--cache",
+        action="store_true",
+        default=None,
+        help=(
+            "Stores true. Reuses results of previous runs with the same "
+            "input content and settings."
+        ),
+    )
+
+    parser.add_argument(
+        "-cs",
+        "--cache-size",
+        action="store",
+        type=int,
+        help="Size limit of the cache in MB.",
+    )
+
+    parser.add_argument(
+        "-ch",
+        "--cache-hardlink",
+        action="store_true",
+        default=None,
+        help=(
+            "Stores true. Hardlinks cached results instead of copying them. "
+            "Editing such an output inplace also changes the cache entry."
+        ),
+    )
+
+    parser.add_argument(
+        "-u",
+        "--skip-up-to-date",
+        action="store_true",
+        default=None,
+        help=(
+            "Stores true. Only processes files of a bulk run which are new "
+            "or changed since the last run with the same settings."
+        ),
+    )
+
+    parser.add_argument(
+        "-rs",
+        "--resume",
+        action="store_true",
+        default=None,
+        help=(
+            "Stores true. Continues a bulk run which was interrupted, f.e. "
+            "by a crash. Only files which that run did not finish are "
+            "processed."
+        ),
+    )
+
+    parser.add_argument(
+        "-rc",
+        "--recursive",
+        action="store_true",
+        default=None,
+        help="Stores true. Also processes PDFs in subdirectories of a bulk run.",
+    )
+
+    parser.add_argument(
+        "-in",
+        "--include",
+        action="append",
+        help=(
+            "Glob pattern for paths relative to the bulk directory, "
+            "f.e. 'lectures/*'. If given, only matching files are processed. "
+            "Can be given multiple times."
+        ),
+    )
+
+    parser.add_argument(
+        "-ex",
+        "--exclude",
+        action="append",
+        help=(
+            "Glob pattern for paths relative to the bulk directory. Matching "
+            "files and directories are skipped. Can be given multiple times."
+        ),
+    )
+
+    parser.add_argument(
+        "-ww",
+        "--walk-workers",
+        action="store",
+        type=int,
+        help=(
+            "Number of threads walking subdirectories in parallel during a "
+            "recursive bulk run. Defaults to 1, which keeps a sorted order."
+        ),
+    )
+
+    parser.add_argument(
+        "-w",
+        "--watch",
+        help=(
+            "A directory to watch. Every PDF which appears in it gets "
+            "whitespace added, until the program is stopped."
+        ),
+    )
+
+    parser.add_argument(
+        "-ws",
+        "--watch-settle",
+        action="store",
+        type=float,
+        default=2.0,
+        help=(
+            "Seconds a file in the watched directory must stay unchanged "
+            "before it is processed. Defaults to 2."
+        ),
+    )
+
+    parser.add_argument(
+        "-sv",
+        "--serve",
+        action="store",
+        type=int,
+        metavar="PORT",
+        help=(
+            "Serves an HTTP API on this port until the program is stopped. "
+            "POST a PDF to /margin?top=&right=&bot=&left=&mode= to get it back "
+            "with whitespace added. GET /health reports the state."
+        ),
+    )
+
+    parser.add_argument(
+        "-sh",
+        "--serve-host",
+        action="store",
+        default="127.0.0.1",
+        help="Address the HTTP API listens on. Defaults to 127.0.0.1.",
+    )
+
+    parser.add_argument(
+        "-mu",
+        "--max-upload",
+        action="store",
+        type=int,
+        default=100,
+        help="Largest PDF the HTTP API accepts in MB. Defaults to 100.",
+    )
+
+    parser.add_argument(
+        "-mc",
+        "--max-concurrent",
+        action="store",
+        type=int,
+        help=(
+            "Requests the HTTP API processes or queues at once. Further "
+            "requests are answered with 503. Defaults to 4 per job."
+        ),
+    )
+
+    parser.add_argument(
+        "-pm",
+        "--profile-memory",
+        action="store_true",
+        default=None,
+        help=(
+            "Stores true. Records the peak memory of every file and prints "
+            "the files which needed the most. Slows down the processing."
+        ),
+    )
+
+    parser.add_argument(
+        "-mt",
+        "--memory-threshold",
+        action="store",
+        type=int,
+        help=(
+            "Files whose peak RSS is above this number of MB are flagged in "
+            "the memory report. Defaults to 512."
+        ),
+    )
+
+    parser.add_argument(
+        "-mr",
+        "--memory-report-size",
+        action="store",
+        type=int,
+        help="Number of files listed in the memory report. Defaults to 10.",
+    )
+
+    parser.add_argument(
+        "-tr",
+        "--trace",
+        help=(
+            "Records how long each file and each processing stage took, "
+            "writes them as a Chrome trace to this JSON file and prints a "
+            "summary."
+        ),
+    )
+
+    parser.add_argument(
+        "-ev",
+        "--events",
+        choices=console.EVENT_FORMATS,
+        default=console.EVENTS_TEXT,
+        help=(
+            "'text' (default) prints the progress for humans. 'jsonl' writes "
+            "one JSON object per started, finished, skipped and failed file "
+            "to stdout, and everything else to stderr."
+        ),
+    )
+
+    parser.add_argument(
+        "-mf",
+        "--metrics-file",
+        help=(
+            "Writes counters and latency histograms in the OpenMetrics text "
+            "format to this file while files are processed."
+        ),
+    )
+
+    parser.add_argument(
+        "-mp",
+        "--metrics-port",
+        action="store",
+        type=int,
+        help="Serves the same metrics on http://127.0.0.1:PORT/metrics.",
+    )
+
     return parser
 
 
@@ -88,16 +422,22 @@ def should_cli_run(args: argparse.Namespace) -> bool:
     Returns:
         bool: Wether the CLI should be run instead of the GUI.
     """
-    return args.file is not None or args.directory is not None or args.bulk_run
+    return (
+        args.file is not None
+        or args.directory is not None
+        or args.watch is not None
+        or args.serve is not None
+        or args.bulk_run
+    )
 
 
-def run_cli_job(args: argparse.Namespace, main_window: MainWindow):
+def run_cli_job(args: argparse.Namespace):
     """
-    Runs the CLI Job.
+    Runs the CLI Job. No Qt objects are created, so this also works
+    without a display.
 
     Args:
         args (argparse.Namespace): The parsed CLI argumetns
-        main_window (MainWindow): The main_window, which will not be shown.
     """
 
     ################
@@ -111,45 +451,131 @@ def run_cli_job(args: argparse.Namespace, main_window: MainWindow):
     ### build values ###
     ####################
 
-    values = main_window.defaults
+    values = load_defaults(settings.DEFAULT_PATH)
+    validation.validate_and_modify_defaults(values)
 
     values.margin_top = arg_dic.get("top", values.margin_top)
     values.margin_right = arg_dic.get("right", values.margin_right)
     values.margin_bot = arg_dic.get("bot", values.margin_bot)
-    values.margin_left = arg_dic.get("top", values.margin_left)
+    values.margin_left = arg_dic.get("left", values.margin_left)
+
+    values.jobs = arg_dic.get("jobs", values.jobs)
+    values.low_memory = arg_dic.get("low_memory", values.low_memory)
+    values.margin_mode = arg_dic.get("mode", values.margin_mode)
+    values.output_mode = arg_dic.get("output_mode", values.output_mode)
+    values.optimize_level = arg_dic.get("optimize", values.optimize_level)
+    values.linearize = arg_dic.get("linearize", values.linearize)
+    values.in_place = arg_dic.get("in_place", values.in_place)
+    values.deduplicate = arg_dic.get("deduplicate", values.deduplicate)
+    values.use_cache = arg_dic.get("cache", values.use_cache)
+    values.cache_size_mb = arg_dic.get("cache_size", values.cache_size_mb)
+    values.cache_hardlink = arg_dic.get("cache_hardlink", values.cache_hardlink)
+    values.skip_up_to_date = arg_dic.get("skip_up_to_date", values.skip_up_to_date)
+    values.resume = arg_dic.get("resume", values.resume)
+    values.recursive = arg_dic.get("recursive", values.recursive)
+    values.include_patterns = arg_dic.get("include", values.include_patterns)
+    values.exclude_patterns = arg_dic.get("exclude", values.exclude_patterns)
+    values.walk_workers = arg_dic.get("walk_workers", values.walk_workers)
+    values.profile_memory = arg_dic.get("profile_memory", values.profile_memory)
+    values.memory_threshold_mb = arg_dic.get(
+        "memory_threshold", values.memory_threshold_mb
+    )
+    values.memory_report_size = arg_dic.get(
+        "memory_report_size", values.memory_report_size
+    )
 
-    # We need to set the line ending to the main window line edit
-    # because the auto_set_single_new_file function we use for
-    # the single run, reads this line edit.
-    # That function is used to generated a default new name
-    # should nothing be given as output in the cli.
     values.bulk_name_ending = arg_dic.get("bulk_suffix", values.bulk_name_ending)
-    main_window.bulk_ending_line_edit.setText(values.bulk_name_ending)
 
-    if arg_dic.get("file") is not None:
+    if arg_dic.get("file") == streams.STDIO_PATH:
+        values.single_file_folder = streams.STDIO_PATH
+        values.single_file_target_folder = streams.STDIO_PATH
+
+    elif arg_dic.get("file") is not None:
         path = Path(arg_dic.get("file")).resolve()
         values.single_file_folder = str(path)
-        new_file_name = main_window.auto_set_single_new_file(str(path))
+        # Used should nothing be given as output in the cli.
+        new_file_name = engine.get_single_out_name(str(path), values.bulk_name_ending)
         values.single_file_target_folder = new_file_name
 
     if arg_dic.get("directory") is not None:
         path = Path(arg_dic.get("directory")).resolve()
         values.bulk_folder = str(path)
 
+    if arg_dic.get("watch") is not None:
+        path = Path(arg_dic.get("watch")).resolve()
+        values.bulk_folder = str(path)
+
     values.single_file_target_folder = arg_dic.get(
         "output", values.single_file_target_folder
     )
 
+    if values.in_place and arg_dic.get("file") is not None:
+        values.single_file_target_folder = values.single_file_folder
+
+    is_pdf_to_stdout = (
+        args.file is not None and values.single_file_target_folder == streams.STDIO_PATH
+    )
+
+    if args.events == console.EVENTS_JSONL or is_pdf_to_stdout:
+        events = None
+        if args.events == console.EVENTS_JSONL:
+            events = console.JsonlEvents(sys.stdout)
+        # Everything else goes to stderr, so stdout only contains the
+        # events or the PDF.
+        log_to_stderr()
+        with redirect_stdout(sys.stderr):
+            validate_and_run(args, values, events)
+    else:
+        validate_and_run(args, values)
+
+
+def log_to_stderr():
+    """
+    Moves all log output which goes to stdout to stderr instead.
+    All loggers share the handlers of the root logger.
+    """
+
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler) and handler.stream is sys.stdout:
+            handler.setStream(sys.stderr)
+
+
+def validate_and_run(
+    args: argparse.Namespace,
+    values: NoteValues,
+    events: console.JsonlEvents | None = None,
+):
+    """
+    Validates the values built by :py:func:`run_cli_job` and runs the job.
+
+    Args:
+        args (argparse.Namespace): The parsed CLI arguments
+        values (NoteValues): The configuration of the run
+        events (console.JsonlEvents | None): If given, the progress is
+            written as events instead of text.
+    """
+
     ##############
     ### Errors ###
     ##############
 
-    is_single_run = arg_dic.get("file") is not None
+    is_single_run = args.file is not None
 
-    if is_single_run:
-        errors = main_window.clean_and_validate_single_run(values)
+    if args.serve is not None:
+        errors = validation.clean_and_validate_serve(values)
+        if args.max_upload <= 0:
+            errors.append("The upload limit needs to be positive.")
+    elif is_single_run:
+        errors = validation.clean_and_validate_single_run(values)
     else:
-        errors = main_window.clean_and_validate_bulk_run(values)
+        errors = validation.clean_and_validate_bulk_run(values)
+
+    if (
+        events is not None
+        and is_single_run
+        and values.single_file_target_folder == streams.STDIO_PATH
+    ):
+        errors.append("The events and the PDF can not both be written to stdout.")
 
     if len(errors) > 0:
         print(
@@ -158,7 +584,7 @@ def run_cli_job(args: argparse.Namespace, main_window: MainWindow):
             "process the request:\n"
         )
         for i, error in enumerate(errors):
-            print(f"{i+1}: {error.error_text.text()}")
+            print(f"{i+1}: {error}")
 
         print("\nExiting...")
         return
@@ -167,7 +593,34 @@ def run_cli_job(args: argparse.Namespace, main_window: MainWindow):
     ### Run ###
     ###########
 
-    if is_single_run:
-        run_single(values, is_gui=False)
-    else:
-        run_bulk(values, is_gui=False)
+    if args.trace is not None:
+        trace.enable()
+
+    if args.metrics_file is not None or args.metrics_port is not None:
+        metrics.enable(args.metrics_file, args.metrics_port)
+
+    try:
+        if args.serve is not None:
+            # Imported here, since asyncio is only needed for serving.
+            from addnotespace import server
+
+            server.serve(
+                values,
+                args.serve_host,
+                args.serve,
+                args.max_upload,
+                args.max_concurrent,
+            )
+        elif is_single_run:
+            console.run_single(values, events)
+        elif args.watch is not None:
+            watch.watch_folder(values, args.watch_settle, events)
+        else:
+            console.run_bulk(values, events)
+    finally:
+        metrics.disable()
+        if args.trace is not None:
+            trace_events = trace.disable()
+            trace.write_chrome_trace(args.trace, trace_events)
+            print(f"\n{trace.format_summary(trace_events)}")
+            print(f"\nWrote the trace to '{args.trace}'.")
@@ -0,0 +1,388 @@
+import sys
+import json
+import time
+import shutil
+from pathlib import Path
+from collections import Counter
+from logging import getLogger
+from typing import TextIO, Iterable, Iterator
+
+from addnotespace import engine, memory, streams
+from addnotespace.defaults import NoteValues
+from addnotespace.cache import ResultCache
+from addnotespace.manifest import BulkManifest
+
+
+logger = getLogger(__name__)
+
+#: Human readable progress output.
+EVENTS_TEXT = "text"
+
+#: One JSON object per line and event, see :py:class:`JsonlEvents`.
+EVENTS_JSONL = "jsonl"
+
+EVENT_FORMATS = [EVENTS_TEXT, EVENTS_JSONL]
+
+
+class JsonlEvents:
+    """
+    Writes one JSON object per line for every started, finished, skipped
+    and failed file. Each object has an :code:`event` and a :code:`time`
+    in seconds since the epoch, plus the paths and, once finished, the page
+    count, byte sizes and duration.
+    """
+
+    def __init__(self, stream: TextIO):
+        """
+        Args:
+            stream (TextIO): where the events are written
+        """
+        self.stream = stream
+
+    def emit(self, event: str, **fields):
+        """
+        Writes a single event and flushes it, so readers get it right away.
+
+        Args:
+            event (str): :code:`"start"`, :code:`"finish"`, :code:`"skip"`
+                or :code:`"error"`
+            **fields: the data of the event
+        """
+
+        line = json.dumps({"event": event, "time": time.time(), **fields})
+        self.stream.write(f"{line}\n")
+        self.stream.flush()
+
+    def start(self, index: int, job: engine.MarginJob):
+        """
+        Args:
+            index (int): index of the job in the run
+            job (engine.MarginJob): the job which is started
+        """
+        self.emit("start", index=index, in_path=job.in_path, out_path=job.out_path)
+
+    def finish(self, result: engine.FileResult):
+        """
+        Args:
+            result (engine.FileResult): result of the finished job
+        """
+        self.emit(
+            "finish",
+            index=result.index,
+            in_path=result.in_path,
+            out_path=result.out_path,
+            pages=result.n_pages,
+            bytes_in=result.bytes_in,
+            bytes_out=result.bytes_out,
+            duration=result.duration,
+            cache_hit=result.cache_hit,
+        )
+
+    def skip(self, in_path: str, reason: str = engine.SKIP_UP_TO_DATE):
+        """
+        Args:
+            in_path (str): file which is not processed
+            reason (str): why, see :py:func:`addnotespace.engine.iter_bulk_jobs`
+        """
+        self.emit("skip", in_path=in_path, reason=reason)
+
+    def error(self, index: int, job: engine.MarginJob, error: Exception):
+        """
+        Args:
+            index (int): index of the job in the run
+            job (engine.MarginJob): the job which failed
+            error (Exception):
+        """
+        self.emit(
+            "error",
+            index=index,
+            in_path=job.in_path,
+            out_path=job.out_path,
+            error=str(error),
+            error_type=type(error).__name__,
+        )
+
+
+def print_progress(display_text: str):
+    """
+    Overwrites the current console line with :code:`display_text`. If the
+    output is not a terminal, f.e. a pipe or a file, every text is written
+    on its own line instead.
+
+    Args:
+        display_text (str):
+    """
+
+    if not sys.stdout.isatty():
+        sys.stdout.write(f"{display_text}\n")
+        return
+
+    columns = shutil.get_terminal_size().columns
+    sys.stdout.write(f"{display_text.ljust(columns, ' ')}\r")
+
+
+def print_summary(results: list[engine.FileResult], cache: ResultCache | None):
+    """
+    Ends the progress output with a summary of the run.
+
+    Args:
+        results (list[engine.FileResult]):
+        cache (ResultCache | None): the cache used for the run, if any
+    """
+
+    summary = engine.get_summary(results, cache)
+    logger.info(f"Finished {len(results)} PDFs ({summary})")
+
+    sys.stdout.flush()
+    print("\nDone.")
+    print(f"Finished all {len(results)} PDFs ({summary})")
+
+
+def print_memory_report(results: list[engine.FileResult], values: NoteValues):
+    """
+    Prints the files which needed the most memory, if memory profiling
+    is enabled.
+
+    Args:
+        results (list[engine.FileResult]):
+        values (NoteValues): the configuration of the run
+    """
+
+    if not values.profile_memory:
+        return
+
+    threshold = int(values.memory_threshold_mb) * 2**20
+
+    for result in results:
+        if result.file_peak_rss is not None and result.file_peak_rss > threshold:
+            logger.warning(
+                f"{result.in_path} needed "
+                f"{memory.format_bytes(result.file_peak_rss)} of memory."
+            )
+
+    report = memory.format_memory_report(
+        results, threshold, top_n=int(values.memory_report_size)
+    )
+    print(f"\nPeak memory per file:\n{report}")
+
+
+def run_files(
+    in_paths: list[str],
+    out_paths: list[str],
+    values: NoteValues,
+    engine_kwargs: dict | None = None,
+    events: JsonlEvents | None = None,
+) -> list[engine.FileResult]:
+    """
+    Processes the files and prints the progress to the console.
+
+    Args:
+        in_paths (list[str]):
+        out_paths (list[str]):
+        values (NoteValues): the configuration of the run
+        engine_kwargs (dict | None): Keyword arguments for
+            :py:func:`addnotespace.engine.process_files`. Created from the
+            values if not given.
+        events (JsonlEvents | None): If given, the progress is written as
+            events instead of text.
+
+    Returns:
+        list[engine.FileResult]:
+    """
+
+    if engine_kwargs is None:
+        engine_kwargs = engine.get_engine_kwargs(values)
+
+    n_files = len(in_paths)
+
+    def on_start(i: int):
+        if events is not None:
+            mods = engine.get_mods(values)
+            events.start(i, engine.MarginJob(in_paths[i], out_paths[i], mods))
+            return
+        print_progress(f"Working on: {Path(in_paths[i]).name} ({i+1}/{n_files})")
+
+    def on_finish(result: engine.FileResult, n_finished: int):
+        if events is not None:
+            events.finish(result)
+            return
+        display_path = Path(result.in_path).name
+        print_progress(f"Finished: {display_path} ({n_finished}/{n_files})")
+
+    results = engine.process_files(
+        in_paths,
+        out_paths,
+        *engine.get_mods(values),
+        on_start=on_start,
+        on_finish=on_finish,
+        on_error=events.error if events is not None else None,
+        **engine_kwargs,
+    )
+
+    print_summary(results, engine_kwargs.get("cache"))
+    print_memory_report(results, values)
+
+    return results
+
+
+def run_single(values: NoteValues, events: JsonlEvents | None = None):
+    """
+    Does a single run with the given values.
+
+    Args:
+        values (NoteValues): values for the run
+        events (JsonlEvents | None): see :py:func:`run_files`
+    """
+
+    if streams.STDIO_PATH in (
+        values.single_file_folder,
+        values.single_file_target_folder,
+    ):
+        run_stdio(values, events)
+        return
+
+    file_name = Path(values.single_file_folder).absolute()
+    new_file_name = Path(values.single_file_target_folder).absolute()
+
+    run_files([str(file_name)], [str(new_file_name)], values, events=events)
+
+
+def run_stdio(values: NoteValues, events: JsonlEvents | None = None):
+    """
+    Does a single run, where the input is read from stdin or the output
+    is written to stdout if their path is :py:data:`streams.STDIO_PATH`.
+    Any other output has to go to stderr then, see
+    :py:func:`addnotespace.cli.run_cli_job`.
+
+    Args:
+        values (NoteValues): values for the run
+        events (JsonlEvents | None): see :py:func:`run_files`
+    """
+
+    source = values.single_file_folder
+    if source == streams.STDIO_PATH:
+        source = sys.stdin.buffer
+
+    # sys.stdout may be redirected to stderr, so the PDF is written to
+    # the original stdout.
+    target = values.single_file_target_folder
+    if target == streams.STDIO_PATH:
+        target = sys.__stdout__.buffer
+
+    mods = engine.get_mods(values)
+    add_margin_kwargs = engine.get_add_margin_kwargs(values)
+
+    job = engine.MarginJob(streams.get_name(source), streams.get_name(target), mods)
+    if events is not None:
+        events.start(0, job)
+
+    try:
+        result = engine.process_stream(source, target, mods, add_margin_kwargs)
+    except Exception as e:
+        if events is not None:
+            events.error(0, job, e)
+        raise
+
+    if events is not None:
+        events.finish(result)
+
+    print_summary([result], None)
+
+
+def run_bulk(values: NoteValues, events: JsonlEvents | None = None):
+    """
+    Does a bulk run with the given values. The files are processed while
+    the directory is still being walked, so the total is not known up front.
+
+    Args:
+        values (NoteValues): The configuration for the bulk run
+        events (JsonlEvents | None): see :py:func:`run_files`
+    """
+
+    bulk_folder = Path(values.bulk_folder).absolute()
+
+    engine_kwargs = engine.get_engine_kwargs(values)
+
+    manifest = None
+    if values.skip_up_to_date:
+        manifest = BulkManifest.for_folder(bulk_folder)
+        engine_kwargs["manifest"] = manifest
+
+    # Imported here, so sqlite3 is only loaded for bulk runs.
+    from addnotespace.journal import open_journal
+
+    journal = open_journal(bulk_folder, values.resume)
+    engine_kwargs["journal"] = journal
+
+    # Number of skipped files per reason
+    skipped = Counter()
+
+    def on_skip(in_path: str, reason: str):
+        skipped[reason] += 1
+        if events is not None:
+            events.skip(in_path, reason)
+
+    # The jobs are only known once the walk produced them.
+    started: dict[int, engine.MarginJob] = dict()
+
+    def track(jobs: Iterable[engine.MarginJob]) -> Iterator[engine.MarginJob]:
+        for i, job in enumerate(jobs):
+            started[i] = job
+            yield job
+
+    jobs = track(
+        engine.iter_bulk_jobs(
+            values, manifest=manifest, on_skip=on_skip, journal=journal
+        )
+    )
+
+    def on_start(i: int):
+        job = started.pop(i)
+        if events is not None:
+            events.start(i, job)
+            return
+        print_progress(f"Working on: {Path(job.in_path).name} ({i+1})")
+
+    def on_finish(result: engine.FileResult, n_finished: int):
+        if events is not None:
+            events.finish(result)
+            return
+        print_progress(f"Finished: {Path(result.in_path).name} ({n_finished})")
+
+    try:
+        results = engine.process_many(
+            jobs,
+            workers=engine_kwargs.pop("jobs"),
+            on_start=on_start,
+            on_finish=on_finish,
+            on_error=events.error if events is not None else None,
+            **engine_kwargs,
+        )
+    finally:
+        if journal is not None:
+            journal.close()
+
+    n_up_to_date = skipped[engine.SKIP_UP_TO_DATE]
+    n_finished = skipped[engine.SKIP_FINISHED]
+
+    if len(results) > 0:
+        print_summary(results, engine_kwargs.get("cache"))
+        print_memory_report(results, values)
+    elif n_up_to_date > 0 and n_finished == 0:
+        print(f"All PDFs in '{bulk_folder}' are up to date.")
+    elif n_finished > 0 and n_up_to_date == 0:
+        print(f"All PDFs in '{bulk_folder}' were already finished.")
+    elif n_finished > 0:
+        print(f"All PDFs in '{bulk_folder}' are up to date or were already finished.")
+    else:
+        print(f"No PDF File was found in the directory: '{bulk_folder}'")
+
+    if n_up_to_date > 0:
+        print(f"Skipped {n_up_to_date} PDFs which are up to date.")
+    if n_finished > 0:
+        print(f"Skipped {n_finished} PDFs which were already finished.")
+    if skipped[engine.SKIP_OUTPUT] > 0:
+        print(
+            f"Skipped {skipped[engine.SKIP_OUTPUT]} PDFs which are outputs "
+            "of earlier runs."
+        )
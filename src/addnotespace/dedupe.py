@@ -0,0 +1,143 @@
+import hashlib
+from logging import getLogger
+
+import PyPDF2 as pypdf
+
+
+logger = getLogger(__name__)
+
+#: Keys which point back up the page tree. They are not followed, since
+#: they would lead into the pages themselves.
+SKIPPED_KEYS = ("/Parent", "/P")
+
+
+class _HashWriter:
+    """
+    A minimal stream, which only hashes what is written to it.
+    This way objects can be hashed without keeping a serialized copy.
+    """
+
+    def __init__(self):
+        self.hash = hashlib.sha256()
+
+    def write(self, data: bytes):
+        self.hash.update(data)
+
+
+class Deduplicator:
+    """
+    Replaces references to objects with identical content by a reference
+    to the first object with that content. The writer then only writes
+    the first object, since the others are not reachable anymore.
+
+    Only indirect objects are deduplicated. Containers are modified
+    inplace.
+    """
+
+    def __init__(self):
+
+        #: maps the content hash to the first reference with that content
+        self.by_hash: dict[bytes, pypdf.generic.IndirectObject] = dict()
+
+        #: maps (idnum, generation) to the canonical reference
+        self.canonical: dict[tuple[int, int], pypdf.generic.IndirectObject] = dict()
+
+        self.n_duplicates = 0
+
+    def deduplicate_page(self, page: pypdf.PageObject):
+        """
+        Deduplicates the resources and content streams of a page.
+
+        Args:
+            page (pypdf.PageObject):
+        """
+
+        NameObject = pypdf.generic.NameObject
+
+        for key in ("/Resources", "/Contents"):
+            if key in page:
+                page[NameObject(key)] = self._replace(page.raw_get(key))
+
+    def _replace(self, value: pypdf.generic.PdfObject) -> pypdf.generic.PdfObject:
+        """
+        Returns the canonical version of :code:`value` and replaces
+        the children of containers inplace.
+        """
+
+        if isinstance(value, pypdf.generic.IndirectObject):
+            return self._canonical_reference(value)
+
+        if isinstance(value, pypdf.generic.DictionaryObject):
+            for key in list(value.keys()):
+                if key in SKIPPED_KEYS:
+                    continue
+                value[key] = self._replace(value.raw_get(key))
+
+        elif isinstance(value, pypdf.generic.ArrayObject):
+            for i in range(len(value)):
+                value[i] = self._replace(value[i])
+
+        return value
+
+    def _canonical_reference(
+        self, ref: pypdf.generic.IndirectObject
+    ) -> pypdf.generic.IndirectObject:
+        """
+        Returns the first reference to an object with the same content
+        as the object :code:`ref` points to.
+        """
+
+        key = (ref.idnum, ref.generation)
+
+        canonical = self.canonical.get(key)
+        if canonical is not None:
+            return canonical
+
+        # Marks the object as visited before descending. Cycles therefore
+        # end at the object itself, which will then not be deduplicated.
+        self.canonical[key] = ref
+
+        obj = ref.get_object()
+
+        if not isinstance(obj, pypdf.generic.DictionaryObject):
+            return ref
+
+        if obj.get("/Type") == "/Page":
+            return ref
+
+        self._replace(obj)
+
+        hash_writer = _HashWriter()
+        obj.write_to_stream(hash_writer, None)
+        digest = hash_writer.hash.digest()
+
+        first = self.by_hash.get(digest)
+        if first is None:
+            self.by_hash[digest] = ref
+            return ref
+
+        self.n_duplicates += 1
+        self.canonical[key] = first
+        return first
+
+
+def deduplicate_pages(pages: list[pypdf.PageObject]) -> int:
+    """
+    Makes all pages share one indirect object for each set of objects with
+    identical content. This includes streams like images, fonts and
+    content streams, as well as resource dictionaries.
+
+    Args:
+        pages (list[pypdf.PageObject]):
+
+    Returns:
+        int: The number of objects which were replaced.
+    """
+
+    deduplicator = Deduplicator()
+    for page in pages:
+        deduplicator.deduplicate_page(page)
+
+    logger.info(f"Replaced {deduplicator.n_duplicates} duplicate objects.")
+
+    return deduplicator.n_duplicates
@@ -1,7 +1,7 @@
 import json
 from pathlib import Path
 from logging import getLogger
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 logger = getLogger(__name__)
@@ -26,6 +26,31 @@ class NoteValues:
 
     preview_sketch_ratio: str = ""  #:
 
+    jobs: str = "auto"  #:
+    low_memory: bool = False  #:
+    margin_mode: str = "auto"  #:
+    output_mode: str = "rewrite"  #:
+    in_place: bool = False  #:
+    deduplicate: bool = False  #:
+    optimize_level: str = "none"  #:
+    linearize: bool = False  #:
+
+    use_cache: bool = False  #:
+    cache_size_mb: int = 1024  #:
+    cache_hardlink: bool = False  #:
+
+    skip_up_to_date: bool = False  #:
+    resume: bool = False  #:
+
+    recursive: bool = False  #:
+    include_patterns: list[str] = field(default_factory=list)  #:
+    exclude_patterns: list[str] = field(default_factory=list)  #:
+    walk_workers: int = 1  #:
+
+    profile_memory: bool = False  #:
+    memory_threshold_mb: int = 512  #:
+    memory_report_size: int = 10  #:
+
 
 def load_defaults(file_path: str | Path) -> NoteValues:
     """
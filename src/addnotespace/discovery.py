@@ -0,0 +1,271 @@
+import os
+import re
+import queue
+import fnmatch
+import threading
+from pathlib import Path
+from logging import getLogger
+from typing import Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = getLogger(__name__)
+
+#: Every PDF starts with this header. Some writers put junk in front of it,
+#: which readers tolerate within the first :code:`HEADER_SEARCH_SIZE` bytes.
+PDF_HEADER = b"%PDF-"
+
+HEADER_SEARCH_SIZE = 1024
+
+
+def compile_patterns(patterns: list[str] | None) -> re.Pattern | None:
+    """
+    Compiles glob patterns like :code:`lectures/*.pdf` into a single
+    regular expression, so each path is matched only once.
+
+    Args:
+        patterns (list[str] | None):
+
+    Returns:
+        re.Pattern | None: :code:`None` if there are no patterns.
+    """
+
+    if not patterns:
+        return None
+
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+
+
+def is_pdf(file_path: str | Path) -> bool:
+    """
+    Checks whether the file starts with a PDF header, independent
+    of its extension.
+
+    Args:
+        file_path (str | Path):
+
+    Returns:
+        bool:
+    """
+
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(HEADER_SEARCH_SIZE)
+    except OSError:
+        return False
+
+    return PDF_HEADER in head
+
+
+class NameIndex:
+    """
+    Indexes the files of directories by their possible stems, so checking
+    whether a directory contains :code:`stem` or :code:`stem.*` does not
+    list the directory again for every file. Each directory is listed once,
+    the first time it is asked about, and files created afterwards are not
+    seen.
+    """
+
+    def __init__(self):
+
+        #: Directory to a mapping of each stem to the names of the files
+        #: which have it.
+        self.directories: dict[str, dict[str, set[str]]] = dict()
+
+    def find(self, directory: str | Path, stem: str) -> set[str]:
+        """
+        Args:
+            directory (str | Path):
+            stem (str):
+
+        Returns:
+            set[str]: The names of the files in the directory, which are
+                either :code:`stem` or match :code:`stem.*`.
+        """
+
+        directory = str(directory)
+
+        stems = self.directories.get(directory)
+        if stems is None:
+            stems = _index_stems(directory)
+            self.directories[directory] = stems
+
+        return stems.get(stem, set())
+
+
+def _index_stems(directory: str) -> dict[str, set[str]]:
+    """
+    Maps every part of each file name in front of one of its dots, as
+    well as the whole name, to the file names.
+    """
+
+    stems: dict[str, set[str]] = dict()
+
+    try:
+        entries = list(os.scandir(directory))
+    except OSError as e:
+        logger.warning(f"Could not list '{directory}': {e}")
+        return stems
+
+    for entry in entries:
+
+        try:
+            if not entry.is_file():
+                continue
+        except OSError:
+            continue
+
+        name = entry.name
+        stems.setdefault(name, set()).add(name)
+
+        dot = name.find(".")
+        while dot != -1:
+            stems.setdefault(name[:dot], set()).add(name)
+            dot = name.find(".", dot + 1)
+
+    return stems
+
+
+class PdfFinder:
+    """
+    Finds the PDFs in a directory with :code:`os.scandir`.
+
+    Paths relative to the root directory are matched against the include
+    and exclude glob patterns. Directories matching an exclude pattern are
+    not entered at all. Whether a file is a PDF is decided by its header,
+    not by its extension. Symlinks to directories are not followed, since
+    a link to a parent would otherwise loop and yield the same PDFs again.
+    """
+
+    def __init__(
+        self,
+        folder: str | Path,
+        recursive: bool = False,
+        include: list[str] | None = None,
+        exclude: list[str] | None = None,
+        walk_workers: int = 1,
+    ):
+        """
+        Args:
+            folder (str | Path): the root directory
+            recursive (bool): Whether to look into subdirectories.
+            include (list[str] | None): If given, only files matching one
+                of these patterns are considered.
+            exclude (list[str] | None): Files and directories matching one
+                of these patterns are skipped.
+            walk_workers (int): Number of threads walking subtrees in
+                parallel. With more than one, the order of the files is
+                not deterministic.
+        """
+
+        self.folder = Path(folder).absolute()
+        self.recursive = recursive
+        self.include = compile_patterns(include)
+        self.exclude = compile_patterns(exclude)
+        self.walk_workers = max(int(walk_workers), 1)
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Yields:
+            str: absolute path of each PDF
+        """
+
+        if self.walk_workers == 1 or not self.recursive:
+            yield from self._walk(str(self.folder))
+        else:
+            yield from self._walk_parallel()
+
+    def _get_relative(self, path: str) -> str:
+        """
+        Returns the path relative to the root in posix form, which is
+        what the patterns are matched against.
+        """
+        return Path(os.path.relpath(path, self.folder)).as_posix()
+
+    def _scan(self, directory: str) -> tuple[list[str], list[str]]:
+        """
+        Lists a single directory.
+
+        Returns:
+            tuple[list[str], list[str]]: The sorted PDFs and subdirectories
+                which passed the filters.
+        """
+
+        files = []
+        dirs = []
+
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            logger.warning(f"Could not list '{directory}': {e}")
+            return files, dirs
+
+        for entry in entries:
+
+            relative = self._get_relative(entry.path)
+            if self.exclude is not None and self.exclude.match(relative):
+                continue
+
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if self.recursive:
+                        dirs.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+
+            if self.include is not None and not self.include.match(relative):
+                continue
+
+            if is_pdf(entry.path):
+                files.append(entry.path)
+
+        return sorted(files), sorted(dirs)
+
+    def _walk(self, directory: str) -> Iterator[str]:
+        """
+        Walks depth first in sorted order. The files of a directory
+        come before the files of its subdirectories.
+        """
+
+        files, dirs = self._scan(directory)
+        yield from files
+        for sub_directory in dirs:
+            yield from self._walk(sub_directory)
+
+    def _walk_parallel(self) -> Iterator[str]:
+        """
+        Scans the directories with a thread pool. Each scan submits the
+        scans of its subdirectories, and the found files are passed
+        through a queue, so they can be yielded while the walk continues.
+        """
+
+        found: queue.Queue[list[str] | None] = queue.Queue()
+
+        lock = threading.Lock()
+        n_pending = 1
+
+        with ThreadPoolExecutor(max_workers=self.walk_workers) as executor:
+
+            def scan(directory: str):
+                nonlocal n_pending
+
+                files, dirs = [], []
+                try:
+                    files, dirs = self._scan(directory)
+                finally:
+                    with lock:
+                        n_pending += len(dirs) - 1
+                        is_done = n_pending == 0
+                    for sub_directory in dirs:
+                        executor.submit(scan, sub_directory)
+                    found.put(files)
+                    if is_done:
+                        found.put(None)
+
+            executor.submit(scan, str(self.folder))
+
+            while (files := found.get()) is not None:
+                yield from files
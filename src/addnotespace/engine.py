@@ -0,0 +1,1166 @@
+import os
+import sys
+import time
+import queue
+import multiprocessing
+from pathlib import Path
+from logging import getLogger
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Sized
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, Future, FIRST_COMPLETED, wait
+
+from addnotespace import memory, metrics, progress, streams, trace
+from addnotespace.cache import ResultCache, hash_file
+from addnotespace.discovery import PdfFinder, NameIndex
+from addnotespace.manifest import BulkManifest
+from addnotespace.defaults import NoteValues
+
+# Only used for type hints. The journal is imported by the callers, so
+# sqlite3 is only loaded for bulk runs.
+if TYPE_CHECKING:
+    from addnotespace.journal import BulkJournal
+
+
+logger = getLogger(__name__)
+
+#: Value for the :code:`jobs` setting, which uses one worker per cpu core.
+AUTO_JOBS = "auto"
+
+#: How many jobs per worker are submitted to the process pool before
+#: waiting for results. Keeps memory bounded for very long job streams.
+MAX_PENDING_PER_WORKER = 4
+
+#: Seconds between checks for page reports and cancellation while waiting
+#: for the workers.
+POLL_INTERVAL = 0.1
+
+#: Skip reason of :py:func:`iter_bulk_jobs` for outputs of earlier runs.
+SKIP_OUTPUT = "output"
+
+#: Skip reason of :py:func:`iter_bulk_jobs` for files which are up to date
+#: according to the manifest.
+SKIP_UP_TO_DATE = "up_to_date"
+
+#: Skip reason of :py:func:`iter_bulk_jobs` for files which the resumed run
+#: already finished.
+SKIP_FINISHED = "finished"
+
+
+def resolve_jobs(jobs: int | str | None) -> int:
+    """
+    Converts the :code:`jobs` setting into a number of worker processes.
+
+    Args:
+        jobs (int | str | None): Either a positive integer, a string
+            containing a positive integer or :code:`"auto"`. :code:`None`
+            and empty strings are treated like :code:`"auto"`.
+
+    Raises:
+        ValueError: If the value can not be interpreted.
+
+    Returns:
+        int: number of worker processes (at least 1)
+    """
+
+    if jobs is None or str(jobs).strip() in ("", AUTO_JOBS):
+        return max(os.cpu_count() or 1, 1)
+
+    try:
+        n_jobs = int(str(jobs).strip())
+    except ValueError:
+        raise ValueError(
+            f"The number of jobs '{jobs}' is neither a positive integer "
+            f"nor '{AUTO_JOBS}'."
+        )
+
+    if n_jobs < 1:
+        raise ValueError(f"The number of jobs has to be at least 1, not {n_jobs}.")
+
+    return n_jobs
+
+
+def get_mods(values: NoteValues) -> tuple[float, float, float, float]:
+    """
+    Args:
+        values (NoteValues):
+
+    Returns:
+        tuple[float, float, float, float]: top, right, bot and left margin
+            as fractions
+    """
+
+    return (
+        int(values.margin_top) / 100,
+        int(values.margin_right) / 100,
+        int(values.margin_bot) / 100,
+        int(values.margin_left) / 100,
+    )
+
+
+def get_add_margin_kwargs(values: NoteValues) -> dict:
+    """
+    Collects the optional :py:func:`addnotespace.pdf.add_margin` arguments
+    from the given values.
+
+    Args:
+        values (NoteValues):
+
+    Returns:
+        dict: keyword arguments for :py:func:`addnotespace.pdf.add_margin`
+    """
+
+    return {
+        "low_memory": values.low_memory,
+        "mode": values.margin_mode,
+        "output_mode": values.output_mode,
+        "deduplicate": values.deduplicate,
+        "optimize_level": values.optimize_level,
+        "linearize": values.linearize,
+    }
+
+
+def get_engine_kwargs(values: NoteValues) -> dict:
+    """
+    Collects the optional :py:func:`process_files` arguments from the
+    given values.
+
+    Args:
+        values (NoteValues):
+
+    Returns:
+        dict: keyword arguments for :py:func:`process_files`
+    """
+
+    cache = None
+    if values.use_cache:
+        cache = ResultCache(
+            max_bytes=int(values.cache_size_mb) * 2**20,
+            use_hardlinks=values.cache_hardlink,
+        )
+
+    return {
+        "jobs": values.jobs,
+        "add_margin_kwargs": get_add_margin_kwargs(values),
+        "cache": cache,
+        "profile_memory": values.profile_memory,
+    }
+
+
+def get_bulk_out_name(file_name: str, suffix: str, in_place: bool = False) -> str:
+    """
+    Creates the output file name for a file of a bulk run.
+
+    Args:
+        file_name (str): f.e. :code:`slides.pdf`
+        suffix (str): f.e. :code:`_notes`
+        in_place (bool): If True, the file is its own output.
+
+    Returns:
+        str: f.e. :code:`slides_notes.pdf`
+    """
+
+    if in_place:
+        return file_name
+
+    # Files are recognized by their header, so they might not have
+    # an extension at all.
+    out_file_name, _ = os.path.splitext(file_name)
+    return f"{out_file_name}{suffix}.pdf"
+
+
+def get_single_out_name(single_path: str, suffix: str) -> str:
+    """
+    Creates the output file name for a single run. It uses the single
+    path + the suffix. If the suffix is empty, :code:`_notes` will be
+    used instead.
+
+    Args:
+        single_path (str): f.e. :code:`/home/slides.pdf`
+        suffix (str): f.e. :code:`_notes`
+
+    Returns:
+        str: f.e. :code:`/home/slides_notes.pdf`
+    """
+
+    suffix = suffix.strip()
+    if suffix == "":
+        suffix = "_notes"
+
+    out_file_name = Path(single_path).absolute()
+    out_file_name = str(out_file_name).split(".")
+    out_file_name = ".".join(out_file_name[:-1])
+    out_file_name = f"{out_file_name}{suffix}.pdf"
+
+    # windows path conversion. Would work without it, but for
+    # consistency of display, it is still done
+    if sys.platform == "win32":
+        out_file_name = out_file_name.replace("/", "\\")
+
+    return out_file_name
+
+
+def create_finder(values: NoteValues) -> PdfFinder:
+    """
+    Args:
+        values (NoteValues): the configuration of the bulk run
+
+    Returns:
+        PdfFinder: finds the inputs of the bulk run
+    """
+
+    return PdfFinder(
+        values.bulk_folder,
+        recursive=values.recursive,
+        include=values.include_patterns,
+        exclude=values.exclude_patterns,
+        walk_workers=values.walk_workers,
+    )
+
+
+def collect_bulk_files(
+    values: NoteValues, known_outputs: set[str] | None = None
+) -> tuple[list[str], list[str]]:
+    """
+    Finds the PDFs of a bulk run and their output paths.
+    Outputs are placed next to their input. Outputs of earlier runs are
+    skipped, see :py:func:`is_bulk_output`.
+
+    Args:
+        values (NoteValues): the configuration of the bulk run
+        known_outputs (set[str] | None): see :py:func:`is_bulk_output`
+
+    Returns:
+        tuple[list[str], list[str]]: input and output paths
+    """
+
+    in_paths = []
+    out_paths = []
+    name_index = NameIndex()
+
+    for in_path in create_finder(values):
+        if is_bulk_output(in_path, values, known_outputs, name_index):
+            logger.info(f"Skipped '{in_path}', which is an output of an earlier run.")
+            continue
+        in_paths.append(in_path)
+        out_paths.append(_get_bulk_out_path(in_path, values))
+
+    return in_paths, out_paths
+
+
+def iter_bulk_jobs(
+    values: NoteValues,
+    manifest: BulkManifest | None = None,
+    on_skip: Callable[[str, str], None] | None = None,
+    journal: "BulkJournal | None" = None,
+) -> Iterator["MarginJob"]:
+    """
+    Like :py:func:`collect_bulk_files`, but yields the jobs while the
+    directory is still being walked, so processing can start right away.
+
+    Args:
+        values (NoteValues): the configuration of the bulk run
+        manifest (BulkManifest | None): If given, files which are up to
+            date are skipped.
+        on_skip (Callable[[str, str], None] | None): Called with the input
+            path of each skipped file and the reason, one of
+            :py:data:`SKIP_OUTPUT`, :py:data:`SKIP_UP_TO_DATE` and
+            :py:data:`SKIP_FINISHED`.
+        journal (BulkJournal | None): If given, files which were finished
+            by the run which is resumed are skipped.
+
+    Yields:
+        MarginJob:
+    """
+
+    mods = get_mods(values)
+
+    is_skipped = None
+    if manifest is not None:
+        is_skipped = _create_skip_check(values, manifest)
+
+    is_finished = None
+    if journal is not None:
+        is_finished = _create_finished_check(values, journal)
+
+    known_outputs = get_known_outputs(manifest, journal)
+    name_index = NameIndex()
+
+    for in_path in create_finder(values):
+
+        out_path = _get_bulk_out_path(in_path, values)
+
+        reason = None
+        if is_bulk_output(in_path, values, known_outputs, name_index):
+            reason = SKIP_OUTPUT
+        elif is_skipped is not None and is_skipped(in_path, out_path):
+            reason = SKIP_UP_TO_DATE
+        elif is_finished is not None and is_finished(in_path, out_path):
+            reason = SKIP_FINISHED
+
+        if reason is None:
+            yield MarginJob(in_path, out_path, mods)
+            continue
+
+        if reason == SKIP_OUTPUT:
+            logger.info(f"Skipped '{in_path}', which is an output of an earlier run.")
+        if on_skip is not None:
+            on_skip(in_path, reason)
+
+
+def _get_bulk_out_path(in_path: str, values: NoteValues) -> str:
+    """
+    Returns the output path for an input of a bulk run.
+    """
+
+    in_path = Path(in_path)
+    out_name = get_bulk_out_name(in_path.name, values.bulk_name_ending, values.in_place)
+    return str(in_path.parent / out_name)
+
+
+def get_known_outputs(
+    manifest: BulkManifest | None = None, journal: "BulkJournal | None" = None
+) -> set[str]:
+    """
+    Args:
+        manifest (BulkManifest | None):
+        journal (BulkJournal | None):
+
+    Returns:
+        set[str]: absolute paths of the files which earlier runs recorded
+            as their outputs, without the files modified inplace
+    """
+
+    known_outputs = set()
+
+    if manifest is not None:
+        # Inplace runs record the source as its own output.
+        known_outputs |= manifest.get_outputs() - set(manifest.entries.keys())
+
+    if journal is not None:
+        known_outputs |= journal.get_outputs()
+
+    return known_outputs
+
+
+def is_bulk_output(
+    path: str,
+    values: NoteValues,
+    known_outputs: set[str] | None = None,
+    name_index: NameIndex | None = None,
+) -> bool:
+    """
+    Checks whether the file is an output of a bulk run. These are never
+    used as inputs, since another job of the same run might be writing
+    them.
+
+    A file is an output if an earlier run recorded it as one, or if it is
+    named like an output and its source lies next to it. An input which
+    only happens to end with the suffix, like :code:`lecture_notes.pdf`
+    for the suffix :code:`_notes`, is not an output.
+
+    Args:
+        path (str): the file
+        values (NoteValues): the configuration of the bulk run
+        known_outputs (set[str] | None): see :py:func:`get_known_outputs`
+        name_index (NameIndex | None): Looks up the sources. Pass the same
+            index for all files of a run, so each directory is only listed
+            once.
+
+    Returns:
+        bool:
+    """
+
+    if values.in_place:
+        return False
+
+    path = Path(path).absolute()
+
+    if known_outputs is not None and str(path) in known_outputs:
+        return True
+
+    out_ending = f"{values.bulk_name_ending}.pdf"
+    if values.bulk_name_ending == "" or not path.name.endswith(out_ending):
+        return False
+
+    source_stem = path.name[: -len(out_ending)]
+    if source_stem == "":
+        return False
+
+    if name_index is None:
+        name_index = NameIndex()
+
+    # Sources are recognized by their header, so they might have any
+    # extension or none at all.
+    sources = name_index.find(path.parent, source_stem) - {path.name}
+    return len(sources) > 0
+
+
+def _create_skip_check(
+    values: NoteValues, manifest: BulkManifest
+) -> Callable[[str, str], bool]:
+    """
+    Returns a function, which checks whether an input and output pair is
+    up to date according to the manifest.
+    """
+
+    run_settings = BulkManifest.create_settings(
+        get_mods(values), get_add_margin_kwargs(values)
+    )
+
+    def is_skipped(in_path: str, out_path: str) -> bool:
+        return manifest.is_up_to_date(in_path, out_path, run_settings)
+
+    return is_skipped
+
+
+def _create_finished_check(
+    values: NoteValues, journal: "BulkJournal"
+) -> Callable[[str, str], bool]:
+    """
+    Returns a function, which checks whether an input and output pair was
+    finished by the run which is resumed.
+    """
+
+    run_settings = journal.create_settings(
+        get_mods(values), get_add_margin_kwargs(values)
+    )
+
+    def is_finished(in_path: str, out_path: str) -> bool:
+        return journal.is_finished(in_path, out_path, run_settings)
+
+    return is_finished
+
+
+def filter_finished(
+    in_paths: list[str],
+    out_paths: list[str],
+    values: NoteValues,
+    journal: "BulkJournal",
+) -> tuple[list[str], list[str]]:
+    """
+    Removes the files which were finished by the run which is resumed.
+
+    Args:
+        in_paths (list[str]):
+        out_paths (list[str]):
+        values (NoteValues): The configuration for the bulk run
+        journal (BulkJournal): The journal of the bulk folder
+
+    Returns:
+        tuple[list[str], list[str]]: the remaining input and output paths
+    """
+
+    is_finished = _create_finished_check(values, journal)
+
+    new_in_paths = []
+    new_out_paths = []
+
+    for in_path, out_path in zip(in_paths, out_paths):
+
+        if is_finished(in_path, out_path):
+            continue
+
+        new_in_paths.append(in_path)
+        new_out_paths.append(out_path)
+
+    return new_in_paths, new_out_paths
+
+
+def filter_up_to_date(
+    in_paths: list[str],
+    out_paths: list[str],
+    values: NoteValues,
+    manifest: BulkManifest,
+) -> tuple[list[str], list[str]]:
+    """
+    Removes the files which are up to date according to the manifest, as
+    well as the outputs of previous runs.
+
+    Args:
+        in_paths (list[str]):
+        out_paths (list[str]):
+        values (NoteValues): The configuration for the bulk run
+        manifest (BulkManifest): The manifest of the bulk folder
+
+    Returns:
+        tuple[list[str], list[str]]: the remaining input and output paths
+    """
+
+    is_skipped = _create_skip_check(values, manifest)
+    known_outputs = get_known_outputs(manifest)
+
+    new_in_paths = []
+    new_out_paths = []
+
+    for in_path, out_path in zip(in_paths, out_paths):
+
+        if str(Path(in_path).absolute()) in known_outputs:
+            continue
+
+        if is_skipped(in_path, out_path):
+            continue
+
+        new_in_paths.append(in_path)
+        new_out_paths.append(out_path)
+
+    return new_in_paths, new_out_paths
+
+
+@dataclass(frozen=True)
+class MarginJob:
+    """
+    A single file to add margins to.
+    """
+
+    in_path: str  #:
+    out_path: str  #:
+
+    #: top, right, bot and left margin as fractions
+    mods: tuple[float, float, float, float]
+
+
+@dataclass
+class FileResult:
+    """
+    The result of processing a single file.
+    """
+
+    #: Position of the file in the input list
+    index: int
+
+    in_path: str = ""  #:
+    out_path: str = ""  #:
+
+    #: Number of pages. :code:`None` if the output was taken from the cache.
+    n_pages: int | None = None
+
+    bytes_in: int = 0  #:
+    bytes_out: int = 0  #:
+
+    #: Wall time spent on the file in seconds, including cache lookups.
+    duration: float = 0.0
+
+    #: Peak RSS of the process which worked on the file in bytes.
+    #: :code:`None` if it could not be determined.
+    peak_rss: int | None = None
+
+    #: Whether the output was taken from the cache. :code:`None` if no
+    #: cache was used.
+    cache_hit: bool | None = None
+
+    #: Peak of traced Python allocations while working on the file in bytes.
+    #: Only set with memory profiling.
+    peak_traced: int | None = None
+
+    #: Peak RSS while working on the file in bytes. Only set with memory
+    #: profiling. Where the peak can not be reset per file, this is the
+    #: peak of the process so far.
+    file_peak_rss: int | None = None
+
+    #: Trace events recorded by a worker process, which still need to be
+    #: added to the trace of the main process.
+    trace_events: list[dict] | None = None
+
+    #: Hash of the input as it is after processing, see
+    #: :py:func:`addnotespace.cache.hash_file`. Only set if it was requested
+    #: for the manifest.
+    input_hash: str | None = None
+
+
+def _add_margin_job(
+    index: int,
+    job: MarginJob,
+    add_margin_kwargs: dict,
+    cache: ResultCache | None,
+    tracing: bool = False,
+    profile_memory: bool = False,
+    reporter: progress.PageReporter | None = None,
+    hash_input: bool = False,
+) -> FileResult:
+    """
+    Worker entry point. Needs to be a module level function so it can be
+    pickled for the process pool.
+
+    If :code:`tracing` is set but the trace is not enabled in this process,
+    which is the case for worker processes, the events of this job are
+    recorded and returned with the result. With :code:`profile_memory`
+    the peak memory of the job is stored in the result. With
+    :code:`hash_input` the hash of the input is stored as well, so the
+    manifest does not have to read the input again in the main process.
+
+    The pages are reported to :code:`reporter`. In worker processes it is
+    created from what :py:func:`addnotespace.progress.init_worker` received.
+
+    Returns:
+        FileResult:
+    """
+
+    if reporter is None:
+        reporter = progress.create_worker_reporter(index)
+
+    args = (index, job, add_margin_kwargs, cache, profile_memory, reporter, hash_input)
+
+    if not tracing or trace.is_enabled():
+        return _process_job(*args)
+
+    trace.enable()
+    try:
+        result = _process_job(*args)
+    finally:
+        events = trace.disable()
+
+    result.trace_events = events
+    return result
+
+
+def _is_in_place(job: MarginJob) -> bool:
+    """
+    Returns whether the job writes its output to its input.
+    """
+    return Path(job.in_path).resolve() == Path(job.out_path).resolve()
+
+
+def _process_job(
+    index: int,
+    job: MarginJob,
+    add_margin_kwargs: dict,
+    cache: ResultCache | None,
+    profile_memory: bool = False,
+    reporter: progress.PageReporter | None = None,
+    hash_input: bool = False,
+) -> FileResult:
+    """
+    Processes a single job. See :py:func:`_add_margin_job`.
+    """
+
+    # Imported here, so PyPDF2 is only loaded by the processes
+    # which actually work on files.
+    from addnotespace import pdf
+
+    start = time.perf_counter()
+
+    result = FileResult(index=index, in_path=job.in_path, out_path=job.out_path)
+    result.bytes_in = os.path.getsize(job.in_path)
+
+    if profile_memory:
+        memory.start_file_profile()
+
+    with trace.span(trace.FILE_SPAN, path=job.in_path) as file_span:
+
+        key = None
+        input_hash = None
+        if cache is not None:
+            with trace.span("cache_fetch"):
+                input_hash = hash_file(job.in_path)
+                key = cache.create_key(
+                    job.in_path, job.mods, add_margin_kwargs, input_hash
+                )
+                result.cache_hit = cache.fetch(key, job.out_path)
+
+        if not result.cache_hit:
+            result.n_pages = pdf.add_margin(
+                job.in_path,
+                job.out_path,
+                *job.mods,
+                **add_margin_kwargs,
+                on_page=reporter,
+            )
+            if key is not None:
+                with trace.span("cache_store"):
+                    cache.store(key, job.out_path)
+
+        if hash_input:
+            # Inplace runs changed the input, which is recorded as it is now.
+            if input_hash is None or _is_in_place(job):
+                with trace.span("hash_input"):
+                    input_hash = hash_file(job.in_path)
+            result.input_hash = input_hash
+
+        if trace.is_enabled():
+            file_span.args["pages"] = result.n_pages
+            file_span.args["cache_hit"] = result.cache_hit
+
+    if profile_memory:
+        result.peak_traced, result.file_peak_rss = memory.get_file_profile()
+
+    result.bytes_out = os.path.getsize(job.out_path)
+    result.duration = time.perf_counter() - start
+    result.peak_rss = memory.peak_rss_bytes()
+
+    return result
+
+
+def process_many(
+    jobs: Iterable[MarginJob | tuple[str, str, tuple[float, float, float, float]]],
+    workers: int | str | None = 1,
+    on_start: Callable[[int], None] | None = None,
+    on_finish: Callable[[FileResult, int], None] | None = None,
+    on_error: Callable[[int, MarginJob, Exception], None] | None = None,
+    add_margin_kwargs: dict | None = None,
+    cache: ResultCache | None = None,
+    manifest: BulkManifest | None = None,
+    profile_memory: bool = False,
+    journal: "BulkJournal | None" = None,
+    on_page: Callable[[int, int, int], None] | None = None,
+    cancel_event: progress.CancelEvent | None = None,
+    stop_on_error: bool = True,
+) -> list[FileResult]:
+    """
+    Adds the margins to the input of every job and writes the result to
+    its output. This is the entry point for using the engine as a library,
+    and does not need Qt.
+
+    If more than one worker is requested, the jobs are distributed across a
+    :code:`ProcessPoolExecutor`. Each input only ever writes to its own
+    output path, so the produced files do not depend on the order in which
+    the workers finish.
+
+    The jobs are consumed lazily, so a generator like
+    :py:func:`iter_bulk_jobs` can still be producing jobs while the first
+    ones are processed. At most :code:`MAX_PENDING_PER_WORKER` jobs per
+    worker are handed to the pool ahead of time.
+
+    Args:
+        jobs (Iterable[MarginJob | tuple]): Either :py:class:`MarginJob`
+            objects or tuples of input path, output path and margins.
+        workers (int | str | None): number of worker processes or
+            :code:`"auto"`. See :py:func:`resolve_jobs`.
+        on_start (Callable[[int], None] | None): Called with the index of a
+            job before it is processed. When running with multiple workers,
+            this happens when the job is handed to the pool.
+        on_finish (Callable[[FileResult, int], None] | None): Called with
+            the result of a finished job and the number of finished jobs.
+        on_error (Callable[[int, MarginJob, Exception], None] | None): Called
+            with the index, the job and the error if a job fails. With
+            :code:`stop_on_error` the error is raised afterwards, which
+            stops processing.
+        add_margin_kwargs (dict | None): Additional keyword arguments for
+            :py:func:`addnotespace.pdf.add_margin`.
+        cache (ResultCache | None): If given, results are taken from and
+            stored in this cache. Its hit, miss and eviction counters are
+            updated.
+        manifest (BulkManifest | None): If given, every finished job is
+            recorded in it, and it is saved once processing stops.
+        profile_memory (bool): Whether the peak memory of every file is
+            recorded in its result. Tracing the Python allocations slows
+            down the processing, see
+            :py:func:`addnotespace.memory.start_file_profile`.
+        journal (BulkJournal | None): If given, the state of every job is
+            committed to it as soon as it changes, so the run can be resumed
+            after a crash.
+        on_page (Callable[[int, int, int], None] | None): Called with the
+            index of a job, the number of its processed pages and its number
+            of pages, at most every
+            :py:data:`addnotespace.progress.PAGE_REPORT_INTERVAL` seconds per
+            job. Reports from workers may arrive after the job finished.
+        cancel_event (CancelEvent | None): Once it is set, no more jobs are
+            started, the running ones stop at their next page, and
+            :py:class:`addnotespace.progress.Cancelled` is raised. Jobs
+            which finished before are kept, the others leave no output.
+        stop_on_error (bool): Whether the first failing job stops the run.
+            Otherwise the remaining jobs are processed, and failed jobs
+            have no result.
+
+    Returns:
+        list[FileResult]: one result per successful job in the order of
+            :code:`jobs`
+
+    Raises:
+        Cancelled: If the run was cancelled.
+    """
+
+    n_workers = resolve_jobs(workers)
+    if isinstance(jobs, Sized):
+        n_workers = min(n_workers, max(len(jobs), 1))
+
+    jobs = (job if isinstance(job, MarginJob) else MarginJob(*job) for job in jobs)
+    kwargs = add_margin_kwargs or dict()
+
+    if journal is not None:
+        jobs = _record_starts(jobs, journal, kwargs)
+
+    results: dict[int, FileResult] = dict()
+
+    def start(index: int):
+        metrics.file_started()
+        if on_start is not None:
+            on_start(index)
+
+    def collect(job: MarginJob, result: FileResult, n_finished: int):
+        results[result.index] = result
+        if result.trace_events is not None:
+            trace.add_events(result.trace_events)
+            result.trace_events = None
+        if manifest is not None:
+            manifest.record(
+                job.in_path,
+                job.out_path,
+                BulkManifest.create_settings(job.mods, kwargs),
+                result.input_hash,
+            )
+        if journal is not None:
+            journal.record_done(job.in_path)
+        if cache is not None:
+            # Workers only update their own copy of the cache.
+            if n_workers > 1:
+                if result.cache_hit:
+                    cache.hits += 1
+                else:
+                    cache.misses += 1
+            # Evicts in this process, which knows about all stored entries.
+            if result.cache_hit is False:
+                cache.add_stored(result.bytes_out)
+        metrics.file_finished(result)
+        if on_finish is not None:
+            on_finish(result, n_finished)
+
+    def error(index: int, job: MarginJob, e: Exception):
+        # Cancelled jobs stay running in the journal, so they are resumed.
+        if isinstance(e, progress.Cancelled):
+            return
+        if journal is not None:
+            journal.record_failed(job.in_path, e)
+        if not stop_on_error:
+            metrics.file_failed()
+        if on_error is not None:
+            on_error(index, job, e)
+
+    # Only stop tracing allocations in this process if it was started here.
+    stop_profiling = profile_memory and not memory.is_profiling()
+
+    try:
+        with trace.span("process_many", workers=n_workers):
+            _run(
+                jobs,
+                kwargs,
+                cache,
+                n_workers,
+                start,
+                collect,
+                error,
+                profile_memory,
+                on_page,
+                cancel_event,
+                stop_on_error,
+                manifest is not None,
+            )
+    except progress.Cancelled:
+        metrics.run_cancelled()
+        raise
+    except Exception:
+        metrics.run_failed()
+        raise
+    finally:
+        # Also saved on errors, so the finished jobs are not processed again.
+        if manifest is not None:
+            manifest.save()
+        metrics.flush()
+        if stop_profiling and memory.is_profiling():
+            memory.stop_profiling()
+
+    return [results[i] for i in sorted(results.keys())]
+
+
+def _record_starts(
+    jobs: Iterable[MarginJob], journal: "BulkJournal", add_margin_kwargs: dict
+) -> Iterator[MarginJob]:
+    """
+    Records each job in the journal right before it is handed on.
+    """
+
+    for job in jobs:
+        journal.record_start(
+            job.in_path,
+            job.out_path,
+            journal.create_settings(job.mods, add_margin_kwargs),
+        )
+        yield job
+
+
+def process_files(
+    in_paths: list[str],
+    out_paths: list[str],
+    top_mod: float,
+    right_mod: float,
+    bot_mod: float,
+    left_mod: float,
+    jobs: int | str | None = 1,
+    on_start: Callable[[int], None] | None = None,
+    on_finish: Callable[[FileResult, int], None] | None = None,
+    on_error: Callable[[int, MarginJob, Exception], None] | None = None,
+    add_margin_kwargs: dict | None = None,
+    cache: ResultCache | None = None,
+    manifest: BulkManifest | None = None,
+    profile_memory: bool = False,
+    journal: "BulkJournal | None" = None,
+    on_page: Callable[[int, int, int], None] | None = None,
+    cancel_event: progress.CancelEvent | None = None,
+    stop_on_error: bool = True,
+) -> list[FileResult]:
+    """
+    Adds the same margins to every file in :code:`in_paths` and writes the
+    result to the output path with the same index.
+    See :py:func:`process_many` for the remaining arguments.
+
+    Args:
+        in_paths (list[str]):
+        out_paths (list[str]):
+        top_mod (float): top mod as fraction
+        right_mod (float): right mod as fraction
+        bot_mod (float): bot mod as fraction
+        left_mod (float): left mod as fraction
+        jobs (int | str | None): number of worker processes or :code:`"auto"`.
+            See :py:func:`resolve_jobs`.
+
+    Returns:
+        list[FileResult]: one result per successful file in the order of
+            :code:`in_paths`
+    """
+
+    if len(in_paths) != len(out_paths):
+        raise ValueError("The number of input and output files has to match.")
+
+    mods = (top_mod, right_mod, bot_mod, left_mod)
+    margin_jobs = [
+        MarginJob(in_path, out_path, mods)
+        for in_path, out_path in zip(in_paths, out_paths)
+    ]
+
+    return process_many(
+        margin_jobs,
+        workers=jobs,
+        on_start=on_start,
+        on_finish=on_finish,
+        on_error=on_error,
+        add_margin_kwargs=add_margin_kwargs,
+        cache=cache,
+        manifest=manifest,
+        profile_memory=profile_memory,
+        journal=journal,
+        on_page=on_page,
+        cancel_event=cancel_event,
+        stop_on_error=stop_on_error,
+    )
+
+
+def process_stream(
+    source: streams.PdfSource,
+    target: streams.PdfTarget,
+    mods: tuple[float, float, float, float],
+    add_margin_kwargs: dict | None = None,
+) -> FileResult:
+    """
+    Adds the margins to a single PDF, which can also be in memory or come
+    from a stream, like stdin. The cache is not used, and the byte sizes
+    are only known for paths and bytes.
+
+    Args:
+        source (streams.PdfSource): the PDF to modify
+        target (streams.PdfTarget): where the result is written
+        mods (tuple[float, float, float, float]): top, right, bot and left
+            mod as fractions
+        add_margin_kwargs (dict | None): Additional keyword arguments for
+            :py:func:`addnotespace.pdf.add_margin`.
+
+    Returns:
+        FileResult:
+    """
+
+    from addnotespace import pdf
+
+    start = time.perf_counter()
+
+    result = FileResult(
+        index=0, in_path=streams.get_name(source), out_path=streams.get_name(target)
+    )
+    result.bytes_in = streams.get_size(source)
+
+    metrics.file_started()
+
+    try:
+        with trace.span(trace.FILE_SPAN, path=result.in_path):
+            result.n_pages = pdf.add_margin(
+                source, target, *mods, **(add_margin_kwargs or dict())
+            )
+    except Exception:
+        metrics.run_failed()
+        raise
+
+    if streams.is_path(target):
+        result.bytes_out = streams.get_size(target)
+    result.duration = time.perf_counter() - start
+    result.peak_rss = memory.peak_rss_bytes()
+
+    metrics.file_finished(result)
+    metrics.flush()
+
+    return result
+
+
+def _run(
+    jobs: Iterable[MarginJob],
+    kwargs: dict,
+    cache: ResultCache | None,
+    n_workers: int,
+    on_start: Callable[[int], None] | None,
+    collect: Callable[[MarginJob, FileResult, int], None],
+    on_error: Callable[[int, MarginJob, Exception], None] | None = None,
+    profile_memory: bool = False,
+    on_page: Callable[[int, int, int], None] | None = None,
+    cancel_event: progress.CancelEvent | None = None,
+    stop_on_error: bool = True,
+    hash_input: bool = False,
+):
+    """
+    Runs the jobs either in this process or in a process pool and calls
+    :code:`collect` for each finished job. See :py:func:`process_many`.
+    """
+
+    def is_stopping(e: Exception) -> bool:
+        return stop_on_error or isinstance(e, progress.Cancelled)
+
+    def check_cancelled():
+        if cancel_event is not None and cancel_event.is_set():
+            raise progress.Cancelled("Cancelled before the next file.")
+
+    if n_workers == 1:
+        n_finished = 0
+        for i, job in enumerate(jobs):
+            check_cancelled()
+            if on_start is not None:
+                on_start(i)
+            reporter = None
+            if on_page is not None or cancel_event is not None:
+                reporter = progress.PageReporter(i, on_page, cancel_event)
+            try:
+                result = _add_margin_job(
+                    i, job, kwargs, cache, False, profile_memory, reporter, hash_input
+                )
+            except Exception as e:
+                if on_error is not None:
+                    on_error(i, job, e)
+                if is_stopping(e):
+                    raise
+                continue
+            n_finished += 1
+            collect(job, result, n_finished)
+        return
+
+    logger.info(f"Processing files with {n_workers} worker processes.")
+
+    max_pending = n_workers * MAX_PENDING_PER_WORKER
+
+    # The workers record their own events if the trace is enabled here.
+    tracing = trace.is_enabled()
+
+    # Events and queues can only be handed to the workers when they start.
+    worker_event = None if cancel_event is None else multiprocessing.Event()
+    page_queue = None if on_page is None else multiprocessing.Queue()
+    poll_interval = None
+    if worker_event is not None or page_queue is not None:
+        poll_interval = POLL_INTERVAL
+
+    def forward_progress():
+        if worker_event is not None and cancel_event.is_set():
+            worker_event.set()
+        while page_queue is not None:
+            try:
+                on_page(*page_queue.get_nowait())
+            except queue.Empty:
+                break
+
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=progress.init_worker,
+        initargs=(worker_event, page_queue),
+    ) as executor:
+
+        pending: dict[Future, tuple[int, MarginJob]] = dict()
+        n_finished = 0
+
+        def collect_finished():
+            nonlocal n_finished
+            done = set()
+            while len(done) == 0:
+                done, _ = wait(
+                    pending.keys(), timeout=poll_interval, return_when=FIRST_COMPLETED
+                )
+                forward_progress()
+            for future in done:
+                i, job = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if on_error is not None:
+                        on_error(i, job, e)
+                    if is_stopping(e):
+                        raise
+                    continue
+                n_finished += 1
+                collect(job, result, n_finished)
+
+        try:
+            for i, job in enumerate(jobs):
+                if len(pending) >= max_pending:
+                    collect_finished()
+                check_cancelled()
+                if on_start is not None:
+                    on_start(i)
+                future = executor.submit(
+                    _add_margin_job,
+                    i,
+                    job,
+                    kwargs,
+                    cache,
+                    tracing,
+                    profile_memory,
+                    None,
+                    hash_input,
+                )
+                pending[future] = (i, job)
+
+            while len(pending) > 0:
+                collect_finished()
+        except Exception as e:
+            for future in pending.keys():
+                future.cancel()
+            # Stops the running jobs at their next page.
+            if isinstance(e, progress.Cancelled) and worker_event is not None:
+                worker_event.set()
+            raise
+
+
+def get_peak_rss(results: list[FileResult]) -> int | None:
+    """
+    Args:
+        results (list[FileResult]):
+
+    Returns:
+        int | None: The highest peak RSS in bytes of all processes which
+            worked on the files. :code:`None` if it could not be determined.
+    """
+
+    peaks = [r.peak_rss for r in results if r is not None and r.peak_rss is not None]
+    if len(peaks) == 0:
+        return None
+    return max(peaks)
+
+
+def get_summary(results: list[FileResult], cache: ResultCache | None = None) -> str:
+    """
+    Args:
+        results (list[FileResult]):
+        cache (ResultCache | None): the cache used for the run, if any
+
+    Returns:
+        str: f.e. :code:`"peak memory: 42.4 MiB, cache hits: 1, cache misses: 2"`
+    """
+
+    summary = f"peak memory: {memory.format_bytes(get_peak_rss(results))}"
+
+    if cache is not None:
+        summary += f", cache hits: {cache.hits}, cache misses: {cache.misses}"
+        if cache.evictions > 0:
+            summary += f", cache evictions: {cache.evictions}"
+
+    return summary
@@ -0,0 +1,238 @@
+import io
+import os
+from logging import getLogger
+from typing import BinaryIO
+
+import PyPDF2 as pypdf
+
+from addnotespace import streams
+
+
+logger = getLogger(__name__)
+
+#: How many bytes at the end of the file are searched for :code:`startxref`.
+STARTXREF_SEARCH_SIZE = 2048
+
+
+def get_indirect_reference(
+    page: pypdf.PageObject,
+) -> pypdf.generic.IndirectObject | None:
+    """
+    Returns the reference of the page in the file it was read from.
+    The attribute was renamed between PyPDF2 versions.
+
+    Args:
+        page (pypdf.PageObject):
+
+    Returns:
+        pypdf.generic.IndirectObject | None:
+    """
+
+    ref = getattr(page, "indirect_reference", None)
+    if ref is None:
+        ref = getattr(page, "indirect_ref", None)
+    return ref
+
+
+def find_startxref(source: BinaryIO) -> int:
+    """
+    Reads the offset of the last cross reference section of a PDF.
+
+    Args:
+        source (BinaryIO): seekable stream containing the PDF
+
+    Raises:
+        ValueError: If no :code:`startxref` was found.
+
+    Returns:
+        int: byte offset
+    """
+
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(max(size - STARTXREF_SEARCH_SIZE, 0))
+    tail = source.read()
+
+    pos = tail.rfind(b"startxref")
+    if pos == -1:
+        raise ValueError("Could not find 'startxref' in the PDF.")
+
+    return int(tail[pos + len(b"startxref") :].split()[0])
+
+
+def can_write_incremental(reader: pypdf.PdfReader) -> bool:
+    """
+    Checks whether an incremental update can be appended to the file
+    read by the :code:`reader`.
+
+    Encrypted files are excluded, since the updated objects would have
+    to be encrypted as well.
+
+    Args:
+        reader (pypdf.PdfReader):
+
+    Returns:
+        bool:
+    """
+
+    return not reader.is_encrypted
+
+
+def write_incremental_update(
+    reader: pypdf.PdfReader,
+    pages: list[pypdf.PageObject],
+    source: BinaryIO,
+    pdf_out: streams.PdfTarget,
+    in_place: bool = False,
+):
+    """
+    Writes the modified :code:`pages` as an incremental update.
+
+    The original bytes are kept as they are, and a new section with only
+    the page dictionaries, a cross reference table and a trailer pointing
+    to the previous cross reference section is appended. With
+    :code:`in_place` the update is appended to :code:`pdf_out`, which has
+    to be the path the source was read from. Otherwise the original is
+    copied first.
+
+    The pages must not reference any object which is not yet part of the
+    original file, which is the case for pages modified with
+    :py:func:`addnotespace.pdf.expand_mediabox`.
+
+    Args:
+        reader (pypdf.PdfReader): reader of :code:`source`
+        pages (list[pypdf.PageObject]): the modified pages
+        source (BinaryIO): seekable stream of the original PDF
+        pdf_out (streams.PdfTarget): output file or stream
+        in_place (bool): whether :code:`pdf_out` is the original file
+
+    Raises:
+        ValueError: If a page does not belong to the original file.
+    """
+
+    prev_xref = find_startxref(source)
+
+    objects: dict[int, tuple[int, pypdf.PageObject]] = dict()
+    for page in pages:
+        ref = get_indirect_reference(page)
+        if ref is None:
+            raise ValueError("Only pages read from the original file can be updated.")
+        objects[ref.idnum] = (ref.generation, page)
+
+    if in_place:
+        with open(pdf_out, "ab") as fo:
+            fo.seek(0, os.SEEK_END)
+            size = fo.tell()
+            try:
+                _write_update(reader, objects, prev_xref, fo, size)
+            except BaseException:
+                # Leaves the original as it was.
+                fo.truncate(size)
+                raise
+        return
+
+    with streams.open_target(pdf_out) as fo:
+        streams.copy_source(source, fo)
+        _write_update(reader, objects, prev_xref, fo, fo.tell())
+
+
+def _write_update(
+    reader: pypdf.PdfReader,
+    objects: dict[int, tuple[int, pypdf.PageObject]],
+    prev_xref: int,
+    fo: BinaryIO,
+    start: int,
+):
+    """
+    Writes the update section. See :py:func:`write_incremental_update`.
+
+    Args:
+        reader (pypdf.PdfReader): reader of the original
+        objects (dict[int, tuple[int, pypdf.PageObject]]): the generation
+            and page of each updated object number
+        prev_xref (int): offset of the last cross reference section
+        fo (BinaryIO): the output, positioned after the original bytes
+        start (int): number of bytes before the update
+    """
+
+    update = io.BytesIO()
+    update.write(b"\n")
+
+    offsets: dict[int, int] = dict()
+    for idnum in sorted(objects.keys()):
+        generation, page = objects[idnum]
+        offsets[idnum] = start + update.tell()
+        update.write(f"{idnum} {generation} obj\n".encode())
+        page.write_to_stream(update, None)
+        update.write(b"\nendobj\n")
+
+    xref_offset = start + update.tell()
+    update.write(b"xref\n")
+    # The head of the free list is not required in an update, but some
+    # readers expect every table to start with object 0.
+    update.write(b"0 1\n0000000000 65535 f\r\n")
+    for section in _contiguous_sections(sorted(offsets.keys())):
+        update.write(f"{section[0]} {len(section)}\n".encode())
+        for idnum in section:
+            generation = objects[idnum][0]
+            update.write(f"{offsets[idnum]:010} {generation:05} n\r\n".encode())
+
+    update.write(b"trailer\n")
+    _create_trailer(reader, prev_xref).write_to_stream(update, None)
+    update.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+    fo.write(update.getvalue())
+
+
+def _contiguous_sections(idnums: list[int]) -> list[list[int]]:
+    """
+    Splits the sorted object numbers into runs of consecutive numbers,
+    which form the subsections of the cross reference table.
+    """
+
+    sections: list[list[int]] = []
+    for idnum in idnums:
+        if len(sections) > 0 and sections[-1][-1] + 1 == idnum:
+            sections[-1].append(idnum)
+        else:
+            sections.append([idnum])
+    return sections
+
+
+def _create_trailer(
+    reader: pypdf.PdfReader, prev_xref: int
+) -> pypdf.generic.DictionaryObject:
+    """
+    Creates the trailer of the update. Only the entries which are valid for
+    a classic trailer are taken over, since the original trailer might be
+    a cross reference stream dictionary.
+    """
+
+    NameObject = pypdf.generic.NameObject
+
+    trailer = pypdf.generic.DictionaryObject()
+    trailer[NameObject("/Size")] = pypdf.generic.NumberObject(_get_size(reader))
+    trailer[NameObject("/Prev")] = pypdf.generic.NumberObject(prev_xref)
+
+    for key in ("/Root", "/Info", "/ID"):
+        if key in reader.trailer:
+            trailer[NameObject(key)] = reader.trailer.raw_get(key)
+
+    return trailer
+
+
+def _get_size(reader: pypdf.PdfReader) -> int:
+    """
+    Returns the :code:`/Size` of the original trailer. PyPDF2 does not take
+    it over from cross reference streams, so then it is derived from the
+    highest object number.
+    """
+
+    if "/Size" in reader.trailer:
+        return reader.trailer["/Size"]
+
+    idnums = list(reader.xref_objStm.keys())
+    for references in reader.xref.values():
+        idnums.extend(references.keys())
+
+    return max(idnums, default=0) + 1
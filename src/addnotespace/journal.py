@@ -0,0 +1,390 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+from pathlib import Path
+from logging import getLogger
+
+from addnotespace import settings
+
+
+logger = getLogger(__name__)
+
+#: Directory inside :py:data:`addnotespace.settings.CACHE_DIR_PATH` which
+#: holds the journals of all bulk folders, so the folders stay clean.
+JOURNAL_DIR_NAME = "journals"
+
+JOURNAL_FORMAT_VERSION = 2
+
+#: Number of bytes at the start and at the end of an inplace input, which
+#: are hashed before appending to it. See :py:func:`_create_fingerprint`.
+FINGERPRINT_SIZE = 64 * 1024
+
+#: The file was handed to the workers, but did not finish yet.
+STATE_RUNNING = "running"
+
+#: The output was written completely.
+STATE_DONE = "done"
+
+#: Processing the file raised an error.
+STATE_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    in_path TEXT PRIMARY KEY,
+    out_path TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    error TEXT,
+    updated REAL NOT NULL,
+    fingerprint TEXT
+)
+"""
+
+
+class BulkJournal:
+    """
+    Records the state of every file of a bulk run in a SQLite database, so
+    a run which was killed or crashed can be resumed.
+
+    Unlike :py:class:`addnotespace.manifest.BulkManifest`, which is only
+    saved once a run stops, every state change is committed right away.
+    A file only counts as finished once its output was written completely,
+    and it is skipped on resume if its input, output path and settings did
+    not change since.
+
+    The journal is only used by one thread at a time, but that need not be
+    the thread which opened it, f.e. in the GUI.
+    """
+
+    def __init__(self, journal_path: str | Path, resume: bool = False):
+        """
+        Opens or creates the journal at :code:`journal_path`.
+
+        Args:
+            journal_path (str | Path):
+            resume (bool): Whether to keep the entries of the previous run.
+                Otherwise the journal starts empty.
+
+        Raises:
+            sqlite3.Error: If the database can not be opened or created.
+        """
+
+        self.journal_path = Path(journal_path)
+
+        self.connection = sqlite3.connect(
+            self.journal_path, isolation_level=None, check_same_thread=False
+        )
+
+        # WAL with NORMAL sync survives killed processes, and only loses the
+        # last commits on power loss, which then just get processed again.
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != JOURNAL_FORMAT_VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS files")
+            self.connection.execute(f"PRAGMA user_version={JOURNAL_FORMAT_VERSION}")
+
+        self.connection.execute(_SCHEMA)
+
+        if not resume:
+            self.connection.execute("DELETE FROM files")
+
+    @classmethod
+    def for_folder(
+        cls,
+        bulk_folder: str | Path,
+        resume: bool = False,
+        cache_dir: str | Path = settings.CACHE_DIR_PATH,
+    ) -> "BulkJournal":
+        """
+        Args:
+            bulk_folder (str | Path):
+            resume (bool): see :py:meth:`__init__`
+            cache_dir (str | Path): The journal is stored in a subdirectory,
+                named after the absolute path of the bulk folder.
+
+        Returns:
+            BulkJournal: the journal of the bulk folder
+
+        Raises:
+            sqlite3.Error: If the database can not be opened or created.
+            OSError: If the directory of the journals can not be created.
+        """
+
+        journal_dir = Path(cache_dir) / JOURNAL_DIR_NAME
+        journal_dir.mkdir(parents=True, exist_ok=True)
+
+        folder_key = str(Path(bulk_folder).absolute()).encode()
+        journal_name = f"{hashlib.sha256(folder_key).hexdigest()[:32]}.sqlite"
+
+        return cls(journal_dir / journal_name, resume)
+
+    @staticmethod
+    def create_settings(
+        mods: tuple[float, float, float, float], add_margin_kwargs: dict | None
+    ) -> str:
+        """
+        Args:
+            mods (tuple[float, float, float, float]): top, right, bot and left
+                margin fractions
+            add_margin_kwargs (dict | None): options for
+                :py:func:`addnotespace.pdf.add_margin`
+
+        Returns:
+            str: the settings in the form they are stored in
+        """
+
+        return json.dumps(
+            {"mods": list(mods), "options": add_margin_kwargs or dict()},
+            sort_keys=True,
+        )
+
+    def is_finished(
+        self, in_path: str | Path, out_path: str | Path, run_settings: str
+    ) -> bool:
+        """
+        Args:
+            in_path (str | Path): source file
+            out_path (str | Path): output file
+            run_settings (str): see :py:meth:`create_settings`
+
+        Returns:
+            bool: Whether the file was finished by a previous run with the
+                same settings, and neither the input nor the output changed
+                since.
+        """
+
+        in_path = Path(in_path).absolute()
+
+        row = self.connection.execute(
+            "SELECT out_path, settings, size, mtime_ns, state "
+            "FROM files WHERE in_path = ?",
+            (str(in_path),),
+        ).fetchone()
+
+        if row is None:
+            return False
+
+        entry_out_path, entry_settings, size, mtime_ns, state = row
+
+        if state != STATE_DONE or entry_settings != run_settings:
+            return False
+
+        if entry_out_path != str(Path(out_path).absolute()):
+            return False
+
+        if not Path(out_path).exists():
+            return False
+
+        stat = in_path.stat()
+        return stat.st_size == size and stat.st_mtime_ns == mtime_ns
+
+    def record_start(
+        self, in_path: str | Path, out_path: str | Path, run_settings: str
+    ):
+        """
+        Records that :code:`in_path` is being processed to :code:`out_path`.
+        Leftovers of an output which was being written when a previous run
+        died are removed. If that run appended to the file inplace, and the
+        file still starts with what it contained back then, it is truncated
+        to its size from before. A file which was replaced or edited since
+        is processed as it is.
+
+        Args:
+            in_path (str | Path): source file
+            out_path (str | Path): output file
+            run_settings (str): see :py:meth:`create_settings`
+        """
+
+        in_path = Path(in_path).absolute()
+        out_path = Path(out_path).absolute()
+
+        previous = self.connection.execute(
+            "SELECT out_path, size, mtime_ns, state, fingerprint "
+            "FROM files WHERE in_path = ?",
+            (str(in_path),),
+        ).fetchone()
+        if previous is not None and previous[3] == STATE_RUNNING:
+            _remove_partial_outputs(out_path)
+            if previous[0] == str(in_path):
+                _truncate_partial_update(in_path, *previous[1:3], previous[4])
+
+        stat = in_path.stat()
+
+        # Only inplace runs append to their input.
+        fingerprint = None
+        if in_path == out_path:
+            fingerprint = _create_fingerprint(in_path, stat.st_size)
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files "
+            "(in_path, out_path, settings, size, mtime_ns, state, error, updated, "
+            "fingerprint) "
+            "VALUES (?, ?, ?, ?, ?, ?, NULL, ?, ?)",
+            (
+                str(in_path),
+                str(out_path),
+                run_settings,
+                stat.st_size,
+                stat.st_mtime_ns,
+                STATE_RUNNING,
+                time.time(),
+                fingerprint,
+            ),
+        )
+
+    def record_done(self, in_path: str | Path):
+        """
+        Records that the output of :code:`in_path` was written completely.
+        The stat of the input is stored again, since inplace runs changed it.
+
+        Args:
+            in_path (str | Path): source file
+        """
+
+        in_path = Path(in_path).absolute()
+        stat = in_path.stat()
+
+        self.connection.execute(
+            "UPDATE files SET state = ?, size = ?, mtime_ns = ?, updated = ? "
+            "WHERE in_path = ?",
+            (STATE_DONE, stat.st_size, stat.st_mtime_ns, time.time(), str(in_path)),
+        )
+
+    def record_failed(self, in_path: str | Path, error: Exception):
+        """
+        Records that processing :code:`in_path` raised :code:`error`.
+
+        Args:
+            in_path (str | Path): source file
+            error (Exception):
+        """
+
+        self.connection.execute(
+            "UPDATE files SET state = ?, error = ?, updated = ? WHERE in_path = ?",
+            (STATE_FAILED, str(error), time.time(), str(Path(in_path).absolute())),
+        )
+
+    def get_outputs(self) -> set[str]:
+        """
+        Returns:
+            set[str]: The absolute paths of all outputs in the journal,
+                without the files modified inplace.
+        """
+
+        return set(
+            row[0]
+            for row in self.connection.execute(
+                "SELECT out_path FROM files WHERE out_path != in_path"
+            )
+        )
+
+    def get_counts(self) -> dict[str, int]:
+        """
+        Returns:
+            dict[str, int]: the number of files per state
+        """
+
+        return dict(
+            self.connection.execute(
+                "SELECT state, COUNT(*) FROM files GROUP BY state"
+            ).fetchall()
+        )
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        self.connection.close()
+
+
+def _remove_partial_outputs(out_path: Path):
+    """
+    Removes temporary files of :code:`out_path`, which were left behind by
+    a process which died while writing it. See
+    :py:func:`addnotespace.streams.atomic_path`.
+    """
+
+    for tmp_path in out_path.parent.glob(f".{out_path.name}.*.tmp"):
+        try:
+            os.remove(tmp_path)
+            logger.info(f"Removed the partial output '{tmp_path}'.")
+        except OSError as e:
+            logger.warning(f"Could not remove the partial output '{tmp_path}'.\n{e}")
+
+
+def _create_fingerprint(path: Path, size: int) -> str:
+    """
+    Hashes the first and the last :py:data:`FINGERPRINT_SIZE` bytes of the
+    first :code:`size` bytes of the file. Reading all of them would take
+    too long for large scans, and an edited PDF differs at least in its
+    trailer at the end.
+    """
+
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        digest.update(f.read(min(size, FINGERPRINT_SIZE)))
+        f.seek(max(size - FINGERPRINT_SIZE, 0))
+        digest.update(f.read(size - f.tell()))
+
+    return digest.hexdigest()
+
+
+def _truncate_partial_update(
+    in_path: Path, size: int, mtime_ns: int, fingerprint: str | None
+):
+    """
+    Removes what a process which died while appending an incremental
+    update to :code:`in_path` inplace has written after its original
+    :code:`size`, but only if the file still starts with the bytes which
+    had the given :code:`fingerprint` and was not replaced by an older one.
+    """
+
+    stat = in_path.stat()
+    if stat.st_size <= size:
+        return
+
+    if (
+        fingerprint is None
+        or stat.st_mtime_ns < mtime_ns
+        or _create_fingerprint(in_path, size) != fingerprint
+    ):
+        logger.warning(
+            f"'{in_path}' changed after an earlier run died while appending "
+            "to it. It is processed as it is, without removing anything."
+        )
+        return
+
+    with open(in_path, "r+b") as f:
+        f.truncate(size)
+    logger.info(f"Removed a partial incremental update from '{in_path}'.")
+
+
+def open_journal(bulk_folder: str | Path, resume: bool = False) -> BulkJournal | None:
+    """
+    Opens the journal of the bulk folder. Bulk runs work without a journal,
+    so if it can not be opened, f.e. since the cache directory is read only,
+    a warning is logged instead of raising.
+
+    Args:
+        bulk_folder (str | Path):
+        resume (bool): see :py:meth:`BulkJournal.__init__`
+
+    Returns:
+        BulkJournal | None:
+    """
+
+    try:
+        return BulkJournal.for_folder(bulk_folder, resume)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(
+            f"Could not open the journal of '{bulk_folder}'. "
+            f"The run can not be resumed.\n{e}"
+        )
+        return None
@@ -0,0 +1,163 @@
+import io
+import re
+import tempfile
+import importlib.util
+from logging import getLogger
+from typing import BinaryIO
+
+import PyPDF2 as pypdf
+
+from addnotespace import optimize, streams, trace
+
+
+logger = getLogger(__name__)
+
+#: The linearization parameter dictionary has to start within the first
+#: 1024 bytes of a linearized file.
+LINEARIZATION_SEARCH_SIZE = 1024
+
+#: Shown if pikepdf is missing.
+INSTALL_HINT = "Linearizing needs pikepdf. Install it with 'pip install pikepdf'."
+
+_PARAMETER_PATTERN = re.compile(rb"/(L|H|O|E|N|T)\s*(\[[^\]]*\]|\d+)")
+
+
+def is_available() -> bool:
+    """
+    Returns:
+        bool: Whether pikepdf, which writes the linearized files, is installed.
+    """
+    return importlib.util.find_spec("pikepdf") is not None
+
+
+def write_linearized(writer: pypdf.PdfWriter, fo: BinaryIO, optimize_level: str):
+    """
+    Writes the document of the :code:`writer` as a linearized PDF, also
+    known as "fast web view". The catalog, the first page and everything it
+    needs come first, together with hint tables pointing to the other
+    pages, so a viewer can show the first page after a single range request.
+
+    PyPDF2 can not linearize, so the document is written to a temporary
+    file first and then linearized by qpdf through pikepdf. Object streams
+    written with :py:data:`addnotespace.modes.OPTIMIZE_MAX` are kept. The
+    result is checked before it is copied to :code:`fo`.
+
+    Args:
+        writer (pypdf.PdfWriter): writer with all pages added
+        fo (BinaryIO): the output
+        optimize_level (str): see :py:func:`addnotespace.optimize.write_optimized`
+
+    Raises:
+        ImportError: If pikepdf is not installed.
+        ValueError: If the linearized file is invalid.
+    """
+
+    try:
+        import pikepdf
+    except ImportError:
+        raise ImportError(INSTALL_HINT)
+
+    with tempfile.TemporaryFile() as plain, tempfile.TemporaryFile() as linearized:
+
+        optimize.write_optimized(writer, plain, optimize_level)
+        plain.seek(0)
+
+        with trace.span("linearize"), pikepdf.open(plain) as pdf:
+            pdf.save(
+                linearized,
+                linearize=True,
+                object_stream_mode=pikepdf.ObjectStreamMode.preserve,
+            )
+
+        with trace.span("check_linearization"):
+            problems = check_linearization(linearized)
+
+        if len(problems) > 0:
+            raise ValueError("The linearized file is invalid:\n" + "\n".join(problems))
+
+        streams.copy_source(linearized, fo)
+
+
+def read_linearization_parameters(source: BinaryIO) -> dict[str, int | list[int]]:
+    """
+    Reads the linearization parameter dictionary from the start of a PDF.
+
+    Args:
+        source (BinaryIO): seekable stream of the PDF
+
+    Returns:
+        dict[str, int | list[int]]: The parameters, f.e. :code:`L` for the
+            file length and :code:`N` for the number of pages. Empty if the
+            file is not linearized.
+    """
+
+    source.seek(0)
+    head = source.read(LINEARIZATION_SEARCH_SIZE)
+
+    start = head.find(b"/Linearized")
+    if start == -1:
+        return dict()
+
+    end = head.find(b">>", start)
+    if end == -1:
+        return dict()
+
+    parameters: dict[str, int | list[int]] = dict()
+    for key, value in _PARAMETER_PATTERN.findall(head[start:end]):
+        if value.startswith(b"["):
+            parameters[key.decode()] = [int(v) for v in value[1:-1].split()]
+        else:
+            parameters[key.decode()] = int(value)
+
+    return parameters
+
+
+def check_linearization(source: BinaryIO) -> list[str]:
+    """
+    Checks that a PDF is linearized and that its linearization is intact.
+    Appending an incremental update, f.e., keeps the file readable but
+    breaks the linearization.
+
+    The parameters are always checked. If pikepdf is installed, the hint
+    tables and the order of the objects are checked by qpdf as well.
+
+    Args:
+        source (BinaryIO): seekable stream of the PDF
+
+    Returns:
+        list[str]: the problems found, empty if the file is fine
+    """
+
+    parameters = read_linearization_parameters(source)
+    if len(parameters) == 0:
+        return ["The file is not linearized."]
+
+    problems = []
+
+    source.seek(0, io.SEEK_END)
+    size = source.tell()
+    if parameters.get("L") != size:
+        problems.append(
+            f"The file is {size} bytes long, but its linearization "
+            f"parameters say {parameters.get('L')}."
+        )
+
+    for key in ("H", "O", "E", "N", "T"):
+        if key not in parameters:
+            problems.append(f"The linearization parameter /{key} is missing.")
+
+    if not is_available() or len(problems) > 0:
+        return problems
+
+    import pikepdf
+
+    source.seek(0)
+    report = io.StringIO()
+    with pikepdf.open(source) as pdf:
+        if not pdf.check_linearization(report):
+            problems.extend(
+                report.getvalue().splitlines()
+                or ["qpdf found errors in the hint tables or the object order."]
+            )
+
+    return problems
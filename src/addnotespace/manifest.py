@@ -0,0 +1,183 @@
+import os
+import json
+from pathlib import Path
+from logging import getLogger
+
+from addnotespace import settings
+from addnotespace.cache import hash_file
+
+
+logger = getLogger(__name__)
+
+#: Name of the manifest file, which is placed inside the bulk folder.
+MANIFEST_FILE_NAME = ".addnotespace_manifest.json"
+
+MANIFEST_FORMAT_VERSION = 1
+
+
+class BulkManifest:
+    """
+    Remembers which files of a bulk folder were processed with which
+    settings, so later runs can skip files which are up to date.
+
+    For each source file the size, modification time and content hash is
+    stored together with the settings and the output path. A file is up
+    to date if its output still exists, the settings did not change and
+    either its size and modification time are unchanged, or its content
+    hash is unchanged.
+    """
+
+    def __init__(self, manifest_path: str | Path):
+        """
+        Loads the manifest at :code:`manifest_path`. If it does not exist
+        or can not be read, an empty manifest is used.
+
+        Args:
+            manifest_path (str | Path):
+        """
+
+        self.manifest_path = Path(manifest_path)
+        self.entries: dict[str, dict] = dict()
+
+        try:
+            with open(self.manifest_path, "r") as f:
+                content = json.load(f)
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(
+                f"Could not read the manifest '{self.manifest_path}', "
+                f"processing all files again.\n{e}"
+            )
+            return
+
+        if content.get("format") != MANIFEST_FORMAT_VERSION:
+            return
+
+        self.entries = content.get("files", dict())
+
+    @classmethod
+    def for_folder(cls, bulk_folder: str | Path) -> "BulkManifest":
+        """
+        Args:
+            bulk_folder (str | Path):
+
+        Returns:
+            BulkManifest: the manifest of the bulk folder
+        """
+        return cls(Path(bulk_folder) / MANIFEST_FILE_NAME)
+
+    @staticmethod
+    def create_settings(
+        mods: tuple[float, float, float, float], add_margin_kwargs: dict | None
+    ) -> dict:
+        """
+        Args:
+            mods (tuple[float, float, float, float]): top, right, bot and left
+                margin fractions
+            add_margin_kwargs (dict | None): options for
+                :py:func:`addnotespace.pdf.add_margin`
+
+        Returns:
+            dict: the settings in the form they are stored in
+        """
+
+        return {
+            "mods": list(mods),
+            "options": add_margin_kwargs or dict(),
+            "engine": settings.VERSION,
+        }
+
+    def get_outputs(self) -> set[str]:
+        """
+        Returns:
+            set[str]: The absolute paths of all files created by previous runs.
+        """
+        return set(entry["output"] for entry in self.entries.values())
+
+    def is_up_to_date(
+        self, in_path: str | Path, out_path: str | Path, run_settings: dict
+    ) -> bool:
+        """
+        Args:
+            in_path (str | Path): source file
+            out_path (str | Path): output file
+            run_settings (dict): see :py:meth:`create_settings`
+
+        Returns:
+            bool: Whether the output of the source file is up to date.
+        """
+
+        in_path = Path(in_path).absolute()
+        entry = self.entries.get(str(in_path))
+
+        if entry is None:
+            return False
+
+        if entry["settings"] != run_settings:
+            return False
+
+        if entry["output"] != str(Path(out_path).absolute()):
+            return False
+
+        if not Path(out_path).exists():
+            return False
+
+        stat = in_path.stat()
+        if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+
+        if stat.st_size != entry["size"] or hash_file(in_path) != entry["hash"]:
+            return False
+
+        # The content is the same, only the stat changed.
+        entry["mtime_ns"] = stat.st_mtime_ns
+        return True
+
+    def record(
+        self,
+        in_path: str | Path,
+        out_path: str | Path,
+        run_settings: dict,
+        input_hash: str | None = None,
+    ):
+        """
+        Records that :code:`in_path` was processed to :code:`out_path`.
+
+        Args:
+            in_path (str | Path): source file
+            out_path (str | Path): output file
+            run_settings (dict): see :py:meth:`create_settings`
+            input_hash (str | None): :py:func:`addnotespace.cache.hash_file`
+                of the source as it is now. Bulk runs compute it in the
+                worker, so it is only read here if it is missing.
+        """
+
+        in_path = Path(in_path).absolute()
+        stat = in_path.stat()
+
+        if input_hash is None:
+            input_hash = hash_file(in_path)
+
+        self.entries[str(in_path)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": input_hash,
+            "settings": run_settings,
+            "output": str(Path(out_path).absolute()),
+        }
+
+    def save(self):
+        """
+        Writes the manifest. It is written to a temporary file first and
+        then renamed, so an interrupted run does not leave a broken manifest.
+        """
+
+        tmp_path = self.manifest_path.with_name(f"{self.manifest_path.name}.tmp")
+
+        with open(tmp_path, "w+") as f:
+            json.dump(
+                {"format": MANIFEST_FORMAT_VERSION, "files": self.entries}, f, indent=4
+            )
+
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,192 @@
+import gc
+import sys
+import tracemalloc
+from logging import getLogger
+from typing import TYPE_CHECKING
+
+# Only used for type hints. Importing it at runtime would be circular.
+if TYPE_CHECKING:
+    from addnotespace.engine import FileResult
+
+
+logger = getLogger(__name__)
+
+# Traced bytes when the profile of the current file started.
+_traced_at_start = 0
+
+
+def peak_rss_bytes() -> int | None:
+    """
+    Returns the peak resident set size of the current process.
+
+    Returns:
+        int | None: Peak RSS in bytes or :code:`None` if it can not be
+            determined on this platform.
+    """
+
+    try:
+        import resource
+    except ImportError:
+        # The resource module only exists on unix systems.
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return peak
+    return peak * 1024
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak resident set size of the current process, so
+    :py:func:`get_file_peak_rss` only covers what happened afterwards.
+    Only possible on linux.
+
+    Returns:
+        bool: Whether the peak could be reset.
+    """
+
+    try:
+        # see proc(5), writing 5 resets the peak RSS (VmHWM)
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+
+    return True
+
+
+def get_file_peak_rss() -> int | None:
+    """
+    Returns the peak resident set size since the last
+    :py:func:`reset_peak_rss`. If it can not be reset on this platform,
+    the peak of the whole process is returned, which is an upper bound.
+
+    Returns:
+        int | None: peak RSS in bytes or :code:`None` if it can not be
+            determined on this platform.
+    """
+
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    return peak_rss_bytes()
+
+
+def start_file_profile():
+    """
+    Starts measuring the memory needed for a single file. Python
+    allocations are traced with :code:`tracemalloc`, which slows down
+    the processing noticeably.
+    """
+
+    global _traced_at_start
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    # Leftovers of the previous file would otherwise be freed while this
+    # file is processed and hide part of its peak.
+    gc.collect()
+
+    tracemalloc.reset_peak()
+    _traced_at_start, _ = tracemalloc.get_traced_memory()
+    reset_peak_rss()
+
+
+def is_profiling() -> bool:
+    """
+    Returns:
+        bool: Whether Python allocations are currently traced.
+    """
+    return tracemalloc.is_tracing()
+
+
+def stop_profiling():
+    """
+    Stops tracing Python allocations, see :py:func:`start_file_profile`.
+    """
+    tracemalloc.stop()
+
+
+def get_file_profile() -> tuple[int, int | None]:
+    """
+    Returns:
+        tuple[int, int | None]: The peak of Python allocations made since
+            :py:func:`start_file_profile`, not counting the ones which
+            already existed, and the peak RSS, both in bytes.
+    """
+
+    _, peak_traced = tracemalloc.get_traced_memory()
+    return max(peak_traced - _traced_at_start, 0), get_file_peak_rss()
+
+
+def format_memory_report(
+    results: list["FileResult"], threshold: int | None = None, top_n: int = 10
+) -> str:
+    """
+    Lists the files which needed the most memory. The RSS includes the
+    interpreter and the loaded modules, the traced peak only counts
+    allocations made while processing the file.
+
+    Args:
+        results (list[FileResult]): results of a run with memory profiling
+        threshold (int | None): Files whose peak RSS is above this number of
+            bytes are flagged.
+        top_n (int): number of files to list
+
+    Returns:
+        str:
+    """
+
+    profiled = [r for r in results if r.peak_traced is not None]
+    profiled.sort(key=lambda r: -(r.file_peak_rss or r.peak_traced))
+
+    lines = [f"{'peak RSS':>10} {'traced':>10} {'pages':>6}  file"]
+    for result in profiled[:top_n]:
+        is_over = threshold is not None and (result.file_peak_rss or 0) > threshold
+        lines.append(
+            f"{format_bytes(result.file_peak_rss):>10} "
+            f"{format_bytes(result.peak_traced):>10} "
+            f"{result.n_pages if result.n_pages is not None else '-':>6}  "
+            f"{result.in_path}{'  OVER THRESHOLD' if is_over else ''}"
+        )
+
+    if threshold is not None:
+        n_over = sum(1 for r in profiled if (r.file_peak_rss or 0) > threshold)
+        lines.append(
+            f"\n{n_over} of {len(profiled)} files needed more than "
+            f"{format_bytes(threshold)}."
+        )
+
+    return "\n".join(lines)
+
+
+def format_bytes(n_bytes: int | None) -> str:
+    """
+    Formats a number of bytes for display.
+
+    Args:
+        n_bytes (int | None):
+
+    Returns:
+        str: f.e. :code:`"12.3 MiB"` or :code:`"unknown"` for :code:`None`
+    """
+
+    if n_bytes is None:
+        return "unknown"
+
+    value = float(n_bytes)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if value < 1024 or unit == "GiB":
+            break
+        value /= 1024
+
+    return f"{value:.1f} {unit}"
@@ -0,0 +1,334 @@
+import os
+import time
+import threading
+from pathlib import Path
+from logging import getLogger
+from typing import TYPE_CHECKING
+
+# Only used for type hints. Importing it at runtime would be circular.
+if TYPE_CHECKING:
+    from addnotespace.engine import FileResult
+
+
+logger = getLogger(__name__)
+
+#: Prefix of all metric names.
+METRIC_PREFIX = "addnotespace"
+
+#: Content type of the OpenMetrics text format.
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+#: Upper bounds of the per file latency histogram in seconds.
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+#: Minimum seconds between two writes of the textfile while files finish.
+WRITE_INTERVAL = 1.0
+
+#: The registry of this process. :code:`None` while metrics are disabled.
+_registry: "MetricsRegistry | None" = None
+
+#: The server of the :code:`/metrics` endpoint, if one was started.
+_server = None
+
+
+class MetricsRegistry:
+    """
+    Holds the counters, the latency histogram and the queue depth of all
+    runs since the metrics were enabled.
+
+    The values are only updated by the process which hands the jobs to the
+    workers, and read by the thread serving :code:`/metrics`.
+    """
+
+    def __init__(self, textfile_path: str | Path | None = None):
+
+        #: Where the metrics are written, if at all.
+        self.textfile_path = textfile_path
+
+        self.files = 0
+        self.pages = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.failures = 0
+        self.cache_hits = 0
+
+        #: Number of jobs which were started but did not finish yet.
+        self.queue_depth = 0
+
+        #: Observations per bucket of :py:data:`DURATION_BUCKETS`, not
+        #: cumulative. The last entry counts everything above.
+        self.duration_buckets = [0] * (len(DURATION_BUCKETS) + 1)
+        self.duration_sum = 0.0
+
+        self.lock = threading.Lock()
+        self.last_write = 0.0
+
+    def observe_duration(self, seconds: float):
+        """
+        Adds a file latency to the histogram. Needs to hold the lock.
+
+        Args:
+            seconds (float):
+        """
+
+        i = 0
+        while i < len(DURATION_BUCKETS) and seconds > DURATION_BUCKETS[i]:
+            i += 1
+
+        self.duration_buckets[i] += 1
+        self.duration_sum += seconds
+
+    def render(self) -> str:
+        """
+        Returns:
+            str: all metrics in the OpenMetrics text format
+        """
+
+        with self.lock:
+
+            lines = []
+
+            def add_family(name: str, metric_type: str, help_text: str):
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+                lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+
+            def add_counter(name: str, help_text: str, value: int):
+                add_family(name, "counter", help_text)
+                lines.append(f"{METRIC_PREFIX}_{name}_total {value}")
+
+            add_counter("files", "Files processed.", self.files)
+            add_counter("pages", "Pages processed.", self.pages)
+            add_counter("bytes_read", "Bytes of the processed inputs.", self.bytes_in)
+            add_counter("bytes_written", "Bytes of the outputs.", self.bytes_out)
+            add_counter("failures", "Jobs which raised an error.", self.failures)
+            add_counter(
+                "cache_hits", "Files whose result came from the cache.", self.cache_hits
+            )
+
+            add_family("queue_depth", "gauge", "Jobs started but not finished.")
+            lines.append(f"{METRIC_PREFIX}_queue_depth {self.queue_depth}")
+
+            name = f"{METRIC_PREFIX}_file_duration_seconds"
+            add_family("file_duration_seconds", "histogram", "Latency per file.")
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, self.duration_buckets):
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            cumulative += self.duration_buckets[-1]
+            lines.append(f'{name}_bucket{{le="+Inf"}} {cumulative}')
+            lines.append(f"{name}_count {cumulative}")
+            lines.append(f"{name}_sum {self.duration_sum}")
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, force: bool = False):
+        """
+        Writes the metrics to :py:attr:`textfile_path`. The file is replaced
+        atomically, so a collector never reads half of it.
+
+        Args:
+            force (bool): Whether to also write if the last write was less
+                than :py:data:`WRITE_INTERVAL` seconds ago.
+        """
+
+        if self.textfile_path is None:
+            return
+
+        now = time.monotonic()
+        if not force and now - self.last_write < WRITE_INTERVAL:
+            return
+        self.last_write = now
+
+        tmp_path = f"{self.textfile_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w+") as f:
+            f.write(self.render())
+        os.replace(tmp_path, self.textfile_path)
+
+
+def _start_server(port: int):
+    """
+    Serves the metrics of the current registry on :code:`/metrics` in a
+    daemon thread. :code:`http.server` is imported here, since it is only
+    needed when the endpoint is used.
+
+    Args:
+        port (int):
+    """
+
+    global _server
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+
+            registry = _registry
+            if self.path != "/metrics" or registry is None:
+                self.send_error(404)
+                return
+
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args):
+            logger.debug(f"{self.address_string()} {format % args}")
+
+    _server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    logger.info(f"Serving metrics on http://127.0.0.1:{port}/metrics")
+
+
+def is_enabled() -> bool:
+    """
+    Returns:
+        bool: Whether metrics are recorded.
+    """
+    return _registry is not None
+
+
+def enable(
+    textfile_path: str | Path | None = None, port: int | None = None
+) -> MetricsRegistry:
+    """
+    Starts recording metrics.
+
+    Args:
+        textfile_path (str | Path | None): If given, the metrics are written
+            to this file while files finish and on :py:func:`disable`, f.e.
+            for the textfile collector of the node exporter.
+        port (int | None): If given, the metrics are served on
+            :code:`http://127.0.0.1:<port>/metrics` until :py:func:`disable`.
+
+    Returns:
+        MetricsRegistry: the new registry
+    """
+
+    global _registry
+
+    _registry = MetricsRegistry(textfile_path)
+
+    if port is not None and _server is None:
+        _start_server(port)
+
+    return _registry
+
+
+def disable():
+    """
+    Writes the textfile a last time, stops the server and stops recording.
+    """
+
+    global _registry, _server
+
+    if _registry is not None:
+        _registry.write_textfile(force=True)
+
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+
+    _registry = None
+
+
+def file_started():
+    """
+    Records that a job was started or handed to the worker pool.
+    """
+
+    registry = _registry
+    if registry is None:
+        return
+
+    with registry.lock:
+        registry.queue_depth += 1
+
+
+def file_finished(result: "FileResult"):
+    """
+    Records a finished job.
+
+    Args:
+        result (FileResult):
+    """
+
+    registry = _registry
+    if registry is None:
+        return
+
+    with registry.lock:
+        registry.queue_depth = max(registry.queue_depth - 1, 0)
+        registry.files += 1
+        registry.pages += result.n_pages or 0
+        registry.bytes_in += result.bytes_in or 0
+        registry.bytes_out += result.bytes_out or 0
+        registry.cache_hits += int(bool(result.cache_hit))
+        if result.duration is not None:
+            registry.observe_duration(result.duration)
+
+    registry.write_textfile()
+
+
+def flush():
+    """
+    Writes the textfile, independent of when it was last written.
+    Called once a run stops.
+    """
+
+    registry = _registry
+    if registry is not None:
+        registry.write_textfile(force=True)
+
+
+def file_failed():
+    """
+    Records a job which raised an error, while the other jobs go on.
+    """
+
+    registry = _registry
+    if registry is None:
+        return
+
+    with registry.lock:
+        registry.failures += 1
+        registry.queue_depth = max(registry.queue_depth - 1, 0)
+
+    registry.write_textfile(force=True)
+
+
+def run_cancelled():
+    """
+    Records that a run was cancelled. The remaining jobs leave the queue
+    without counting as failures.
+    """
+
+    registry = _registry
+    if registry is None:
+        return
+
+    with registry.lock:
+        registry.queue_depth = 0
+
+    registry.write_textfile(force=True)
+
+
+def run_failed():
+    """
+    Records a job which raised an error. The run stops with it, so the
+    remaining jobs leave the queue.
+    """
+
+    registry = _registry
+    if registry is None:
+        return
+
+    with registry.lock:
+        registry.failures += 1
+        registry.queue_depth = 0
+
+    registry.write_textfile(force=True)
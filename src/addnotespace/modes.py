@@ -0,0 +1,34 @@
+# The modes live in their own module, so the CLI and the validation can
+# use them without importing PyPDF2.
+
+#: Decides per page which mode to use. Prefers :code:`MODE_MEDIABOX`.
+MODE_AUTO = "auto"
+
+#: Places the page onto a new, larger blank page.
+MODE_MERGE = "merge"
+
+#: Only grows the boxes of the page. The content streams are not touched.
+MODE_MEDIABOX = "mediabox"
+
+MODES = (MODE_AUTO, MODE_MERGE, MODE_MEDIABOX)
+
+#: Writes the whole document anew.
+OUTPUT_REWRITE = "rewrite"
+
+#: Appends the modified pages to a copy of the original bytes.
+OUTPUT_INCREMENTAL = "incremental"
+
+OUTPUT_MODES = (OUTPUT_REWRITE, OUTPUT_INCREMENTAL)
+
+#: Writes the objects as PyPDF2 produces them.
+OPTIMIZE_NONE = "none"
+
+#: Compresses streams which are stored uncompressed and drops objects
+#: which are not reachable from the document anymore.
+OPTIMIZE_COMPRESS = "compress"
+
+#: Additionally packs the objects which are no streams into compressed
+#: object streams, indexed by a cross reference stream. Needs PDF 1.5.
+OPTIMIZE_MAX = "max"
+
+OPTIMIZE_LEVELS = (OPTIMIZE_NONE, OPTIMIZE_COMPRESS, OPTIMIZE_MAX)
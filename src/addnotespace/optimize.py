@@ -0,0 +1,358 @@
+import io
+import zlib
+from logging import getLogger
+from typing import BinaryIO
+
+import PyPDF2 as pypdf
+
+from addnotespace import trace
+from addnotespace.modes import OPTIMIZE_NONE, OPTIMIZE_MAX, OPTIMIZE_LEVELS
+
+
+logger = getLogger(__name__)
+
+#: Number of objects packed into a single object stream. More objects
+#: compress better, but readers have to inflate the whole stream to get
+#: a single object out of it.
+OBJECTS_PER_STREAM = 100
+
+#: Object streams and cross reference streams need at least PDF 1.5.
+OBJECT_STREAM_VERSION = (1, 5)
+
+#: Keys which describe the encoding of a stream. They are replaced when
+#: the stream is compressed.
+ENCODING_KEYS = ("/Length", "/Filter", "/DecodeParms")
+
+
+def write_optimized(writer: pypdf.PdfWriter, fo: BinaryIO, level: str):
+    """
+    Writes the document of the :code:`writer` instead of
+    :code:`writer.write(fo)`, with the optimizations of the given level:
+
+    - :py:data:`addnotespace.modes.OPTIMIZE_COMPRESS` compresses streams
+      which are stored uncompressed, like the content of merged pages, and
+      drops objects which are not reachable from the catalog or the info
+      dictionary.
+    - :py:data:`addnotespace.modes.OPTIMIZE_MAX` additionally packs all
+      objects which are no streams into object streams, and replaces the
+      cross reference table by a compressed cross reference stream.
+
+    PyPDF2 can not write object streams, so the objects are serialized here.
+    The writer can not be written again afterwards.
+
+    Args:
+        writer (pypdf.PdfWriter): writer with all pages added
+        fo (BinaryIO): the output, positioned at 0
+        level (str): one of :py:data:`addnotespace.modes.OPTIMIZE_LEVELS`
+
+    Raises:
+        ValueError: If the level is unknown.
+    """
+
+    if level not in OPTIMIZE_LEVELS:
+        raise ValueError(
+            f"Unknown optimization level '{level}'. "
+            f"Choose one of: {', '.join(OPTIMIZE_LEVELS)}"
+        )
+
+    # The keys of encrypted documents depend on the object numbers and
+    # strings inside object streams would need to be encrypted as well.
+    if level == OPTIMIZE_NONE or hasattr(writer, "_encrypt"):
+        writer.write(fo)
+        return
+
+    # Same preparation as PdfWriter.write_stream
+    if not writer._root:
+        writer._root = writer._add_object(writer._root_object)
+    writer._sweep_indirect_references(writer._root)
+
+    with trace.span("prune"):
+        live = find_reachable(writer)
+
+    with trace.span("compress_streams"):
+        n_compressed = compress_streams(writer, live)
+
+    logger.debug(
+        f"Compressed {n_compressed} streams and dropped "
+        f"{len(writer._objects) - len(live)} unreachable objects."
+    )
+
+    if level == OPTIMIZE_MAX:
+        with trace.span("write_object_streams"):
+            _write_with_object_streams(writer, live, fo)
+        return
+
+    with trace.span("write_xref_table"):
+        _write_with_xref_table(writer, live, fo)
+
+
+def find_reachable(writer: pypdf.PdfWriter) -> set[int]:
+    """
+    Args:
+        writer (pypdf.PdfWriter): writer after its references were swept
+
+    Returns:
+        set[int]: the numbers of all objects reachable from the trailer
+    """
+
+    reachable: set[int] = set()
+    stack = [writer._root, writer._info]
+
+    while len(stack) > 0:
+        obj = stack.pop()
+
+        if isinstance(obj, pypdf.generic.IndirectObject):
+            if obj.pdf is not writer or obj.idnum in reachable:
+                continue
+            reachable.add(obj.idnum)
+            stack.append(writer._objects[obj.idnum - 1])
+
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+
+        elif isinstance(obj, list):
+            stack.extend(obj)
+
+    return reachable
+
+
+def compress_streams(writer: pypdf.PdfWriter, live: set[int]) -> int:
+    """
+    Replaces the streams which are stored without a filter by Flate
+    compressed streams, as long as that makes them smaller.
+
+    Args:
+        writer (pypdf.PdfWriter):
+        live (set[int]): numbers of the objects which are written
+
+    Returns:
+        int: number of compressed streams
+    """
+
+    n_compressed = 0
+
+    for idnum in live:
+
+        obj = writer._objects[idnum - 1]
+        if not isinstance(obj, pypdf.generic.DecodedStreamObject) or "/Filter" in obj:
+            continue
+
+        # Content streams of merged pages are serialized from their
+        # operations here.
+        data = obj.get_data()
+        compressed = zlib.compress(data)
+        if len(compressed) >= len(data):
+            continue
+
+        writer._objects[idnum - 1] = _create_stream(obj, compressed)
+        n_compressed += 1
+
+    return n_compressed
+
+
+def _create_stream(
+    dictionary: dict, compressed: bytes
+) -> pypdf.generic.EncodedStreamObject:
+    """
+    Creates a Flate compressed stream with the entries of the
+    :code:`dictionary`, except for the ones describing the encoding.
+    """
+
+    NameObject = pypdf.generic.NameObject
+
+    stream = pypdf.generic.EncodedStreamObject()
+    for key, value in dictionary.items():
+        if key not in ENCODING_KEYS:
+            stream[key] = value
+    stream[NameObject("/Filter")] = NameObject("/FlateDecode")
+    stream._data = compressed
+
+    return stream
+
+
+def get_header(writer: pypdf.PdfWriter, min_version: tuple[int, int]) -> bytes:
+    """
+    Args:
+        writer (pypdf.PdfWriter):
+        min_version (tuple[int, int]): the lowest PDF version of the output
+
+    Returns:
+        bytes: the header of the writer, raised to :code:`min_version`
+    """
+
+    header = writer.pdf_header
+    major, minor = header[len(b"%PDF-") :].split(b".")
+    if (int(major), int(minor)) < min_version:
+        header = f"%PDF-{min_version[0]}.{min_version[1]}".encode()
+
+    # The comment marks the file as binary for transfer programs.
+    return header + b"\n%\xE2\xE3\xCF\xD3\n"
+
+
+def _create_trailer(
+    writer: pypdf.PdfWriter, size: int
+) -> pypdf.generic.DictionaryObject:
+    """
+    Creates the entries shared by the trailer and the cross reference stream.
+    """
+
+    NameObject = pypdf.generic.NameObject
+
+    trailer = pypdf.generic.DictionaryObject()
+    trailer[NameObject("/Size")] = pypdf.generic.NumberObject(size)
+    trailer[NameObject("/Root")] = writer._root
+    trailer[NameObject("/Info")] = writer._info
+    if hasattr(writer, "_ID"):
+        trailer[NameObject("/ID")] = writer._ID
+
+    return trailer
+
+
+def _get_free_list(size: int, live: set[int]) -> dict[int, int]:
+    """
+    Links the numbers of all dropped objects into the free list, which
+    starts at object 0.
+
+    Returns:
+        dict[int, int]: maps each free object number to the next one
+    """
+
+    free = [0] + [idnum for idnum in range(1, size) if idnum not in live]
+    return {idnum: free[(i + 1) % len(free)] for i, idnum in enumerate(free)}
+
+
+def write_object(fo: BinaryIO, idnum: int, obj: pypdf.generic.PdfObject):
+    """
+    Writes :code:`obj` as the indirect object with the number :code:`idnum`.
+
+    Args:
+        fo (BinaryIO): the output
+        idnum (int):
+        obj (pypdf.generic.PdfObject):
+    """
+
+    fo.write(f"{idnum} 0 obj\n".encode())
+    obj.write_to_stream(fo, None)
+    fo.write(b"\nendobj\n")
+
+
+def _write_with_xref_table(writer: pypdf.PdfWriter, live: set[int], fo: BinaryIO):
+    """
+    Writes the live objects followed by a classic cross reference table.
+    """
+
+    fo.write(get_header(writer, (1, 0)))
+
+    offsets: dict[int, int] = dict()
+    for idnum in sorted(live):
+        offsets[idnum] = fo.tell()
+        write_object(fo, idnum, writer._objects[idnum - 1])
+
+    write_xref_table(writer, offsets, fo)
+
+
+def write_xref_table(writer: pypdf.PdfWriter, offsets: dict[int, int], fo: BinaryIO):
+    """
+    Writes a classic cross reference table, the trailer and the end of the
+    file. All objects of the :code:`writer` which were not written are put
+    into the free list.
+
+    Args:
+        writer (pypdf.PdfWriter):
+        offsets (dict[int, int]): maps the number of each written object
+            to its position in :code:`fo`
+        fo (BinaryIO): the output, positioned after the last object
+    """
+
+    size = len(writer._objects) + 1
+    next_free = _get_free_list(size, set(offsets.keys()))
+
+    xref_offset = fo.tell()
+    table = io.BytesIO()
+    table.write(f"xref\n0 {size}\n".encode())
+    for idnum in range(size):
+        if idnum in offsets:
+            table.write(f"{offsets[idnum]:010} 00000 n\r\n".encode())
+        else:
+            generation = 65535 if idnum == 0 else 0
+            table.write(f"{next_free[idnum]:010} {generation:05} f\r\n".encode())
+    fo.write(table.getvalue())
+
+    fo.write(b"trailer\n")
+    _create_trailer(writer, size).write_to_stream(fo, None)
+    fo.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def _write_with_object_streams(writer: pypdf.PdfWriter, live: set[int], fo: BinaryIO):
+    """
+    Writes the streams directly, packs all other live objects into object
+    streams and indexes everything with a cross reference stream.
+    """
+
+    NameObject = pypdf.generic.NameObject
+    NumberObject = pypdf.generic.NumberObject
+
+    fo.write(get_header(writer, OBJECT_STREAM_VERSION))
+
+    # Entries of the cross reference stream: (type, field 2, field 3)
+    entries: dict[int, tuple[int, int, int]] = dict()
+    packed: list[int] = []
+
+    for idnum in sorted(live):
+        obj = writer._objects[idnum - 1]
+        if isinstance(obj, pypdf.generic.StreamObject):
+            entries[idnum] = (1, fo.tell(), 0)
+            write_object(fo, idnum, obj)
+        else:
+            packed.append(idnum)
+
+    next_idnum = len(writer._objects) + 1
+
+    for start in range(0, len(packed), OBJECTS_PER_STREAM):
+        chunk = packed[start : start + OBJECTS_PER_STREAM]
+
+        body = io.BytesIO()
+        index = []
+        for i, idnum in enumerate(chunk):
+            index.append(f"{idnum} {body.tell()}")
+            writer._objects[idnum - 1].write_to_stream(body, None)
+            body.write(b"\n")
+            entries[idnum] = (2, next_idnum, i)
+
+        head = (" ".join(index) + "\n").encode()
+
+        object_stream = _create_stream(dict(), zlib.compress(head + body.getvalue()))
+        object_stream[NameObject("/Type")] = NameObject("/ObjStm")
+        object_stream[NameObject("/N")] = NumberObject(len(chunk))
+        object_stream[NameObject("/First")] = NumberObject(len(head))
+
+        entries[next_idnum] = (1, fo.tell(), 0)
+        write_object(fo, next_idnum, object_stream)
+        next_idnum += 1
+
+    xref_idnum = next_idnum
+    size = xref_idnum + 1
+    xref_offset = fo.tell()
+    entries[xref_idnum] = (1, xref_offset, 0)
+
+    for idnum, next_free in _get_free_list(size, set(entries.keys())).items():
+        entries[idnum] = (0, next_free, 65535 if idnum == 0 else 0)
+
+    # Field 2 holds offsets and object numbers, field 3 indices within an
+    # object stream and generations.
+    width = max(1, (max(e[1] for e in entries.values()).bit_length() + 7) // 8)
+    rows = bytearray()
+    for idnum in range(size):
+        kind, field_2, field_3 = entries[idnum]
+        rows.append(kind)
+        rows += field_2.to_bytes(width, "big")
+        rows += field_3.to_bytes(2, "big")
+
+    xref_stream = _create_stream(_create_trailer(writer, size), zlib.compress(rows))
+    xref_stream[NameObject("/Type")] = NameObject("/XRef")
+    xref_stream[NameObject("/W")] = pypdf.generic.ArrayObject(
+        [NumberObject(1), NumberObject(width), NumberObject(2)]
+    )
+
+    write_object(fo, xref_idnum, xref_stream)
+    fo.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
@@ -1,62 +1,549 @@
+import io
 from pathlib import Path
 from decimal import Decimal
+from dataclasses import dataclass
+
+from logging import getLogger
+from typing import Callable
 
 import PyPDF2 as pypdf
 
+from addnotespace import (
+    dedupe,
+    chunked,
+    streams,
+    trace,
+    optimize,
+    incremental,
+    linearization,
+)
+from addnotespace.modes import (
+    MODE_AUTO,
+    MODE_MERGE,
+    MODE_MEDIABOX,
+    MODES,
+    OUTPUT_REWRITE,
+    OUTPUT_INCREMENTAL,
+    OUTPUT_MODES,
+    OPTIMIZE_MAX,
+    OPTIMIZE_NONE,
+    OPTIMIZE_LEVELS,
+    OPTIMIZE_COMPRESS,
+)
 
-def add_margin(
-    pdf_path: str | Path,
-    pdf_out_path: str | Path,
+
+logger = getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PagePlan:
+    """
+    The precomputed geometry for all pages sharing the same MediaBox.
+    """
+
+    top_margin: Decimal  #:
+    right_margin: Decimal  #:
+    bot_margin: Decimal  #:
+    left_margin: Decimal  #:
+
+    new_width: Decimal  #:
+    new_height: Decimal  #:
+
+    #: The MediaBox grown by the margins as (left, bottom, right, top)
+    expanded_box: tuple[float, float, float, float]
+
+    #: Moves the content of the old page onto the new blank page.
+    transformation: pypdf.Transformation
+
+
+def plan_pages(
+    pages: list[pypdf.PageObject],
+    top_mod: float,
+    right_mod: float,
+    bot_mod: float,
+    left_mod: float,
+) -> list[PagePlan]:
+    """
+    Computes the geometry for every page. Each MediaBox is read only once,
+    and since most documents only contain one or two distinct page sizes,
+    the plans are computed once per distinct MediaBox and then shared.
+
+    Args:
+        pages (list[pypdf.PageObject]):
+        top_mod (float): fraction of height to add to top of pdf slides
+        right_mod (float): fraction of width to add to right of pdf slides
+        bot_mod (float): fraction of height to add to bot of pdf slides
+        left_mod (float): fraction of width to add to left of pdf slides
+
+    Returns:
+        list[PagePlan]: One plan per page in the same order.
+    """
+
+    plans: dict[tuple, PagePlan] = dict()
+    page_plans = []
+
+    for page in pages:
+
+        box = page.mediabox
+        key = (float(box.left), float(box.bottom), float(box.right), float(box.top))
+
+        plan = plans.get(key)
+        if plan is None:
+            plan = _create_plan(box, top_mod, right_mod, bot_mod, left_mod)
+            plans[key] = plan
+
+        page_plans.append(plan)
+
+    return page_plans
+
+
+def _create_plan(
+    box: pypdf.generic.RectangleObject,
     top_mod: float,
     right_mod: float,
     bot_mod: float,
     left_mod: float,
+) -> PagePlan:
+    """
+    Computes the :py:class:`PagePlan` for a single MediaBox.
+    """
+
+    width = box.width
+    height = box.height
+
+    top_margin = height * Decimal(top_mod)
+    right_margin = width * Decimal(right_mod)
+    bot_margin = height * Decimal(bot_mod)
+    left_margin = width * Decimal(left_mod)
+
+    expanded_box = (
+        float(box.left) - float(left_margin),
+        float(box.bottom) - float(bot_margin),
+        float(box.right) + float(right_margin),
+        float(box.top) + float(top_margin),
+    )
+
+    transformation = (
+        pypdf.Transformation().scale(1).translate(float(left_margin), float(bot_margin))
+    )
+
+    return PagePlan(
+        top_margin=top_margin,
+        right_margin=right_margin,
+        bot_margin=bot_margin,
+        left_margin=left_margin,
+        new_width=width + right_margin + left_margin,
+        new_height=height + top_margin + bot_margin,
+        expanded_box=expanded_box,
+        transformation=transformation,
+    )
+
+
+def can_expand_mediabox(page: pypdf.PageObject) -> bool:
+    """
+    Checks whether the margins can be added to the page by only
+    growing its boxes.
+
+    This is the case if the page is not rotated and the visible area
+    (the CropBox) is the entire MediaBox.
+
+    Args:
+        page (pypdf.PageObject):
+
+    Returns:
+        bool:
+    """
+
+    if int(page.get("/Rotate", 0)) % 360 != 0:
+        return False
+
+    if "/CropBox" not in page:
+        return True
+
+    return list(map(float, page.cropbox)) == list(map(float, page.mediabox))
+
+
+def expand_mediabox(page: pypdf.PageObject, plan: PagePlan):
+    """
+    Adds the margins to the page inplace by moving the corners of the
+    MediaBox outwards. The content stays byte-identical, since its
+    coordinate system does not change.
+
+    Args:
+        page (pypdf.PageObject):
+        plan (PagePlan): the geometry of the page
+    """
+
+    # A new object for each page, since pages should not share
+    # the same mutable box.
+    new_box = pypdf.generic.RectangleObject(list(plan.expanded_box))
+
+    page.mediabox = new_box
+    if "/CropBox" in page:
+        page.cropbox = new_box
+
+    # These boxes would otherwise exclude the new margins when
+    # printing or trimming.
+    for box_name in ("/BleedBox", "/TrimBox", "/ArtBox"):
+        if box_name in page:
+            del page[box_name]
+
+
+def merge_onto_blank_page(page: pypdf.PageObject, plan: PagePlan) -> pypdf.PageObject:
+    """
+    Creates a new blank page with the size of the page plus the margins
+    and places the page onto it.
+
+    Args:
+        page (pypdf.PageObject):
+        plan (PagePlan): the geometry of the page
+
+    Returns:
+        pypdf.PageObject: the new page
+    """
+
+    new_page = pypdf.PageObject.create_blank_page(
+        width=plan.new_width, height=plan.new_height
+    )
+
+    with trace.span("merge_page"):
+        new_page.merge_page(page)
+
+    with trace.span("add_transformation"):
+        new_page.add_transformation(plan.transformation)
+
+    return new_page
+
+
+def _create_page(
+    page: pypdf.PageObject,
+    plan: PagePlan,
+    i: int,
+    mode: str,
+    low_memory: bool,
+    pdf_name: str,
+) -> pypdf.PageObject:
+    """
+    Adds the margins to a single page, see :py:func:`add_margin`.
+
+    Returns:
+        pypdf.PageObject: :code:`page` itself if its MediaBox was grown,
+            otherwise the new page it was merged onto.
+
+    Raises:
+        ValueError: If :code:`MODE_MEDIABOX` was requested for a page which
+            does not allow it.
+    """
+
+    use_mediabox = mode != MODE_MERGE and can_expand_mediabox(page)
+
+    if mode == MODE_MEDIABOX and not use_mediabox:
+        raise ValueError(
+            f"Page {i+1} of '{pdf_name}' is rotated or cropped, "
+            f"so mode '{MODE_MEDIABOX}' can not be used."
+        )
+
+    if use_mediabox:
+        with trace.span("expand_mediabox"):
+            expand_mediabox(page, plan)
+        return page
+
+    new_page = merge_onto_blank_page(page, plan)
+
+    if low_memory:
+        # Replaces the parsed list of content operations with a
+        # single encoded stream.
+        with trace.span("compress"):
+            new_page.compress_content_streams()
+
+    return new_page
+
+
+def _write_chunked(
+    reader: pypdf.PdfReader,
+    pages: list[pypdf.PageObject],
+    plans: list[PagePlan],
+    pdf_out_path: streams.PdfTarget,
+    mode: str,
+    optimize_level: str,
+    pdf_name: str,
+    on_page: Callable[[int, int], None] | None,
 ):
+    """
+    Adds the margins and writes the pages every
+    :py:data:`addnotespace.chunked.CHUNK_PAGES` pages, see
+    :py:class:`addnotespace.chunked.ChunkedWriter`. Afterwards the objects
+    the reader parsed for these pages are dropped, and so are the pages
+    in :code:`pages`.
+    """
+
+    n_pages = len(pages)
+
+    with trace.span("write_chunked"), streams.open_target(pdf_out_path) as fo:
+
+        writer = chunked.ChunkedWriter(fo, compress=optimize_level == OPTIMIZE_COMPRESS)
+
+        try:
+            for i, plan in enumerate(plans):
+
+                page = pages[i]
+                pages[i] = None
+
+                new_page = _create_page(page, plan, i, mode, True, pdf_name)
+                writer.add_page(new_page)
+
+                if (i + 1) % chunked.CHUNK_PAGES == 0:
+                    writer.flush()
+                    # Only pages which were not written yet still need them.
+                    reader.resolved_objects.clear()
+
+                if on_page is not None:
+                    on_page(i + 1, n_pages)
+
+            writer.close()
+
+        except BaseException:
+            # Streams passed in would otherwise keep the written chunks.
+            fo.seek(0)
+            fo.truncate()
+            raise
+
+
+def add_margin(
+    pdf_path: streams.PdfSource,
+    pdf_out_path: streams.PdfTarget,
+    top_mod: float,
+    right_mod: float,
+    bot_mod: float,
+    left_mod: float,
+    low_memory: bool = False,
+    mode: str = MODE_AUTO,
+    output_mode: str = OUTPUT_REWRITE,
+    deduplicate: bool = False,
+    optimize_level: str = OPTIMIZE_NONE,
+    linearize: bool = False,
+    on_page: Callable[[int, int], None] | None = None,
+) -> int:
     """
     Adds the margins to a pdf file.
 
+    The input can be a path, the PDF as :code:`bytes` or :code:`memoryview`,
+    or a binary file-like object. The output can be a path or a binary
+    file-like object. Streams which can not be seeked, like pipes, are
+    buffered in memory. Streams passed in are not closed.
+
+    With :code:`MODE_MEDIABOX` only the boxes of each page are grown, which
+    leaves the content streams untouched. :code:`MODE_MERGE` places each
+    page onto a new blank page instead, which parses and rewrites the
+    content. :code:`MODE_AUTO` uses the MediaBox expansion for each page
+    where :py:func:`can_expand_mediabox` allows it and merges the rest.
+
+    In the :code:`low_memory` mode the merged content of each page is
+    compressed right after it was created, and rewritten documents are
+    written in chunks of pages, see :py:class:`addnotespace.chunked.ChunkedWriter`.
+    The objects of written pages are dropped on both the reading and the
+    writing side, so the memory is bounded by the size of a chunk, plus a
+    few bytes per object. Deduplication, linearization,
+    :code:`OPTIMIZE_MAX` and incremental updates need all pages at once,
+    so with them only the merged content is compressed early.
+
+    With :code:`OUTPUT_INCREMENTAL` the original bytes are copied and only
+    the modified page dictionaries are appended as an incremental update.
+    If :code:`pdf_out_path` is :code:`pdf_path`, the file is patched inplace.
+    This only works if no page had to be merged and the file is not
+    encrypted. Otherwise the whole document is rewritten.
+
+    If :code:`deduplicate` is set, objects with identical content, like
+    fonts and images repeated on overlay slides, are written only once
+    when the document is rewritten.
+
+    :code:`optimize_level` shrinks rewritten documents further, see
+    :py:func:`addnotespace.optimize.write_optimized`. Incremental updates
+    only append the page dictionaries and are not optimized.
+
+    If :code:`linearize` is set, the document is always rewritten and saved
+    linearized, see :py:func:`addnotespace.linearization.write_linearized`.
+    Appending an incremental update would break the linearization.
+
+    :code:`on_page` is called after each page with the number of processed
+    pages and the number of pages. An error raised by it, like
+    :py:class:`addnotespace.progress.Cancelled`, stops the processing
+    without leaving a partial output. Paths are only replaced once the
+    document was written completely, and streams which received chunks
+    are truncated again.
+
     Args:
-        pdf_path (str | Path): PDF which should be modified
-        pdf_out_path (str | Path): output PDF
+        pdf_path (streams.PdfSource): PDF which should be modified
+        pdf_out_path (streams.PdfTarget): output PDF
         top_mod (int): fraction of height to add to top of pdf slides
         right_mod (int): fraction of width to add to right of pdf slides
         bot_mod (int): fraction of height to add to bot of pdf slides
         left_mod (int): fraction of width to add to left of pdf slides
+        low_memory (bool): Whether to write the pages in chunks and compress
+            merged content streams early.
+        mode (str): One of :code:`MODES`.
+        output_mode (str): One of :code:`OUTPUT_MODES`.
+        deduplicate (bool): Whether to write identical objects only once.
+        optimize_level (str): One of :code:`OPTIMIZE_LEVELS`.
+        linearize (bool): Whether to write a linearized PDF for fast web view.
+        on_page (Callable[[int, int], None] | None): progress callback
+
+    Returns:
+        int: The number of pages.
+
+    Raises:
+        ValueError: If the mode, output mode or optimization level is unknown,
+            :code:`MODE_MEDIABOX` was requested for a page which does not
+            allow it, the file should be modified inplace but no
+            incremental update can be written, or the linearized output
+            is invalid.
+        ImportError: If :code:`linearize` is set, but pikepdf is missing.
     """
 
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}'. Choose one of: {', '.join(MODES)}")
+
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(
+            f"Unknown output mode '{output_mode}'. "
+            f"Choose one of: {', '.join(OUTPUT_MODES)}"
+        )
+
+    if optimize_level not in OPTIMIZE_LEVELS:
+        raise ValueError(
+            f"Unknown optimization level '{optimize_level}'. "
+            f"Choose one of: {', '.join(OPTIMIZE_LEVELS)}"
+        )
+
+    is_in_place = (
+        streams.is_path(pdf_path)
+        and streams.is_path(pdf_out_path)
+        and Path(pdf_out_path).resolve() == Path(pdf_path).resolve()
+    )
+
+    pdf_name = streams.get_name(pdf_path)
+
+    if linearize and is_in_place:
+        raise ValueError(
+            f"'{pdf_name}' can not be linearized inplace, since that needs "
+            "the whole file to be rewritten."
+        )
+
     writer = pypdf.PdfWriter()
 
-    with open(pdf_path, "rb") as f:
+    with streams.open_source(pdf_path) as f:
 
-        pdf = pypdf.PdfReader(f, strict=False)
-        nmbr_pages = len(pdf.pages)
+        with trace.span("read"):
+            pdf = pypdf.PdfReader(f, strict=False)
+            pages = list(pdf.pages)
 
-        for i in range(nmbr_pages):
+        with trace.span("plan"):
+            plans = plan_pages(pages, top_mod, right_mod, bot_mod, left_mod)
 
-            top_margin = pdf.pages[i].mediabox.height * Decimal(top_mod)
-            right_margin = pdf.pages[i].mediabox.width * Decimal(right_mod)
-            bot_margin = pdf.pages[i].mediabox.height * Decimal(bot_mod)
-            left_margin = pdf.pages[i].mediabox.width * Decimal(left_mod)
+        use_incremental = (
+            output_mode == OUTPUT_INCREMENTAL
+            and not linearize
+            and incremental.can_write_incremental(pdf)
+        )
 
-            page = pdf.pages[i]
+        # Pages are written in chunks only if the document is rewritten
+        # anyway and nothing needs all pages at once.
+        use_chunks = (
+            low_memory
+            and not is_in_place
+            and not (use_incremental and mode != MODE_MERGE)
+            and not deduplicate
+            and not linearize
+            and optimize_level != OPTIMIZE_MAX
+        )
 
-            new_width = page.mediabox.width + right_margin + left_margin
-            new_height = page.mediabox.height + top_margin + bot_margin
+        if use_chunks:
+            _write_chunked(
+                pdf, pages, plans, pdf_out_path, mode, optimize_level, pdf_name, on_page
+            )
+            return len(plans)
 
-            new_page = pypdf.PageObject.create_blank_page(
-                width=new_width, height=new_height
+        if low_memory:
+            logger.info(
+                f"Writing '{pdf_name}' at once, since the chosen options "
+                "need all pages in memory."
             )
-            new_page.merge_page(page)
 
-            transform = (
-                pypdf.Transformation()
-                .scale(1)
-                .translate(float(left_margin), float(bot_margin))
+        new_pages = []
+        for i, (page, plan) in enumerate(zip(pages, plans)):
+
+            new_page = _create_page(page, plan, i, mode, low_memory, pdf_name)
+
+            # merged pages are new objects, which the update can not contain
+            if new_page is not page:
+                use_incremental = False
+
+            new_pages.append(new_page)
+            if on_page is not None:
+                on_page(i + 1, len(pages))
+
+        if use_incremental:
+            with trace.span("write_incremental"):
+                incremental.write_incremental_update(
+                    pdf, new_pages, f, pdf_out_path, in_place=is_in_place
+                )
+            return len(new_pages)
+
+        if is_in_place:
+            raise ValueError(
+                f"'{pdf_name}' can not be modified inplace, since no "
+                "incremental update could be created for it."
+            )
+
+        if output_mode == OUTPUT_INCREMENTAL and not linearize:
+            logger.info(
+                f"Could not create an incremental update for '{pdf_name}'. "
+                "Rewriting the whole file instead."
             )
-            new_page.add_transformation(transform)
 
-            writer.add_page(new_page)
+        if deduplicate:
+            with trace.span("deduplicate"):
+                dedupe.deduplicate_pages(new_pages)
+
+        # The pages are only added now, since adding them modifies their
+        # /Parent entry, which must stay untouched for incremental updates.
+        with trace.span("add_pages"):
+            for new_page in new_pages:
+                writer.add_page(new_page)
 
         # input file has to be accessible when writing!
-        with open(pdf_out_path, "wb+") as fo:
-            writer.write(fo)
+        with trace.span("write"), streams.open_target(pdf_out_path) as fo:
+            if linearize:
+                linearization.write_linearized(writer, fo, optimize_level)
+            else:
+                optimize.write_optimized(writer, fo, optimize_level)
+
+    return len(new_pages)
+
+
+def add_margin_to_bytes(
+    pdf: bytes | bytearray | memoryview,
+    top_mod: float,
+    right_mod: float,
+    bot_mod: float,
+    left_mod: float,
+    **kwargs,
+) -> bytes:
+    """
+    Adds the margins to a PDF in memory, without touching the disk.
+
+    Args:
+        pdf (bytes | bytearray | memoryview): the PDF
+        top_mod (int): fraction of height to add to top of pdf slides
+        right_mod (int): fraction of width to add to right of pdf slides
+        bot_mod (int): fraction of height to add to bot of pdf slides
+        left_mod (int): fraction of width to add to left of pdf slides
+        **kwargs: see :py:func:`add_margin`
+
+    Returns:
+        bytes: the modified PDF
+    """
+
+    out = io.BytesIO()
+    add_margin(pdf, out, top_mod, right_mod, bot_mod, left_mod, **kwargs)
+    return out.getvalue()
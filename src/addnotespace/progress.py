@@ -0,0 +1,130 @@
+import time
+from logging import getLogger
+from typing import Callable, Protocol
+
+
+logger = getLogger(__name__)
+
+#: Minimum seconds between two page reports of the same file. The last
+#: page is always reported.
+PAGE_REPORT_INTERVAL = 0.1
+
+#: Set in worker processes by :py:func:`init_worker`.
+_worker_cancel_event: "CancelEvent | None" = None
+
+#: Set in worker processes by :py:func:`init_worker`.
+_worker_page_queue = None
+
+
+class CancelEvent(Protocol):
+    """
+    Anything with an :code:`is_set()` method, like :code:`threading.Event`
+    or :code:`multiprocessing.Event`.
+    """
+
+    def is_set(self) -> bool:
+        ...
+
+
+class Cancelled(Exception):
+    """
+    Raised between two pages once the run was cancelled. Nothing of the
+    file which was being processed is written.
+    """
+
+
+class PageReporter:
+    """
+    Called by :py:func:`addnotespace.pdf.add_margin` after every page of a
+    file. Checks whether the run was cancelled and passes the progress on,
+    but at most every :code:`interval` seconds, so a receiver like the Qt
+    event loop is not flooded with reports of small pages.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        on_page: Callable[[int, int, int], None] | None = None,
+        cancel_event: CancelEvent | None = None,
+        interval: float = PAGE_REPORT_INTERVAL,
+    ):
+        """
+        Args:
+            index (int): position of the file in the input list
+            on_page (Callable[[int, int, int], None] | None): Called with the
+                index, the number of processed pages and the number of pages.
+            cancel_event (CancelEvent | None): If it is set,
+                :py:class:`Cancelled` is raised at the next page.
+            interval (float): minimum seconds between two reports
+        """
+
+        self.index = index
+        self.on_page = on_page
+        self.cancel_event = cancel_event
+        self.interval = interval
+
+        #: Time of the last report
+        self.last_report = 0.0
+
+    def __call__(self, n_done: int, n_pages: int):
+        """
+        Args:
+            n_done (int): number of processed pages
+            n_pages (int): number of pages of the file
+
+        Raises:
+            Cancelled: If the run was cancelled.
+        """
+
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise Cancelled(f"Cancelled after {n_done} of {n_pages} pages.")
+
+        if self.on_page is None:
+            return
+
+        now = time.monotonic()
+        if n_done < n_pages and now - self.last_report < self.interval:
+            return
+
+        self.last_report = now
+        self.on_page(self.index, n_done, n_pages)
+
+
+def init_worker(cancel_event: CancelEvent | None, page_queue):
+    """
+    Initializer of worker processes, which receive the cancel event and the
+    queue for the page reports this way, since both can not be pickled
+    with each job.
+
+    Args:
+        cancel_event (CancelEvent | None): a :code:`multiprocessing.Event`
+        page_queue (multiprocessing.Queue | None): the reports are put into
+            it as tuples of index, processed pages and pages
+    """
+
+    global _worker_cancel_event, _worker_page_queue
+
+    _worker_cancel_event = cancel_event
+    _worker_page_queue = page_queue
+
+
+def create_worker_reporter(index: int) -> PageReporter | None:
+    """
+    Args:
+        index (int): position of the file in the input list
+
+    Returns:
+        PageReporter | None: The reporter for a file processed in a worker
+            process. :code:`None` if neither progress nor cancellation was
+            requested.
+    """
+
+    if _worker_cancel_event is None and _worker_page_queue is None:
+        return None
+
+    on_page = None if _worker_page_queue is None else _put_page_report
+    return PageReporter(index, on_page, _worker_cancel_event)
+
+
+def _put_page_report(index: int, n_done: int, n_pages: int):
+    _worker_page_queue.put((index, n_done, n_pages))
@@ -0,0 +1,595 @@
+import io
+import json
+import time
+import signal
+import asyncio
+import dataclasses
+from logging import getLogger
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from addnotespace import engine, metrics, modes, settings, validation
+from addnotespace.defaults import NoteValues
+
+
+logger = getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+#: Largest accepted PDF in MB, if nothing else is configured.
+DEFAULT_MAX_UPLOAD_MB = 100
+
+#: Requests in flight per worker process, if nothing else is configured.
+#: Requests above the limit are rejected with 503.
+DEFAULT_REQUESTS_PER_WORKER = 4
+
+#: Seconds a client may take to send the head or the body of a request.
+REQUEST_TIMEOUT = 30
+
+#: Size of the chunks in which the response body is written.
+RESPONSE_CHUNK_SIZE = 256 * 1024
+
+#: Longest accepted request line or header line.
+MAX_LINE_SIZE = 8 * 1024
+
+#: Most header lines accepted per request.
+MAX_HEADERS = 100
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    411: "Length Required",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    431: "Request Header Fields Too Large",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    """
+    Ends a request with the given status and message.
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclasses.dataclass
+class Request:
+    """
+    The parsed head of a HTTP request.
+    """
+
+    method: str  #:
+    path: str  #:
+    query: dict[str, list[str]]  #:
+    headers: dict[str, str]  #: with lower case names
+    version: str  #:
+
+    @property
+    def keep_alive(self) -> bool:
+        """
+        Whether the connection stays open after the response.
+        """
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+def _ignore_interrupts():
+    """
+    Initializer of the worker processes. Ctrl+C reaches the whole process
+    group, but only the server should react to it and shut the pool down.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def add_margin_worker(
+    data: bytes, mods: tuple[float, float, float, float], add_margin_kwargs: dict
+) -> tuple[bytes, int]:
+    """
+    Worker entry point. Needs to be a module level function so it can be
+    pickled for the process pool.
+
+    Args:
+        data (bytes): the uploaded PDF
+        mods (tuple[float, float, float, float]): top, right, bot and left
+            mod as fractions
+        add_margin_kwargs (dict): see :py:func:`addnotespace.pdf.add_margin`
+
+    Returns:
+        tuple[bytes, int]: the padded PDF and its number of pages
+    """
+
+    # Imported here, so PyPDF2 is only loaded by the worker processes.
+    from addnotespace import pdf
+
+    out = io.BytesIO()
+    n_pages = pdf.add_margin(data, out, *mods, **add_margin_kwargs)
+    return out.getvalue(), n_pages
+
+
+class MarginServer:
+    """
+    A small HTTP server which adds margins to uploaded PDFs.
+
+    :code:`POST /margin` takes the PDF as body. The margins in percent and
+    the modes are taken from the query, f.e.
+    :code:`/margin?left=50&mode=auto`, and default to the given values.
+    The padded PDF is sent back. :code:`GET /health` reports the state of
+    the server as JSON.
+
+    The PDFs are processed in a process pool, so the event loop only
+    handles the connections. If a worker process dies, f.e. since it was
+    killed for using too much memory, the pool can not be used anymore. It
+    is replaced by a new one, and only the requests which were processed
+    by the old pool are answered with 503.
+    """
+
+    def __init__(
+        self,
+        values: NoteValues,
+        workers: int = 1,
+        max_upload_bytes: int = DEFAULT_MAX_UPLOAD_MB * 2**20,
+        max_requests: int | None = None,
+    ):
+        """
+        Args:
+            values (NoteValues): defaults for requests which do not set
+                every option
+            workers (int): number of worker processes
+            max_upload_bytes (int): largest accepted PDF
+            max_requests (int | None): Requests processed or waiting for a
+                worker at the same time. Further requests are answered with
+                503. Defaults to :py:data:`DEFAULT_REQUESTS_PER_WORKER`
+                per worker.
+        """
+
+        self.values = values
+        self.workers = workers
+        self.max_upload_bytes = max_upload_bytes
+        self.max_requests = max_requests or workers * DEFAULT_REQUESTS_PER_WORKER
+
+        #: Requests which were accepted and are not answered yet.
+        self.active = 0
+
+        #: Number of padded PDFs sent back.
+        self.n_processed = 0
+
+        #: Number of requests answered with an error status.
+        self.n_failed = 0
+
+        #: Number of times a broken pool was replaced.
+        self.n_pool_restarts = 0
+
+        self.started = time.monotonic()
+        self.executor: ProcessPoolExecutor | None = None
+
+    def create_executor(self) -> ProcessPoolExecutor:
+        """
+        Returns:
+            ProcessPoolExecutor: a new pool with :code:`workers` processes
+        """
+        return ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_ignore_interrupts
+        )
+
+    def is_pool_broken(self) -> bool:
+        """
+        Returns:
+            bool: Whether a worker of the current pool died. The pool
+                notices that on its own, also while it is idle.
+        """
+        return self.executor is not None and self.executor._broken is not False
+
+    def replace_broken_pool(self, broken: ProcessPoolExecutor):
+        """
+        Replaces the pool by a new one, unless that already happened for
+        another request which was processed by the same pool.
+
+        Args:
+            broken (ProcessPoolExecutor): the pool which broke
+        """
+
+        if self.executor is not broken:
+            return
+
+        logger.warning("A worker process died. Replacing the process pool.")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+        self.executor = self.create_executor()
+        self.n_pool_restarts += 1
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """
+        Serves requests until cancelled.
+
+        Args:
+            host (str):
+            port (int):
+        """
+
+        self.executor = self.create_executor()
+
+        try:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            async with server:
+                print(
+                    f"Serving on http://{host}:{port} with {self.workers} "
+                    "workers. Press Ctrl+C to stop."
+                )
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        """
+        Answers the requests of a single connection.
+
+        Args:
+            reader (asyncio.StreamReader):
+            writer (asyncio.StreamWriter):
+        """
+
+        try:
+            keep_alive = True
+            while keep_alive:
+                keep_alive = await self.handle_request(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> bool:
+        """
+        Reads and answers a single request.
+
+        Returns:
+            bool: Whether the connection can be used for another request.
+        """
+
+        try:
+            request = await asyncio.wait_for(read_head(reader), REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            await self.send_error(writer, HttpError(408, "Timed out."), False)
+            return False
+        except HttpError as e:
+            await self.send_error(writer, e, False)
+            return False
+
+        if request is None:
+            return False
+
+        try:
+            if request.path == "/health":
+                if request.method != "GET":
+                    raise HttpError(405, "Use GET.")
+                await self.send(
+                    writer,
+                    200,
+                    json.dumps(self.get_health()).encode(),
+                    "application/json",
+                    request.keep_alive,
+                )
+                return request.keep_alive
+
+            if request.path == "/margin":
+                if request.method != "POST":
+                    raise HttpError(405, "Use POST.")
+                await self.handle_margin(request, reader, writer)
+                return request.keep_alive
+
+            raise HttpError(404, f"Unknown path '{request.path}'.")
+
+        except HttpError as e:
+            # The body of a rejected request is not read, so the
+            # connection can not be used again.
+            await self.send_error(writer, e, False)
+            return False
+
+    async def handle_margin(
+        self,
+        request: Request,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ):
+        """
+        Adds the margins to the uploaded PDF and sends it back.
+
+        Raises:
+            HttpError: If the request is invalid or can not be processed.
+        """
+
+        n_bytes = get_content_length(request, self.max_upload_bytes)
+        mods, add_margin_kwargs = self.get_options(request)
+
+        if self.active >= self.max_requests:
+            raise HttpError(503, "Too many requests. Try again later.")
+
+        self.active += 1
+        metrics.file_started()
+
+        try:
+            try:
+                data = await asyncio.wait_for(
+                    reader.readexactly(n_bytes), REQUEST_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                raise HttpError(408, "Timed out while reading the PDF.")
+
+            result = engine.FileResult(
+                index=self.n_processed, in_path="<upload>", out_path="<response>"
+            )
+            result.bytes_in = n_bytes
+
+            if self.is_pool_broken():
+                self.replace_broken_pool(self.executor)
+            executor = self.executor
+
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            try:
+                out, result.n_pages = await loop.run_in_executor(
+                    executor, add_margin_worker, data, mods, add_margin_kwargs
+                )
+            except BrokenProcessPool:
+                self.replace_broken_pool(executor)
+                raise HttpError(503, "A worker process died. Try again later.")
+            except Exception as e:
+                logger.info(f"Could not process an upload: {e}")
+                raise HttpError(422, f"Could not process the PDF: {e}")
+
+            result.duration = time.perf_counter() - start
+            result.bytes_out = len(out)
+
+        except Exception:
+            # Also covers clients which disconnect during the upload.
+            metrics.file_failed()
+            raise
+        finally:
+            self.active -= 1
+
+        metrics.file_finished(result)
+        self.n_processed += 1
+
+        await self.send(writer, 200, out, "application/pdf", request.keep_alive)
+
+    def get_options(
+        self, request: Request
+    ) -> tuple[tuple[float, float, float, float], dict]:
+        """
+        Reads the margins and modes from the query of the request.
+
+        Raises:
+            HttpError: If an option is invalid.
+
+        Returns:
+            tuple[tuple[float, float, float, float], dict]: the mods and
+                the keyword arguments for
+                :py:func:`addnotespace.pdf.add_margin`
+        """
+
+        values = dataclasses.replace(self.values)
+
+        def get_option(name: str, default: str) -> str:
+            return request.query.get(name, [default])[-1]
+
+        try:
+            values.margin_top = int(get_option("top", values.margin_top))
+            values.margin_right = int(get_option("right", values.margin_right))
+            values.margin_bot = int(get_option("bot", values.margin_bot))
+            values.margin_left = int(get_option("left", values.margin_left))
+        except ValueError:
+            raise HttpError(400, "The margins need to be integers.")
+
+        margin_error = validation.validate_margin_values(values)
+        if margin_error is not None:
+            raise HttpError(400, margin_error)
+
+        values.margin_mode = get_option("mode", values.margin_mode)
+        if values.margin_mode not in modes.MODES:
+            raise HttpError(400, f"Choose a mode of: {', '.join(modes.MODES)}")
+
+        values.output_mode = get_option("output_mode", values.output_mode)
+        if values.output_mode not in modes.OUTPUT_MODES:
+            raise HttpError(
+                400, f"Choose an output mode of: {', '.join(modes.OUTPUT_MODES)}"
+            )
+
+        values.optimize_level = get_option("optimize", values.optimize_level)
+        if values.optimize_level not in modes.OPTIMIZE_LEVELS:
+            raise HttpError(
+                400, f"Choose an optimization of: {', '.join(modes.OPTIMIZE_LEVELS)}"
+            )
+
+        linearize = get_option("linearize", str(int(values.linearize)))
+        if linearize not in ("0", "1"):
+            raise HttpError(400, "linearize has to be 0 or 1.")
+        values.linearize = linearize == "1"
+
+        linearize_error = validation.validate_linearize(values)
+        if linearize_error is not None:
+            raise HttpError(400, linearize_error)
+
+        return engine.get_mods(values), engine.get_add_margin_kwargs(values)
+
+    def get_health(self) -> dict:
+        """
+        Returns:
+            dict: the state of the server
+        """
+
+        pool_broken = self.is_pool_broken()
+
+        return {
+            "status": "degraded" if pool_broken else "ok",
+            "version": settings.VERSION,
+            "workers": self.workers,
+            "pool_broken": pool_broken,
+            "pool_restarts": self.n_pool_restarts,
+            "active_requests": self.active,
+            "max_requests": self.max_requests,
+            "processed": self.n_processed,
+            "failed": self.n_failed,
+            "uptime_seconds": round(time.monotonic() - self.started, 3),
+        }
+
+    async def send(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        body: bytes,
+        content_type: str,
+        keep_alive: bool,
+    ):
+        """
+        Sends a response. The body is written in chunks, so slow clients
+        do not make the transport buffer the whole PDF at once.
+        """
+
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        )
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+
+        writer.write(f"{head}\r\n".encode())
+
+        view = memoryview(body)
+        for offset in range(0, len(body), RESPONSE_CHUNK_SIZE):
+            writer.write(view[offset : offset + RESPONSE_CHUNK_SIZE])
+            await writer.drain()
+
+        await writer.drain()
+
+    async def send_error(
+        self, writer: asyncio.StreamWriter, error: HttpError, keep_alive: bool
+    ):
+        """
+        Sends the message of the error as plain text.
+        """
+
+        self.n_failed += 1
+        body = f"{error.message}\n".encode()
+        await self.send(
+            writer, error.status, body, "text/plain; charset=utf-8", keep_alive
+        )
+
+
+async def read_head(reader: asyncio.StreamReader) -> Request | None:
+    """
+    Reads the request line and the headers.
+
+    Raises:
+        HttpError: If the head is malformed or too large.
+
+    Returns:
+        Request | None: :code:`None` if the client closed the connection
+            before sending a request.
+    """
+
+    async def read_line() -> str:
+        try:
+            line = await reader.readuntil(b"\r\n")
+        except asyncio.LimitOverrunError:
+            raise HttpError(431, "Line too long.")
+        if len(line) > MAX_LINE_SIZE:
+            raise HttpError(431, "Line too long.")
+        return line[:-2].decode("latin-1")
+
+    try:
+        request_line = await read_line()
+    except asyncio.IncompleteReadError:
+        return None
+
+    try:
+        method, target, version = request_line.split(" ")
+    except ValueError:
+        raise HttpError(400, "Malformed request line.")
+
+    headers = dict()
+    while True:
+        line = await read_line()
+        if line == "":
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HttpError(431, "Too many headers.")
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    url = urlsplit(target)
+    return Request(method, url.path, parse_qs(url.query), headers, version)
+
+
+def get_content_length(request: Request, max_bytes: int) -> int:
+    """
+    Raises:
+        HttpError: If the length is missing, invalid or above
+            :code:`max_bytes`.
+
+    Returns:
+        int: the length of the request body
+    """
+
+    if "transfer-encoding" in request.headers:
+        raise HttpError(411, "Chunked uploads are not supported.")
+
+    try:
+        n_bytes = int(request.headers["content-length"])
+    except (KeyError, ValueError):
+        raise HttpError(411, "A Content-Length is required.")
+
+    if n_bytes <= 0:
+        raise HttpError(400, "The PDF is missing.")
+
+    if n_bytes > max_bytes:
+        raise HttpError(413, f"PDFs may be at most {max_bytes // 2**20} MB.")
+
+    return n_bytes
+
+
+def serve(
+    values: NoteValues,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    max_upload_mb: int = DEFAULT_MAX_UPLOAD_MB,
+    max_requests: int | None = None,
+):
+    """
+    Runs a :py:class:`MarginServer` until interrupted.
+
+    Args:
+        values (NoteValues): defaults of the requests and number of jobs
+        host (str):
+        port (int):
+        max_upload_mb (int): largest accepted PDF in MB
+        max_requests (int | None): see :py:class:`MarginServer`
+    """
+
+    server = MarginServer(
+        values,
+        workers=engine.resolve_jobs(values.jobs),
+        max_upload_bytes=max_upload_mb * 2**20,
+        max_requests=max_requests,
+    )
+
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        print("\nStopped serving.")
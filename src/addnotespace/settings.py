@@ -1,5 +1,6 @@
 import os
 import json
+from functools import lru_cache
 
 from pathlib import Path
 from logging import getLogger
@@ -49,9 +50,22 @@ APP_ICON_PATH = UI_FOLDER_PATH / os.environ.get("APP_ICON_NAME", "addnotespace.i
 
 DEFAULT_PATH = BASE_PATH / os.environ.get("DEFAULT_PATH", "defaults.json")
 
+CACHE_DIR_PATH = BASE_PATH / os.environ.get("CACHE_DIR_PATH", "cache")
+
 VERSION = __version__
 
 REPOSITORY_NAME = os.environ.get("REPOSITORY_NAME", "maromei/addnotespace")
 
-with open(STYLE_VARIABLE_PATH, "r") as f:
-    STYLE_VARIABLES = json.load(f)
+
+@lru_cache(maxsize=None)
+def get_style_variables() -> dict[str, str]:
+    """
+    Reads the style variables on first use, so only the GUI pays
+    for loading them.
+
+    Returns:
+        dict[str, str]: the content of :code:`STYLE_VARIABLE_PATH`
+    """
+
+    with open(STYLE_VARIABLE_PATH, "r") as f:
+        return json.load(f)
@@ -0,0 +1,231 @@
+import io
+import os
+import sys
+import shutil
+from pathlib import Path
+from logging import getLogger
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Union
+
+
+logger = getLogger(__name__)
+
+#: Path which stands for stdin or stdout on the command line.
+STDIO_PATH = "-"
+
+#: A PDF to read: a path, the PDF in memory or a binary file-like object.
+PdfSource = Union[str, Path, bytes, bytearray, memoryview, BinaryIO]
+
+#: Where a PDF is written: a path or a binary file-like object.
+PdfTarget = Union[str, Path, BinaryIO]
+
+# Same check as shutil. Outside of linux sendfile can only write to sockets.
+_USE_SENDFILE = hasattr(os, "sendfile") and sys.platform.startswith("linux")
+
+
+def is_path(pdf: PdfSource | PdfTarget) -> bool:
+    """
+    Args:
+        pdf (PdfSource | PdfTarget):
+
+    Returns:
+        bool: Whether :code:`pdf` is a filesystem path.
+    """
+    return isinstance(pdf, (str, Path))
+
+
+def _starts_at_beginning(stream: BinaryIO) -> bool:
+    """
+    PyPDF2 treats the stream positions as offsets in the PDF, so streams
+    can only be used directly if they are seekable and positioned at 0.
+
+    Args:
+        stream (BinaryIO):
+
+    Returns:
+        bool:
+    """
+
+    try:
+        return stream.seekable() and stream.tell() == 0
+    except (AttributeError, OSError):
+        return False
+
+
+@contextmanager
+def open_source(source: PdfSource) -> Iterator[BinaryIO]:
+    """
+    Opens a PDF for reading. Paths are opened and closed again, bytes are
+    wrapped without copying them where possible. Streams which can not be
+    seeked, like pipes, are read into memory first. Streams passed in are
+    not closed.
+
+    Args:
+        source (PdfSource):
+
+    Yields:
+        BinaryIO: a seekable stream containing only the PDF
+    """
+
+    if is_path(source):
+        with open(source, "rb") as f:
+            yield f
+        return
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+        return
+
+    if _starts_at_beginning(source):
+        yield source
+        return
+
+    yield io.BytesIO(source.read())
+
+
+def get_tmp_path(path: str | Path) -> Path:
+    """
+    Args:
+        path (str | Path):
+
+    Returns:
+        Path: A hidden temporary file next to :code:`path`, which is unique
+            for this process.
+    """
+
+    path = Path(path)
+    return path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+
+@contextmanager
+def atomic_path(path: str | Path) -> Iterator[Path]:
+    """
+    Yields a temporary path to write to instead of :code:`path`. Once the
+    context is left without an error, the temporary file replaces
+    :code:`path` atomically. Otherwise it is removed, so :code:`path` is
+    never left half written.
+
+    Args:
+        path (str | Path):
+
+    Yields:
+        Path: the temporary path
+    """
+
+    tmp_path = get_tmp_path(path)
+
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def open_target(target: PdfTarget) -> Iterator[BinaryIO]:
+    """
+    Opens the target of a PDF for writing. Paths are written atomically,
+    see :py:func:`atomic_path`. If the target is a stream which can not be
+    written to directly, the PDF is collected in memory and written to it
+    at once afterwards. Streams passed in are flushed but not closed.
+
+    Args:
+        target (PdfTarget):
+
+    Yields:
+        BinaryIO: a seekable stream positioned at 0
+    """
+
+    if is_path(target):
+        with atomic_path(target) as tmp_path, open(tmp_path, "wb+") as f:
+            yield f
+        return
+
+    if _starts_at_beginning(target):
+        yield target
+        target.flush()
+        return
+
+    buffer = io.BytesIO()
+    yield buffer
+    target.write(buffer.getbuffer())
+    target.flush()
+
+
+def copy_source(source: BinaryIO, target: BinaryIO):
+    """
+    Copies the whole source to the current position of the target. On
+    linux files are copied in the kernel with :code:`os.sendfile`, so the
+    bytes are never read into Python objects and each byte is copied once.
+
+    Args:
+        source (BinaryIO): as returned by :py:func:`open_source`
+        target (BinaryIO): as returned by :py:func:`open_target`
+    """
+
+    source.seek(0)
+
+    try:
+        in_fd = source.fileno()
+        out_fd = target.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        in_fd = out_fd = None
+
+    if not _USE_SENDFILE or in_fd is None:
+        shutil.copyfileobj(source, target)
+        return
+
+    target.flush()
+    size = os.fstat(in_fd).st_size
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(out_fd, in_fd, offset, size - offset)
+        if sent == 0:
+            break
+        offset += sent
+
+    # The file object does not know that the file descriptor moved.
+    target.seek(0, os.SEEK_END)
+
+
+def get_name(pdf: PdfSource | PdfTarget) -> str:
+    """
+    Args:
+        pdf (PdfSource | PdfTarget):
+
+    Returns:
+        str: A name of the PDF for messages, f.e. the path.
+    """
+
+    if is_path(pdf):
+        return str(pdf)
+
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return "<bytes>"
+
+    name = getattr(pdf, "name", None)
+    return str(name) if name is not None else "<stream>"
+
+
+def get_size(pdf: PdfSource) -> int | None:
+    """
+    Args:
+        pdf (PdfSource):
+
+    Returns:
+        int | None: The size in bytes, if it is known without reading
+            the PDF.
+    """
+
+    if is_path(pdf):
+        return Path(pdf).stat().st_size
+
+    if isinstance(pdf, memoryview):
+        return pdf.nbytes
+
+    if isinstance(pdf, (bytes, bytearray)):
+        return len(pdf)
+
+    return None
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from logging import getLogger
+from contextlib import nullcontext
+
+
+logger = getLogger(__name__)
+
+#: Category of all recorded events in the trace viewer.
+TRACE_CATEGORY = "addnotespace"
+
+#: Name of the span covering all work on a single file.
+FILE_SPAN = "file"
+
+#: The recorder of this process. :code:`None` while tracing is disabled.
+_recorder: "TraceRecorder | None" = None
+
+# Returned by span() while tracing is disabled, so disabled spans
+# cost no more than a function call.
+_NO_SPAN = nullcontext()
+
+
+class TraceRecorder:
+    """
+    Collects finished spans as Chrome trace events.
+
+    Timestamps come from :code:`time.perf_counter_ns`, which is a system
+    wide monotonic clock, so events of worker processes line up with the
+    events of the main process.
+    """
+
+    def __init__(self):
+        self.events: list[dict] = []
+        self.pid = os.getpid()
+
+    def add(self, name: str, start_ns: int, end_ns: int, args: dict):
+        """
+        Records a finished span.
+
+        Args:
+            name (str):
+            start_ns (int): start in :code:`time.perf_counter_ns` nanoseconds
+            end_ns (int): end in :code:`time.perf_counter_ns` nanoseconds
+            args (dict): additional information shown in the trace viewer
+        """
+
+        self.events.append(
+            {
+                "name": name,
+                "cat": TRACE_CATEGORY,
+                "ph": "X",
+                "ts": start_ns / 1000,
+                "dur": (end_ns - start_ns) / 1000,
+                "pid": self.pid,
+                "tid": threading.get_native_id(),
+                "args": args,
+            }
+        )
+
+
+class _Span:
+    """
+    Records the time between entering and leaving it.
+    """
+
+    __slots__ = ("recorder", "name", "args", "start_ns")
+
+    def __init__(self, recorder: TraceRecorder, name: str, args: dict):
+        self.recorder = recorder
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.add(self.name, self.start_ns, time.perf_counter_ns(), self.args)
+
+
+def span(name: str, **args) -> _Span | nullcontext:
+    """
+    Times a stage, f.e.::
+
+        with trace.span("write", path=pdf_out_path):
+            writer.write(fo)
+
+    Does nothing while tracing is disabled.
+
+    Args:
+        name (str): name of the stage
+        **args: additional information shown in the trace viewer
+
+    Returns:
+        _Span | nullcontext: the context manager
+    """
+
+    recorder = _recorder
+    if recorder is None:
+        return _NO_SPAN
+    return _Span(recorder, name, args)
+
+
+def is_enabled() -> bool:
+    """
+    Returns:
+        bool: Whether spans are recorded in this process. Forked worker
+            processes inherit the recorder of their parent, which does
+            not count.
+    """
+    return _recorder is not None and _recorder.pid == os.getpid()
+
+
+def enable():
+    """
+    Starts recording spans in this process. Events recorded before
+    are discarded.
+    """
+
+    global _recorder
+    _recorder = TraceRecorder()
+
+
+def disable() -> list[dict]:
+    """
+    Stops recording spans in this process.
+
+    Returns:
+        list[dict]: the events recorded since :py:func:`enable`
+    """
+
+    global _recorder
+
+    if _recorder is None:
+        return []
+
+    events = _recorder.events
+    _recorder = None
+    return events
+
+
+def add_events(events: list[dict]):
+    """
+    Adds events recorded in another process, if tracing is enabled.
+
+    Args:
+        events (list[dict]):
+    """
+
+    if _recorder is not None:
+        _recorder.events.extend(events)
+
+
+def write_chrome_trace(trace_path: str | Path, events: list[dict]):
+    """
+    Writes the events in the Chrome trace event format, which can be
+    opened in :code:`chrome://tracing` or https://ui.perfetto.dev.
+
+    Args:
+        trace_path (str | Path):
+        events (list[dict]):
+    """
+
+    with open(trace_path, "w+") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def format_summary(events: list[dict], n_slowest: int = 5) -> str:
+    """
+    Creates a table with the count, total, mean and max duration of each
+    stage, followed by the slowest files.
+
+    Args:
+        events (list[dict]):
+        n_slowest (int): number of slowest files to list
+
+    Returns:
+        str:
+    """
+
+    stages: dict[str, list[float]] = dict()
+    for event in events:
+        stages.setdefault(event["name"], []).append(event["dur"] / 1000)
+
+    lines = [f"{'stage':24} {'count':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9}"]
+    for name, durations in sorted(stages.items(), key=lambda s: -sum(s[1])):
+        lines.append(
+            f"{name:24} {len(durations):7} {sum(durations):10.1f} "
+            f"{sum(durations) / len(durations):9.2f} {max(durations):9.2f}"
+        )
+
+    files = [event for event in events if event["name"] == FILE_SPAN]
+    files.sort(key=lambda event: -event["dur"])
+
+    if len(files) > 0:
+        lines.append("")
+        lines.append("slowest files:")
+        for event in files[:n_slowest]:
+            path = event["args"].get("path", "")
+            lines.append(f"{event['dur'] / 1000:10.1f} ms  {path}")
+
+    return "\n".join(lines)
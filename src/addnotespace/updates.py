@@ -1,4 +1,3 @@
-import requests
 from logging import getLogger
 from addnotespace import settings
 
@@ -31,6 +30,10 @@ def get_latest_release_version() -> str | None:
             could not be read.
     """
 
+    # Imported here, since it is slow to import and only
+    # needed for the update check.
+    import requests
+
     try:
         response = requests.get(get_latest_api_link())
         response = response.json()
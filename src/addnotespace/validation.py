@@ -0,0 +1,261 @@
+from pathlib import Path
+from logging import getLogger
+
+from addnotespace import engine, modes, streams
+from addnotespace.defaults import NoteValues
+
+
+logger = getLogger(__name__)
+
+
+def validate_and_modify_defaults(defaults: NoteValues) -> bool:
+    """
+    Checks the paths in the default values and sets them to an empty string
+    if the directory does not exist.
+
+    Args:
+        defaults (NoteValues):
+
+    Returns:
+        bool: True if nothing was changed. False otherwise.
+    """
+
+    all_good = True
+
+    if not Path(defaults.single_file_folder).exists():
+        defaults.single_file_folder = ""
+        all_good = False
+
+    if not Path(defaults.single_file_target_folder).exists():
+        defaults.single_file_target_folder = ""
+        all_good = False
+
+    if not Path(defaults.bulk_folder).exists():
+        defaults.bulk_folder = ""
+        all_good = False
+
+    return all_good
+
+
+def validate_margin_values(values: NoteValues) -> str | None:
+    """
+    Checks whether the margin values are integers greater than 0.
+
+    Args:
+        values (NoteValues): Values to check
+
+    Returns:
+        str | None: If :code:`None` no errors where found.
+            Otherwise the error message is returned.
+    """
+
+    def is_correct(val: int) -> bool:
+        return val >= 0 and type(val) is int
+
+    is_good = is_correct(values.margin_top)
+    is_good = is_good and is_correct(values.margin_right)
+    is_good = is_good and is_correct(values.margin_bot)
+    is_good = is_good and is_correct(values.margin_left)
+
+    if is_good:
+        return
+
+    return (
+        "Please check the validity of the margin value. "
+        "They need to be integers greater than 0."
+    )
+
+
+def validate_in_place(values: NoteValues) -> str | None:
+    """
+    Checks whether files are only modified inplace with
+    incremental updates.
+
+    Args:
+        values (NoteValues): Values to check
+
+    Returns:
+        str | None: If :code:`None` no errors where found.
+            Otherwise the error message is returned.
+    """
+
+    if not values.in_place or values.output_mode == modes.OUTPUT_INCREMENTAL:
+        return
+
+    return (
+        "Files can only be modified inplace with the "
+        f"'{modes.OUTPUT_INCREMENTAL}' output mode."
+    )
+
+
+def validate_linearize(values: NoteValues) -> str | None:
+    """
+    Checks whether the outputs can be linearized.
+
+    Args:
+        values (NoteValues): Values to check
+
+    Returns:
+        str | None: If :code:`None` no errors where found.
+            Otherwise the error message is returned.
+    """
+
+    if not values.linearize:
+        return
+
+    if values.in_place:
+        return "Files can not be linearized inplace."
+
+    # imported here, since it loads PyPDF2
+    from addnotespace import linearization
+
+    if not linearization.is_available():
+        return linearization.INSTALL_HINT
+
+
+def clean_and_validate_single_run(values: NoteValues) -> list[str]:
+    """
+    Given a set of :code:`NoteValues` for a single run, the values
+    will be cleaned inplace and potential errors will be returned.
+
+    Args:
+        values (NoteValues): Values to be checked.
+
+    Returns:
+        list[str]: A list of error messages.
+    """
+
+    errors = []
+
+    margin_error = validate_margin_values(values)
+    if margin_error is not None:
+        errors.append(margin_error)
+
+    in_place_error = validate_in_place(values)
+    if in_place_error is not None:
+        errors.append(in_place_error)
+
+    linearize_error = validate_linearize(values)
+    if linearize_error is not None:
+        errors.append(linearize_error)
+
+    file_name = values.single_file_folder
+    new_file_name = values.single_file_target_folder
+
+    if values.in_place and streams.STDIO_PATH in (file_name, new_file_name):
+        errors.append("stdin and stdout can not be modified inplace.")
+
+    # stdin needs no checks
+    if file_name != streams.STDIO_PATH:
+
+        # is curr pdf?
+        if not file_name.endswith(".pdf"):
+            errors.append(f"The selected file '{file_name}' is not a valid PDF file.")
+
+        # does curr exist?
+        if not Path(file_name).exists():
+            errors.append(f"The file '{file_name}' does not exist.")
+
+    # stdout needs no checks
+    if new_file_name == streams.STDIO_PATH:
+        return errors
+
+    # is name pdf?
+    if not new_file_name.endswith(".pdf"):
+        new_file_name += ".pdf"
+        values.single_file_target_folder = new_file_name
+
+    # does new folder exist?
+    if not Path(new_file_name).parent.exists():
+        errors.append("The folder for the new file does not exist.")
+
+    return errors
+
+
+def clean_and_validate_bulk_run(values: NoteValues) -> list[str]:
+    """
+    Given a set of :code:`NoteValues` for a bulk run, the values
+    will be cleaned inplace and potential errors will be returned.
+
+    Args:
+        values (NoteValues): Values to be checked.
+
+    Returns:
+        list[str]: A list of error messages.
+    """
+
+    errors = []
+
+    margin_error = validate_margin_values(values)
+    if margin_error is not None:
+        errors.append(margin_error)
+
+    in_place_error = validate_in_place(values)
+    if in_place_error is not None:
+        errors.append(in_place_error)
+
+    linearize_error = validate_linearize(values)
+    if linearize_error is not None:
+        errors.append(linearize_error)
+
+    folder = values.bulk_folder
+    ending = values.bulk_name_ending
+
+    # does folder exist?
+    if not Path(folder).exists():
+        errors.append(f"The bulk folder '{folder}' does not exist.")
+
+    # is ending not empty?
+    ending = ending.strip()
+    values.bulk_name_ending = ending
+    if ending == "" and not values.in_place:
+        errors.append("The bulk file ending cannot be empty.")
+
+    # is the number of jobs valid?
+    try:
+        engine.resolve_jobs(values.jobs)
+    except ValueError as e:
+        errors.append(str(e))
+
+    # is the number of walk workers valid?
+    if type(values.walk_workers) is not int or values.walk_workers < 1:
+        errors.append(
+            f"The number of walk workers has to be an integer of at least 1, "
+            f"not '{values.walk_workers}'."
+        )
+
+    return errors
+
+
+def clean_and_validate_serve(values: NoteValues) -> list[str]:
+    """
+    Given a set of :code:`NoteValues` used as defaults of the HTTP API,
+    potential errors will be returned.
+
+    Args:
+        values (NoteValues): Values to be checked.
+
+    Returns:
+        list[str]: A list of error messages.
+    """
+
+    errors = []
+
+    margin_error = validate_margin_values(values)
+    if margin_error is not None:
+        errors.append(margin_error)
+
+    if values.in_place:
+        errors.append("Uploaded files can not be modified inplace.")
+
+    linearize_error = validate_linearize(values)
+    if linearize_error is not None:
+        errors.append(linearize_error)
+
+    # is the number of jobs valid?
+    try:
+        engine.resolve_jobs(values.jobs)
+    except ValueError as e:
+        errors.append(str(e))
+
+    return errors
@@ -0,0 +1,396 @@
+import os
+import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+from pathlib import Path
+from logging import getLogger
+from typing import Iterator
+
+from addnotespace import engine, discovery
+from addnotespace.console import JsonlEvents
+from addnotespace.defaults import NoteValues
+from addnotespace.manifest import BulkManifest
+
+
+logger = getLogger(__name__)
+
+# inotify event masks, see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+INOTIFY_READ_SIZE = 64 * 1024
+
+
+class InotifyWaiter:
+    """
+    Waits for files in a directory to be written or moved into it,
+    using inotify via :code:`ctypes`. Only available on linux.
+    """
+
+    def __init__(self, folder: str | Path):
+        """
+        Args:
+            folder (str | Path): the directory to watch
+
+        Raises:
+            OSError: If inotify is not available.
+        """
+
+        libc_name = ctypes.util.find_library("c")
+        if sys.platform != "linux" or libc_name is None:
+            raise OSError("inotify is only available on linux.")
+
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+
+        self.fd = libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init failed")
+
+        # The kernel reports overflows regardless, it is only listed to
+        # make clear that they are handled.
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_Q_OVERFLOW
+        wd = libc.inotify_add_watch(self.fd, str(folder).encode(), mask)
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"Could not watch '{folder}'")
+
+    def wait(self, timeout: float) -> tuple[list[str], bool]:
+        """
+        Waits for events up to :code:`timeout` seconds.
+
+        Args:
+            timeout (float): in seconds
+
+        Returns:
+            tuple[list[str], bool]: The names of the files which had events,
+                and whether the event queue of the kernel overflowed, in
+                which case events were lost.
+        """
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if len(readable) == 0:
+            return [], False
+
+        data = os.read(self.fd, INOTIFY_READ_SIZE)
+
+        names = []
+        overflowed = False
+        offset = 0
+        while offset < len(data):
+            _, mask, _, name_len = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            name = data[offset : offset + name_len].rstrip(b"\0")
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                overflowed = True
+            if len(name) > 0:
+                names.append(os.fsdecode(name))
+
+        return names, overflowed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """
+    Finds new or changed PDF files in a directory.
+
+    Changes are detected with inotify on linux. Otherwise the directory
+    is polled, and only files whose cached stat result changed are looked
+    at again. In both cases a file is only reported once its size and
+    modification time did not change for :code:`settle_seconds`, so files
+    which are still being written are not picked up.
+    """
+
+    def __init__(
+        self,
+        folder: str | Path,
+        settle_seconds: float = 2.0,
+        poll_interval: float = 1.0,
+        use_inotify: bool = True,
+    ):
+        """
+        Args:
+            folder (str | Path): the directory to watch
+            settle_seconds (float): how long a file must not change
+            poll_interval (float): how often to check the directory
+                or the pending files in seconds
+            use_inotify (bool): Whether to try inotify before
+                falling back to polling.
+        """
+
+        self.folder = Path(folder).absolute()
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+
+        #: the stat of each file, the last time it was looked at
+        self.known: dict[str, tuple[int, int]] = dict()
+
+        #: files which changed, mapped to their stat and since when
+        #: that stat did not change
+        self.pending: dict[str, tuple[tuple[int, int], float]] = dict()
+
+        self.inotify: InotifyWaiter | None = None
+        if use_inotify:
+            try:
+                self.inotify = InotifyWaiter(self.folder)
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify not available, polling instead: {e}")
+
+        # Files which existed before the start are candidates as well.
+        self._scan()
+
+    def _scan(self):
+        """
+        Marks all files whose stat differs from the cached one as pending.
+        """
+
+        for entry in os.scandir(self.folder):
+            if entry.is_file():
+                self._check(entry.path)
+
+    def _check(self, path: str):
+        """
+        Marks the file as pending if its stat differs from the cached one.
+        """
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.known.pop(path, None)
+            self.pending.pop(path, None)
+            return
+
+        key = (stat.st_size, stat.st_mtime_ns)
+        if self.known.get(path) == key:
+            return
+
+        self.known[path] = key
+        self.pending[path] = (key, time.monotonic())
+
+    def mark_seen(self, paths: list[str]):
+        """
+        Caches the current stat of the files without marking them as
+        pending, f.e. because this program just wrote them.
+
+        Args:
+            paths (list[str]):
+        """
+
+        for path in paths:
+            self._check(path)
+            self.pending.pop(path, None)
+
+    def mark_pending(self, paths: list[str]):
+        """
+        Marks the files as pending again, f.e. because they were not
+        processed, so they are part of the next batch.
+
+        Args:
+            paths (list[str]):
+        """
+
+        for path in paths:
+            key = self.known.get(path)
+            if key is not None:
+                self.pending[path] = (key, time.monotonic())
+
+    def _collect_ready(self) -> list[str]:
+        """
+        Returns:
+            list[str]: pending files which did not change for
+                :code:`settle_seconds`
+        """
+
+        now = time.monotonic()
+        ready = []
+
+        for path, (key, since) in list(self.pending.items()):
+
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self.pending[path]
+                continue
+
+            new_key = (stat.st_size, stat.st_mtime_ns)
+            if new_key != key:
+                self.known[path] = new_key
+                self.pending[path] = (new_key, now)
+                continue
+
+            if now - since >= self.settle_seconds and stat.st_size > 0:
+                del self.pending[path]
+                ready.append(path)
+
+        return sorted(ready)
+
+    def batches(self) -> Iterator[list[str]]:
+        """
+        Yields lists of files which are ready to be processed.
+        Runs until interrupted.
+
+        Yields:
+            list[str]: absolute file paths
+        """
+
+        try:
+            while True:
+
+                ready = self._collect_ready()
+                if len(ready) > 0:
+                    yield ready
+
+                if self.inotify is None:
+                    time.sleep(self.poll_interval)
+                    self._scan()
+                    continue
+
+                names, overflowed = self.inotify.wait(self.poll_interval)
+                if overflowed:
+                    logger.warning(
+                        f"Missed changes in '{self.folder}', since too many "
+                        "happened at once. Looking at all files again."
+                    )
+                    self._scan()
+                for name in names:
+                    self._check(str(self.folder / name))
+        finally:
+            if self.inotify is not None:
+                self.inotify.close()
+
+
+def select_inputs(
+    batch: list[str], values: NoteValues, manifest: BulkManifest
+) -> tuple[list[str], list[str]]:
+    """
+    Picks the files of a batch which have to be processed. Like in bulk
+    runs, PDFs are recognized by their header, and outputs of this tool,
+    including the ones recorded in the manifest, are skipped, as well as
+    files which are up to date.
+
+    Args:
+        batch (list[str]): as yielded by :py:meth:`FolderWatcher.batches`
+        values (NoteValues): the configuration for processing
+        manifest (BulkManifest): the manifest of the watched folder
+
+    Returns:
+        tuple[list[str], list[str]]: input and output paths
+    """
+
+    # Built per batch, since the manifest and the folder change in between.
+    known_outputs = engine.get_known_outputs(manifest)
+    name_index = discovery.NameIndex()
+
+    in_paths = []
+    out_paths = []
+    for path in batch:
+
+        if not discovery.is_pdf(path):
+            continue
+
+        # Never process our own outputs.
+        if engine.is_bulk_output(path, values, known_outputs, name_index):
+            logger.info(f"Skipped '{path}', which is an output.")
+            continue
+
+        path = Path(path)
+        out_name = engine.get_bulk_out_name(
+            path.name, values.bulk_name_ending, values.in_place
+        )
+        in_paths.append(str(path))
+        out_paths.append(str(path.parent / out_name))
+
+    return engine.filter_up_to_date(in_paths, out_paths, values, manifest)
+
+
+def watch_folder(
+    values: NoteValues, settle_seconds: float = 2.0, events: JsonlEvents | None = None
+):
+    """
+    Processes every PDF which appears in :code:`values.bulk_folder` until
+    interrupted. Outputs of this tool are not processed again, and a
+    manifest is kept in the folder, so restarting does not process
+    finished files again.
+
+    Args:
+        values (NoteValues): the configuration for processing
+        settle_seconds (float): how long a file must not change before
+            it is processed
+        events (JsonlEvents | None): If given, the progress is written as
+            events instead of text.
+    """
+
+    folder = Path(values.bulk_folder).absolute()
+    mods = engine.get_mods(values)
+
+    manifest = BulkManifest.for_folder(folder)
+
+    engine_kwargs = engine.get_engine_kwargs(values)
+    engine_kwargs["manifest"] = manifest
+
+    watcher = FolderWatcher(folder, settle_seconds=settle_seconds)
+
+    print(f"Watching '{folder}'. Press Ctrl+C to stop.")
+
+    try:
+        for batch in watcher.batches():
+
+            in_paths, out_paths = select_inputs(batch, values, manifest)
+
+            if len(in_paths) == 0:
+                continue
+
+            def on_start(i: int):
+                if events is not None:
+                    events.start(i, engine.MarginJob(in_paths[i], out_paths[i], mods))
+
+            finished: list[str] = []
+            failed: list[str] = []
+
+            def on_finish(result: engine.FileResult, n_finished: int):
+                finished.extend((result.in_path, result.out_path))
+                if events is not None:
+                    events.finish(result)
+                    return
+                print(f"Finished: {Path(result.in_path).name}")
+
+            def on_error(i: int, job: engine.MarginJob, e: Exception):
+                failed.append(job.in_path)
+                if events is not None:
+                    events.error(i, job, e)
+                    return
+                print(f"Failed: {Path(job.in_path).name}: {e}")
+
+            try:
+                engine.process_files(
+                    in_paths,
+                    out_paths,
+                    *mods,
+                    on_start=on_start,
+                    on_finish=on_finish,
+                    on_error=on_error,
+                    stop_on_error=False,
+                    **engine_kwargs,
+                )
+            except Exception as e:
+                logger.error(f"Error while processing {in_paths}: {e}")
+
+            # The outputs and inplace modifications appear as changes as
+            # well. Their stat is cached, so they are not picked up again.
+            watcher.mark_seen(finished)
+
+            # Failed files are only retried once they change. Files which
+            # were not processed at all go into the next batch.
+            done = set(finished) | set(failed)
+            watcher.mark_pending([p for p in in_paths if p not in done])
+
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
@@ -192,11 +192,13 @@ class PreviewSketch(QWidget):
         painter.setRenderHint(QPainter.Antialiasing)
         rect = self.rect()
 
-        background_color = QColor(settings.STYLE_VARIABLES["snow-storm-s1"])
-        slide_color = QColor(settings.STYLE_VARIABLES["polar-night-s1"])
+        style_variables = settings.get_style_variables()
 
-        title_color = QColor(settings.STYLE_VARIABLES["aurora-red"])
-        item_color = QColor(settings.STYLE_VARIABLES["snow-storm-s1"])
+        background_color = QColor(style_variables["snow-storm-s1"])
+        slide_color = QColor(style_variables["polar-night-s1"])
+
+        title_color = QColor(style_variables["aurora-red"])
+        item_color = QColor(style_variables["snow-storm-s1"])
 
         rounding = rect.width() * self.rounding_mod
 
@@ -1,4 +1,5 @@
 import sys
+import multiprocessing
 import logging.config
 
 from logger_config import LOGGING_CONFIG
@@ -37,6 +38,9 @@ def run():
 
 if __name__ == "__main__":
 
+    # Needed for the process pool of bulk runs in frozen executables.
+    multiprocessing.freeze_support()
+
     try:
         run()
     except Exception as e:
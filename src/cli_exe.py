@@ -7,7 +7,7 @@ generated. Or without a base, but then a console opens.
 --> Create this standalone exe for cli jobs.
 """
 
-import sys
+import multiprocessing
 import logging.config
 from logging import getLogger
 
@@ -17,9 +17,6 @@ from initilialize import create_log_dir
 create_log_dir()
 logging.config.dictConfig(LOGGING_CONFIG)
 
-from PyQt5.QtWidgets import QApplication
-
-from addnotespace.app_windows import MainWindow
 from addnotespace import cli
 
 
@@ -31,13 +28,14 @@ def run():
     parser = cli.setup_arg_parser()
     args = parser.parse_args()
 
-    app = QApplication(sys.argv)
-    window = MainWindow()
-    cli.run_cli_job(args, window)
+    cli.run_cli_job(args)
 
 
 if __name__ == "__main__":
 
+    # Needed for the process pool of bulk runs in frozen executables.
+    multiprocessing.freeze_support()
+
     try:
         run()
     except Exception as e:
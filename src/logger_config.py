@@ -49,6 +49,26 @@ LOGGERS = {
     "addnotespace.updates": DEFAULT_LOGGER_CONFIG,
     "addnotespace.widgets": DEFAULT_LOGGER_CONFIG,
     "addnotespace.cli": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.pdf": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.incremental": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.dedupe": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.cache": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.manifest": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.watch": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.engine": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.memory": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.validation": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.console": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.discovery": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.trace": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.metrics": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.streams": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.server": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.journal": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.optimize": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.chunked": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.linearization": DEFAULT_LOGGER_CONFIG,
+    "addnotespace.progress": DEFAULT_LOGGER_CONFIG,
 }
 
 
@@ -1,4 +1,5 @@
 import sys
+import multiprocessing
 import logging.config
 from logging import getLogger
 
@@ -8,10 +9,7 @@ from initilialize import create_log_dir
 create_log_dir()
 logging.config.dictConfig(LOGGING_CONFIG)
 
-from PyQt5.QtWidgets import QApplication
-
-from addnotespace.app_windows import MainWindow
-from addnotespace import settings, style_loader, cli
+from addnotespace import cli
 
 
 logger = getLogger(__name__)
@@ -22,6 +20,23 @@ def run():
     parser = cli.setup_arg_parser()
     args = parser.parse_args()
 
+    if cli.should_cli_run(args) and sys.platform != "win32":
+        # Runs without creating any Qt objects.
+        cli.run_cli_job(args)
+        return
+
+    run_gui()
+
+
+def run_gui():
+
+    # Only imported for the GUI, so CLI runs start fast and
+    # do not need a display.
+    from PyQt5.QtWidgets import QApplication
+
+    from addnotespace.app_windows import MainWindow
+    from addnotespace import settings, style_loader
+
     app = QApplication(sys.argv)
 
     if settings.REPLACE_STYLE_VARIABLES:
@@ -34,16 +49,15 @@ def run():
     style_loader.load_styles(app, settings.STYLE_SHEET_PATH)
 
     window = MainWindow()
-
-    if cli.should_cli_run(args) and sys.platform != "win32":
-        cli.run_cli_job(args, window)
-    else:
-        window.show()
-        app.exec_()
+    window.show()
+    app.exec_()
 
 
 if __name__ == "__main__":
 
+    # Needed for the process pool of bulk runs in frozen executables.
+    multiprocessing.freeze_support()
+
     try:
         run()
     except Exception as e:
@@ -0,0 +1,53 @@
+import io
+
+import pytest
+import PyPDF2 as pypdf
+
+#: Content of every page of the generated PDFs, stored uncompressed. It
+#: repeats, so compressing it pays off.
+CONTENT = b"0 0 m 50 50 l S\n" * 20
+
+#: Sizes of the pages of the generated PDFs.
+PAGE_SIZES = [(200, 100), (200, 100), (300, 400)]
+
+
+def create_pdf(rotate_last: bool = False) -> bytes:
+    """
+    Creates a small PDF with :py:data:`PAGE_SIZES` and an uncompressed
+    content stream on each page.
+
+    Args:
+        rotate_last (bool): Whether to rotate the last page, which then has
+            to be merged onto a blank page.
+
+    Returns:
+        bytes: the PDF
+    """
+
+    writer = pypdf.PdfWriter()
+
+    for width, height in PAGE_SIZES:
+        writer.add_blank_page(width, height)
+        # add_blank_page returns a copy, not the page stored in the writer
+        page = writer.pages[-1]
+
+        content = pypdf.generic.DecodedStreamObject()
+        content.set_data(CONTENT)
+        page[pypdf.generic.NameObject("/Contents")] = writer._add_object(content)
+
+    if rotate_last:
+        page[pypdf.generic.NameObject("/Rotate")] = pypdf.generic.NumberObject(90)
+
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+@pytest.fixture
+def pdf_bytes() -> bytes:
+    return create_pdf()
+
+
+@pytest.fixture
+def rotated_pdf_bytes() -> bytes:
+    return create_pdf(rotate_last=True)
@@ -0,0 +1,88 @@
+import pytest
+
+from addnotespace import engine
+from addnotespace.defaults import NoteValues
+from addnotespace.discovery import NameIndex
+
+from tests.conftest import create_pdf
+
+
+@pytest.fixture
+def values(tmp_path) -> NoteValues:
+    return NoteValues(bulk_folder=str(tmp_path), bulk_name_ending="_notes")
+
+
+def create_files(folder, *names):
+    for name in names:
+        (folder / name).write_bytes(create_pdf())
+
+
+@pytest.mark.parametrize(
+    "names, expected",
+    [
+        (["lecture_notes.pdf"], False),
+        (["lecture_notes.pdf", "lecture.pdf"], True),
+        (["lecture_notes.pdf", "lecture"], True),
+        (["lecture_notes.pdf", "lecture.v2.pdf"], True),
+        (["lecture_notes.pdf", "lecture2.pdf"], False),
+        (["lecture_notes.pdf", "lecture_notes.pdf.bak"], False),
+    ],
+)
+def test_source_next_to_output(tmp_path, values, names, expected):
+
+    create_files(tmp_path, *names)
+    path = str(tmp_path / "lecture_notes.pdf")
+
+    assert engine.is_bulk_output(path, values) == expected
+    assert engine.is_bulk_output(path, values, name_index=NameIndex()) == expected
+
+
+def test_output_is_not_its_own_source(tmp_path, values):
+
+    values.bulk_name_ending = ".notes"
+    create_files(tmp_path, "lecture.notes.pdf")
+
+    assert not engine.is_bulk_output(str(tmp_path / "lecture.notes.pdf"), values)
+
+
+def test_known_outputs(tmp_path, values):
+
+    create_files(tmp_path, "handout.pdf")
+    path = str(tmp_path / "handout.pdf")
+
+    assert not engine.is_bulk_output(path, values)
+    assert engine.is_bulk_output(path, values, known_outputs={path})
+
+
+def test_in_place(tmp_path, values):
+
+    values.in_place = True
+    create_files(tmp_path, "lecture.pdf", "lecture_notes.pdf")
+
+    assert not engine.is_bulk_output(str(tmp_path / "lecture_notes.pdf"), values)
+
+
+def test_collect_bulk_files(tmp_path, values):
+
+    create_files(tmp_path, "a.pdf", "a_notes.pdf", "b_notes.pdf")
+
+    in_paths, out_paths = engine.collect_bulk_files(values)
+
+    assert in_paths == [str(tmp_path / "a.pdf"), str(tmp_path / "b_notes.pdf")]
+    assert out_paths == [
+        str(tmp_path / "a_notes.pdf"),
+        str(tmp_path / "b_notes_notes.pdf"),
+    ]
+
+
+def test_name_index_lists_once(tmp_path):
+
+    create_files(tmp_path, "a.pdf", "b.pdf")
+
+    index = NameIndex()
+    assert index.find(tmp_path, "a") == {"a.pdf"}
+
+    # Later lookups in the same directory use the listing from before.
+    create_files(tmp_path, "c.pdf")
+    assert index.find(tmp_path, "c") == set()
+    assert NameIndex().find(tmp_path, "c") == {"c.pdf"}
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from addnotespace import cache, engine
+from addnotespace.cache import ResultCache
+
+from tests.conftest import create_pdf
+
+
+def store_entry(result_cache, tmp_path, key: str, n_bytes: int, mtime: int):
+    out_path = tmp_path / f"{key}.out"
+    out_path.write_bytes(b"x" * n_bytes)
+    result_cache.store(key, out_path)
+    os.utime(result_cache.get_entry_path(key), (mtime, mtime))
+    result_cache.add_stored(n_bytes)
+
+
+def test_evicts_least_recently_used(tmp_path):
+
+    result_cache = ResultCache(tmp_path / "cache", max_bytes=1000)
+
+    for i in range(4):
+        store_entry(result_cache, tmp_path, f"k{i}", 300, mtime=1000 + i)
+
+    # 1200 bytes are above the limit, so the oldest entries are removed
+    # until at most 900 bytes are left.
+    assert result_cache.evictions == 1
+    assert result_cache.total_bytes == 900
+    assert not result_cache.get_entry_path("k0").exists()
+    assert result_cache.get_entry_path("k3").exists()
+    assert result_cache.get_size() == 900
+
+
+def test_lists_only_when_needed(tmp_path, monkeypatch):
+
+    (tmp_path / "cache").mkdir()
+    result_cache = ResultCache(tmp_path / "cache", max_bytes=10_000)
+
+    n_scans = 0
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        nonlocal n_scans
+        n_scans += 1
+        return scandir(path)
+
+    monkeypatch.setattr(cache.os, "scandir", counting_scandir)
+
+    for i in range(20):
+        store_entry(result_cache, tmp_path, f"k{i}", 100, mtime=1000 + i)
+
+    # Only creating the cache measures the directory.
+    assert n_scans == 0
+    assert result_cache.total_bytes == 2000
+    assert result_cache.evictions == 0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_counts_evictions_of_workers(tmp_path, workers):
+
+    pdf_bytes = create_pdf()
+    jobs = []
+    for i in range(6):
+        in_path = tmp_path / f"in{i}.pdf"
+        # Different content, so every file gets its own entry.
+        in_path.write_bytes(pdf_bytes + b"%" * i)
+        jobs.append((str(in_path), str(tmp_path / f"out{i}.pdf"), (0.1, 0, 0, 0)))
+
+    out_size = engine.process_many(jobs[:1])[0].bytes_out
+    result_cache = ResultCache(tmp_path / "cache", max_bytes=3 * out_size)
+
+    results = engine.process_many(jobs, workers=workers, cache=result_cache)
+
+    assert len(results) == 6
+    assert result_cache.misses == 6
+    assert result_cache.evictions > 0
+    assert result_cache.get_size() <= result_cache.max_bytes
+    assert result_cache.total_bytes == result_cache.get_size()
@@ -0,0 +1,116 @@
+import io
+
+import pytest
+import PyPDF2 as pypdf
+
+from addnotespace import pdf, chunked, progress
+from addnotespace.modes import MODE_MERGE, OPTIMIZE_NONE, OPTIMIZE_COMPRESS
+
+from tests.conftest import CONTENT
+from tests.test_output_modes import MODS, read, get_box
+
+
+def create_long_pdf(n_pages: int) -> bytes:
+    """
+    Creates a PDF whose pages all use the same font resource.
+    """
+
+    writer = pypdf.PdfWriter()
+
+    font = pypdf.generic.DictionaryObject()
+    font[pypdf.generic.NameObject("/Type")] = pypdf.generic.NameObject("/Font")
+    font[pypdf.generic.NameObject("/Subtype")] = pypdf.generic.NameObject("/Type1")
+    font[pypdf.generic.NameObject("/BaseFont")] = pypdf.generic.NameObject("/Helvetica")
+    font_ref = writer._add_object(font)
+
+    for _ in range(n_pages):
+        writer.add_blank_page(200, 100)
+        page = writer.pages[-1]
+
+        content = pypdf.generic.DecodedStreamObject()
+        content.set_data(CONTENT)
+        page[pypdf.generic.NameObject("/Contents")] = writer._add_object(content)
+
+        fonts = pypdf.generic.DictionaryObject(
+            {pypdf.generic.NameObject("/F1"): font_ref}
+        )
+        page[pypdf.generic.NameObject("/Resources")] = pypdf.generic.DictionaryObject(
+            {pypdf.generic.NameObject("/Font"): fonts}
+        )
+
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(chunked, "CHUNK_PAGES", 3)
+
+
+@pytest.mark.parametrize("optimize_level", [OPTIMIZE_NONE, OPTIMIZE_COMPRESS])
+@pytest.mark.parametrize("mode", ["auto", MODE_MERGE])
+def test_same_pages(mode, optimize_level):
+
+    source = create_long_pdf(10)
+
+    chunked_out = pdf.add_margin_to_bytes(
+        source, *MODS, mode=mode, optimize_level=optimize_level, low_memory=True
+    )
+    plain_out = pdf.add_margin_to_bytes(
+        source, *MODS, mode=mode, optimize_level=optimize_level
+    )
+
+    chunked_pages = read(chunked_out).pages
+    plain_pages = read(plain_out).pages
+
+    assert len(chunked_pages) == len(plain_pages) == 10
+    for chunked_page, plain_page in zip(chunked_pages, plain_pages):
+        assert get_box(chunked_page) == get_box(plain_page)
+        assert chunked_page.extract_text() == plain_page.extract_text()
+
+    pikepdf = pytest.importorskip("pikepdf")
+    with pikepdf.open(io.BytesIO(chunked_out)) as checked:
+        assert checked.check_pdf_syntax() == []
+
+
+def test_shared_objects_written_once():
+
+    out = pdf.add_margin_to_bytes(create_long_pdf(10), *MODS, low_memory=True)
+    reader = read(out)
+
+    fonts = {page["/Resources"]["/Font"].raw_get("/F1").idnum for page in reader.pages}
+    assert len(fonts) == 1
+    assert out.count(b"/Helvetica") == 1
+
+
+def test_cancel_truncates_stream():
+    def on_page(n_done: int, n_pages: int):
+        if n_done == 7:
+            raise progress.Cancelled()
+
+    out = io.BytesIO()
+    with pytest.raises(progress.Cancelled):
+        pdf.add_margin(
+            create_long_pdf(10), out, *MODS, low_memory=True, on_page=on_page
+        )
+
+    assert out.getvalue() == b""
+
+
+def test_cancel_keeps_path(tmp_path):
+
+    path = tmp_path / "out.pdf"
+    path.write_bytes(b"previous")
+
+    def on_page(n_done: int, n_pages: int):
+        if n_done == 7:
+            raise progress.Cancelled()
+
+    with pytest.raises(progress.Cancelled):
+        pdf.add_margin(
+            create_long_pdf(10), path, *MODS, low_memory=True, on_page=on_page
+        )
+
+    assert path.read_bytes() == b"previous"
+    assert list(tmp_path.iterdir()) == [path]
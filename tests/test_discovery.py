@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from addnotespace.discovery import PdfFinder
+
+from tests.conftest import create_pdf
+
+
+@pytest.fixture
+def looped_tree(tmp_path):
+    """
+    :code:`root/slides.pdf` and :code:`root/a/notes.pdf`, with a symlink
+    :code:`root/a/up` pointing back to :code:`root`.
+    """
+
+    (tmp_path / "a").mkdir()
+    (tmp_path / "slides.pdf").write_bytes(create_pdf())
+    (tmp_path / "a" / "notes.pdf").write_bytes(create_pdf())
+
+    try:
+        os.symlink("..", tmp_path / "a" / "up", target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip("Symlinks can not be created here.")
+
+    return tmp_path
+
+
+@pytest.mark.parametrize("walk_workers", [1, 4])
+def test_symlink_loop(looped_tree, walk_workers):
+
+    found = list(PdfFinder(looped_tree, recursive=True, walk_workers=walk_workers))
+
+    assert sorted(found) == [
+        str(looped_tree / "a" / "notes.pdf"),
+        str(looped_tree / "slides.pdf"),
+    ]
+
+
+def test_detects_by_header(tmp_path):
+
+    (tmp_path / "slides").write_bytes(create_pdf())
+    (tmp_path / "fake.pdf").write_bytes(b"not a pdf")
+
+    assert list(PdfFinder(tmp_path)) == [str(tmp_path / "slides")]
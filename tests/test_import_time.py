@@ -0,0 +1,113 @@
+"""
+Checks that importing the CLI and the library entry points stays fast, and
+that they do not load modules which are only needed by the GUI.
+
+Each import is measured in a fresh interpreter with :code:`-X importtime`.
+The absolute time depends on the machine and its load, so the budget only
+covers what our own modules add on top of the dependencies they can not
+avoid. Those are measured in the same way right before, and the best of
+several runs of both is compared.
+"""
+
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+import pytest
+
+SRC_PATH = Path(__file__).absolute().parent.parent / "src"
+
+#: Standard library modules and dependencies which every entry point needs.
+BASELINE = ("json", "logging", "pathlib", "dataclasses", "multiprocessing", "dotenv")
+
+#: Modules to check, mapped to the modules they may import in addition to
+#: :py:data:`BASELINE` and the modules they must not import.
+CHECKED_MODULES = {
+    "addnotespace.cli": ((), ("PyQt5", "requests", "PyPDF2")),
+    "addnotespace.engine": ((), ("PyQt5", "requests", "PyPDF2")),
+    "addnotespace.pdf": (("PyPDF2",), ("PyQt5", "requests")),
+}
+
+#: Milliseconds our own modules may add to the import of their dependencies.
+OWN_BUDGET_MS = 60
+
+#: Measurements per module. The fastest one is used.
+RUNS = 7
+
+
+def measure_import(modules: tuple[str, ...]) -> tuple[float, set[str]]:
+    """
+    Imports the :code:`modules` in a new interpreter.
+
+    Args:
+        modules (tuple[str, ...]):
+
+    Returns:
+        tuple[float, set[str]]: The summed cumulative import time of the
+            modules in milliseconds and the names of all imported modules.
+    """
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (str(SRC_PATH), env.get("PYTHONPATH")) if p
+    )
+
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    cumulative_us = 0
+    imported = set()
+
+    for line in process.stderr.splitlines():
+
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line[len("import time:") :].split("|")
+        imported.add(name.strip())
+
+        # Only the top level entries of the modules themselves.
+        if name.startswith(" ") and name[1:].rstrip() in modules:
+            cumulative_us += int(cumulative)
+
+    return cumulative_us / 1000, imported
+
+
+@pytest.mark.parametrize("module", CHECKED_MODULES.keys())
+def test_forbidden_imports(module):
+
+    _, forbidden = CHECKED_MODULES[module]
+    _, imported = measure_import((module,))
+
+    loaded = sorted(
+        name
+        for name in forbidden
+        if any(imp == name or imp.startswith(f"{name}.") for imp in imported)
+    )
+    assert loaded == []
+
+
+@pytest.mark.parametrize("module", CHECKED_MODULES.keys())
+def test_import_time(module):
+
+    dependencies, _ = CHECKED_MODULES[module]
+    baseline = BASELINE + dependencies
+
+    # Interleaved, so a slow phase of the machine hits both.
+    module_ms = []
+    baseline_ms = []
+    for _ in range(RUNS):
+        module_ms.append(measure_import((module,))[0])
+        baseline_ms.append(measure_import(baseline)[0])
+
+    own_ms = min(module_ms) - min(baseline_ms)
+    assert own_ms <= OWN_BUDGET_MS, (
+        f"Importing {module} takes {min(module_ms):.1f} ms, "
+        f"{own_ms:.1f} ms more than its dependencies."
+    )
@@ -0,0 +1,109 @@
+import io
+
+import pytest
+import PyPDF2 as pypdf
+
+from addnotespace import pdf, incremental
+from addnotespace.modes import OPTIMIZE_MAX, OUTPUT_INCREMENTAL
+
+from tests.conftest import PAGE_SIZES
+from tests.test_output_modes import MODS, read, get_box, expanded_box
+
+
+def add_update(data: bytes) -> bytes:
+    return pdf.add_margin_to_bytes(data, *MODS, output_mode=OUTPUT_INCREMENTAL)
+
+
+def test_appends_to_original(pdf_bytes):
+
+    out = add_update(pdf_bytes)
+    reader = read(out)
+
+    assert out.startswith(pdf_bytes)
+    assert reader.trailer["/Prev"] == incremental.find_startxref(io.BytesIO(pdf_bytes))
+    assert len(reader.pages) == len(PAGE_SIZES)
+
+    # The original still describes the pages as they were.
+    for page, (width, height) in zip(read(pdf_bytes).pages, PAGE_SIZES):
+        assert get_box(page) == [0, 0, width, height]
+
+
+def test_appends_to_xref_stream(pdf_bytes):
+
+    # Files with object streams have a cross reference stream, which the
+    # update has to point to.
+    optimized = pdf.add_margin_to_bytes(
+        pdf_bytes, 0, 0, 0, 0, optimize_level=OPTIMIZE_MAX
+    )
+
+    out = add_update(optimized)
+    reader = read(out)
+
+    assert out.startswith(optimized)
+    assert len(reader.pages) == len(PAGE_SIZES)
+    for page, (width, height) in zip(reader.pages, PAGE_SIZES):
+        assert get_box(page) == pytest.approx(expanded_box(width, height))
+
+    pikepdf = pytest.importorskip("pikepdf")
+    with pikepdf.open(io.BytesIO(out)) as checked:
+        assert checked.check_pdf_syntax() == []
+
+
+def test_appends_twice(pdf_bytes):
+
+    once = add_update(pdf_bytes)
+    twice = add_update(once)
+    reader = read(twice)
+
+    assert twice.startswith(once)
+    assert len(reader.pages) == len(PAGE_SIZES)
+
+    top, right, bot, left = MODS
+    for page, (width, height) in zip(reader.pages, PAGE_SIZES):
+        # The margins of the second run are relative to the grown pages.
+        new_width = width * (1 + right + left)
+        new_height = height * (1 + top + bot)
+        assert float(page.mediabox.width) == pytest.approx(
+            new_width * (1 + right + left)
+        )
+        assert float(page.mediabox.height) == pytest.approx(
+            new_height * (1 + top + bot)
+        )
+
+
+def test_in_place(tmp_path, pdf_bytes):
+
+    path = tmp_path / "slides.pdf"
+    path.write_bytes(pdf_bytes)
+
+    n_pages = pdf.add_margin(path, path, *MODS, output_mode=OUTPUT_INCREMENTAL)
+
+    out = path.read_bytes()
+    reader = read(out)
+
+    assert n_pages == len(PAGE_SIZES)
+    assert out.startswith(pdf_bytes)
+    assert len(reader.pages) == len(PAGE_SIZES)
+    for page, (width, height) in zip(reader.pages, PAGE_SIZES):
+        assert get_box(page) == pytest.approx(expanded_box(width, height))
+
+
+def test_in_place_needs_update(tmp_path, rotated_pdf_bytes):
+
+    path = tmp_path / "slides.pdf"
+    path.write_bytes(rotated_pdf_bytes)
+
+    with pytest.raises(ValueError):
+        pdf.add_margin(path, path, *MODS, output_mode=OUTPUT_INCREMENTAL)
+
+    assert path.read_bytes() == rotated_pdf_bytes
+
+
+def test_rejects_new_pages(pdf_bytes):
+
+    source = io.BytesIO(pdf_bytes)
+    reader = pypdf.PdfReader(source)
+    page = pypdf.PageObject.create_blank_page(width=100, height=100)
+
+    with pytest.raises(ValueError):
+        incremental.write_incremental_update(reader, [page], source, io.BytesIO())
@@ -0,0 +1,167 @@
+import os
+
+import pytest
+
+from addnotespace.journal import BulkJournal
+
+from tests.conftest import create_pdf
+
+SETTINGS = BulkJournal.create_settings((0.1, 0, 0, 0), None)
+
+#: What a killed process had appended to an input which it modified inplace.
+PARTIAL_UPDATE = b"\n1 0 obj\n<< /Type /Page"
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return tmp_path / "journal.sqlite"
+
+
+def start_killed_run(journal_path, in_path, out_path):
+    """
+    Records the start of :code:`in_path` in a journal, which is closed
+    again without finishing it, like the journal of a killed run.
+    """
+
+    journal = BulkJournal(journal_path)
+    journal.record_start(in_path, out_path, SETTINGS)
+    journal.close()
+
+
+def test_truncates_killed_append(tmp_path, journal_path):
+
+    path = tmp_path / "slides.pdf"
+    original = create_pdf()
+    path.write_bytes(original)
+
+    start_killed_run(journal_path, path, path)
+    with open(path, "ab") as f:
+        f.write(PARTIAL_UPDATE)
+
+    journal = BulkJournal(journal_path, resume=True)
+    journal.record_start(path, path, SETTINGS)
+
+    assert path.read_bytes() == original
+
+
+def test_keeps_replaced_input(tmp_path, journal_path):
+
+    path = tmp_path / "slides.pdf"
+    original = create_pdf()
+    path.write_bytes(original)
+
+    start_killed_run(journal_path, path, path)
+    replaced = create_pdf(rotate_last=True) + PARTIAL_UPDATE
+    path.write_bytes(replaced)
+    assert len(replaced) > len(original)
+
+    journal = BulkJournal(journal_path, resume=True)
+    journal.record_start(path, path, SETTINGS)
+
+    assert path.read_bytes() == replaced
+
+
+def test_keeps_older_input(tmp_path, journal_path):
+
+    path = tmp_path / "slides.pdf"
+    path.write_bytes(create_pdf())
+
+    start_killed_run(journal_path, path, path)
+    with open(path, "ab") as f:
+        f.write(PARTIAL_UPDATE)
+    appended = path.read_bytes()
+
+    # An older copy, f.e. restored from a backup, which starts the same.
+    mtime_ns = path.stat().st_mtime_ns - 10**10
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    journal = BulkJournal(journal_path, resume=True)
+    journal.record_start(path, path, SETTINGS)
+
+    assert path.read_bytes() == appended
+
+
+def test_removes_partial_outputs(tmp_path, journal_path):
+
+    in_path = tmp_path / "slides.pdf"
+    out_path = tmp_path / "slides_notes.pdf"
+    in_path.write_bytes(create_pdf())
+
+    start_killed_run(journal_path, in_path, out_path)
+    leftover = tmp_path / ".slides_notes.pdf.a1b2.tmp"
+    leftover.write_bytes(b"%PDF-1.3\n")
+    # Belongs to another output, which may still be written.
+    other = tmp_path / ".other_notes.pdf.c3d4.tmp"
+    other.write_bytes(b"%PDF-1.3\n")
+
+    journal = BulkJournal(journal_path, resume=True)
+    journal.record_start(in_path, out_path, SETTINGS)
+
+    assert not leftover.exists()
+    assert other.exists()
+
+
+@pytest.fixture
+def finished_journal(tmp_path, journal_path) -> BulkJournal:
+    """
+    A journal in which :code:`slides.pdf` was processed to
+    :code:`slides_notes.pdf` with :py:data:`SETTINGS`.
+    """
+
+    in_path = tmp_path / "slides.pdf"
+    out_path = tmp_path / "slides_notes.pdf"
+    in_path.write_bytes(create_pdf())
+
+    journal = BulkJournal(journal_path)
+    journal.record_start(in_path, out_path, SETTINGS)
+    out_path.write_bytes(create_pdf())
+    journal.record_done(in_path)
+
+    return journal
+
+
+def test_is_finished(tmp_path, finished_journal):
+
+    in_path = tmp_path / "slides.pdf"
+    out_path = tmp_path / "slides_notes.pdf"
+
+    assert finished_journal.is_finished(in_path, out_path, SETTINGS)
+
+    other_settings = BulkJournal.create_settings((0.2, 0, 0, 0), None)
+    assert not finished_journal.is_finished(in_path, out_path, other_settings)
+
+    other_out_path = tmp_path / "slides_other.pdf"
+    other_out_path.write_bytes(create_pdf())
+    assert not finished_journal.is_finished(in_path, other_out_path, SETTINGS)
+
+
+def test_not_finished_after_input_changed(tmp_path, finished_journal):
+
+    in_path = tmp_path / "slides.pdf"
+    in_path.write_bytes(create_pdf(rotate_last=True) + b"\n")
+
+    assert not finished_journal.is_finished(
+        in_path, tmp_path / "slides_notes.pdf", SETTINGS
+    )
+
+
+def test_not_finished_without_output(tmp_path, finished_journal):
+
+    out_path = tmp_path / "slides_notes.pdf"
+    os.remove(out_path)
+
+    assert not finished_journal.is_finished(tmp_path / "slides.pdf", out_path, SETTINGS)
+
+
+def test_not_finished_after_failure(tmp_path, journal_path):
+
+    in_path = tmp_path / "slides.pdf"
+    out_path = tmp_path / "slides_notes.pdf"
+    in_path.write_bytes(create_pdf())
+    out_path.write_bytes(create_pdf())
+
+    journal = BulkJournal(journal_path)
+    journal.record_start(in_path, out_path, SETTINGS)
+    journal.record_failed(in_path, ValueError("broken"))
+
+    assert not journal.is_finished(in_path, out_path, SETTINGS)
@@ -0,0 +1,76 @@
+import pytest
+
+from addnotespace import engine, manifest
+from addnotespace.cache import hash_file
+from addnotespace.manifest import BulkManifest
+from addnotespace.modes import OUTPUT_INCREMENTAL
+
+from tests.conftest import create_pdf
+
+
+@pytest.fixture
+def counted_hashes(monkeypatch) -> list[str]:
+    """
+    Paths hashed by the manifest in this process.
+    """
+
+    hashed = []
+
+    def counting_hash_file(path):
+        hashed.append(str(path))
+        return hash_file(path)
+
+    monkeypatch.setattr(manifest, "hash_file", counting_hash_file)
+    return hashed
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_record_uses_hash_of_worker(tmp_path, counted_hashes, workers):
+
+    jobs = []
+    for i in range(3):
+        in_path = tmp_path / f"in{i}.pdf"
+        in_path.write_bytes(create_pdf())
+        jobs.append((str(in_path), str(tmp_path / f"out{i}.pdf"), (0.1, 0, 0, 0)))
+
+    bulk_manifest = BulkManifest.for_folder(tmp_path)
+    results = engine.process_many(jobs, workers=workers, manifest=bulk_manifest)
+
+    assert counted_hashes == []
+    for result in results:
+        assert result.input_hash == hash_file(result.in_path)
+
+    settings = BulkManifest.create_settings((0.1, 0, 0, 0), None)
+    for in_path, out_path, _ in jobs:
+        assert bulk_manifest.is_up_to_date(in_path, out_path, settings)
+
+
+def test_in_place_records_new_content(tmp_path, counted_hashes):
+
+    in_path = tmp_path / "lecture.pdf"
+    in_path.write_bytes(create_pdf())
+    old_hash = hash_file(in_path)
+
+    bulk_manifest = BulkManifest.for_folder(tmp_path)
+    job = (str(in_path), str(in_path), (0.1, 0, 0, 0))
+    (result,) = engine.process_many(
+        [job],
+        add_margin_kwargs={"output_mode": OUTPUT_INCREMENTAL},
+        manifest=bulk_manifest,
+    )
+
+    assert counted_hashes == []
+    assert result.input_hash == hash_file(in_path) != old_hash
+    assert bulk_manifest.entries[str(in_path)]["hash"] == result.input_hash
+
+
+def test_record_hashes_without_given_hash(tmp_path, counted_hashes):
+
+    in_path = tmp_path / "lecture.pdf"
+    in_path.write_bytes(create_pdf())
+
+    bulk_manifest = BulkManifest.for_folder(tmp_path)
+    bulk_manifest.record(in_path, tmp_path / "lecture_notes.pdf", {})
+
+    assert counted_hashes == [str(in_path)]
+    assert bulk_manifest.entries[str(in_path)]["hash"] == hash_file(in_path)
@@ -0,0 +1,127 @@
+import io
+
+import pytest
+import PyPDF2 as pypdf
+
+from addnotespace import pdf
+from addnotespace.modes import (
+    MODE_MERGE,
+    OPTIMIZE_MAX,
+    OUTPUT_MODES,
+    OPTIMIZE_NONE,
+    OPTIMIZE_LEVELS,
+    OPTIMIZE_COMPRESS,
+    OUTPUT_INCREMENTAL,
+)
+
+from tests.conftest import CONTENT, PAGE_SIZES
+
+#: top, right, bot and left margin fractions used by all tests
+MODS = (0.1, 0.5, 0.2, 0.25)
+
+
+def expanded_box(width: float, height: float) -> list[float]:
+    top, right, bot, left = MODS
+    return [-width * left, -height * bot, width * (1 + right), height * (1 + top)]
+
+
+def merged_box(width: float, height: float) -> list[float]:
+    top, right, bot, left = MODS
+    return [0, 0, width * (1 + right + left), height * (1 + top + bot)]
+
+
+def read(data: bytes) -> pypdf.PdfReader:
+    return pypdf.PdfReader(io.BytesIO(data), strict=True)
+
+
+def get_box(page: pypdf.PageObject) -> list[float]:
+    return [float(v) for v in page.mediabox]
+
+
+@pytest.mark.parametrize("optimize_level", OPTIMIZE_LEVELS)
+@pytest.mark.parametrize("output_mode", OUTPUT_MODES)
+def test_expanded_pages(pdf_bytes, output_mode, optimize_level):
+
+    out = pdf.add_margin_to_bytes(
+        pdf_bytes, *MODS, output_mode=output_mode, optimize_level=optimize_level
+    )
+    reader = read(out)
+
+    assert len(reader.pages) == len(PAGE_SIZES)
+    for page, (width, height) in zip(reader.pages, PAGE_SIZES):
+        assert get_box(page) == pytest.approx(expanded_box(width, height))
+        assert page.get_contents().get_data() == CONTENT
+
+    # Incremental updates are never optimized.
+    assert out.startswith(pdf_bytes) == (output_mode == OUTPUT_INCREMENTAL)
+
+
+@pytest.mark.parametrize("optimize_level", OPTIMIZE_LEVELS)
+@pytest.mark.parametrize("output_mode", OUTPUT_MODES)
+def test_merged_pages(rotated_pdf_bytes, output_mode, optimize_level):
+
+    out = pdf.add_margin_to_bytes(
+        rotated_pdf_bytes,
+        *MODS,
+        output_mode=output_mode,
+        optimize_level=optimize_level,
+    )
+    reader = read(out)
+
+    assert len(reader.pages) == len(PAGE_SIZES)
+    for page, (width, height) in zip(reader.pages[:-1], PAGE_SIZES):
+        assert get_box(page) == pytest.approx(expanded_box(width, height))
+
+    # The rotated page was merged, so the whole file has to be rewritten.
+    assert get_box(reader.pages[-1]) == pytest.approx(merged_box(*PAGE_SIZES[-1]))
+    assert not out.startswith(rotated_pdf_bytes)
+
+
+@pytest.mark.parametrize("optimize_level", OPTIMIZE_LEVELS)
+def test_merge_mode(pdf_bytes, optimize_level):
+
+    out = pdf.add_margin_to_bytes(
+        pdf_bytes, *MODS, mode=MODE_MERGE, optimize_level=optimize_level
+    )
+    reader = read(out)
+
+    assert len(reader.pages) == len(PAGE_SIZES)
+    for page, (width, height) in zip(reader.pages, PAGE_SIZES):
+        assert get_box(page) == pytest.approx(merged_box(width, height))
+
+
+def test_optimize_levels(pdf_bytes):
+
+    outputs = {
+        level: pdf.add_margin_to_bytes(pdf_bytes, *MODS, optimize_level=level)
+        for level in OPTIMIZE_LEVELS
+    }
+
+    assert CONTENT in outputs[OPTIMIZE_NONE]
+    assert CONTENT not in outputs[OPTIMIZE_COMPRESS]
+    assert b"/ObjStm" not in outputs[OPTIMIZE_COMPRESS]
+
+    # Object streams need PDF 1.5 and a cross reference stream.
+    assert outputs[OPTIMIZE_MAX].startswith(b"%PDF-1.5")
+    assert b"/ObjStm" in outputs[OPTIMIZE_MAX]
+    assert b"/XRef" in outputs[OPTIMIZE_MAX]
+
+    assert len(outputs[OPTIMIZE_MAX]) < len(outputs[OPTIMIZE_NONE])
+
+
+@pytest.mark.parametrize("optimize_level", OPTIMIZE_LEVELS)
+@pytest.mark.parametrize("output_mode", OUTPUT_MODES)
+def test_qpdf_check(rotated_pdf_bytes, output_mode, optimize_level):
+
+    pikepdf = pytest.importorskip("pikepdf")
+
+    out = pdf.add_margin_to_bytes(
+        rotated_pdf_bytes,
+        *MODS,
+        output_mode=output_mode,
+        optimize_level=optimize_level,
+    )
+
+    with pikepdf.open(io.BytesIO(out)) as checked:
+        assert checked.check_pdf_syntax() == []
+        assert len(checked.pages) == len(PAGE_SIZES)
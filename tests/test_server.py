@@ -0,0 +1,107 @@
+import os
+import time
+import asyncio
+
+import pytest
+
+from addnotespace import server
+from addnotespace.defaults import NoteValues
+from addnotespace.server import HttpError, MarginServer, Request
+
+from tests.conftest import create_pdf
+
+
+def crash_worker(*args):
+    """
+    Kills the worker process, like running out of memory would.
+    """
+    os._exit(1)
+
+
+class BufferWriter:
+    """
+    Collects what is written in place of a :code:`asyncio.StreamWriter`.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+
+async def post_margin(margin_server: MarginServer, pdf_bytes: bytes) -> bytes:
+    """
+    Sends :code:`pdf_bytes` to :code:`POST /margin`.
+
+    Returns:
+        bytes: the response
+    """
+
+    request = Request(
+        "POST", "/margin", {}, {"content-length": str(len(pdf_bytes))}, "HTTP/1.1"
+    )
+    reader = asyncio.StreamReader()
+    reader.feed_data(pdf_bytes)
+    writer = BufferWriter()
+
+    await margin_server.handle_margin(request, reader, writer)
+    return bytes(writer.data)
+
+
+@pytest.fixture
+def margin_server():
+    margin_server = MarginServer(NoteValues())
+    margin_server.executor = margin_server.create_executor()
+    yield margin_server
+    margin_server.executor.shutdown(cancel_futures=True)
+
+
+def test_replaces_broken_pool(margin_server, monkeypatch):
+
+    pdf_bytes = create_pdf()
+    broken = margin_server.executor
+
+    with monkeypatch.context() as patch:
+        patch.setattr(server, "add_margin_worker", crash_worker)
+        with pytest.raises(HttpError) as error:
+            asyncio.run(post_margin(margin_server, pdf_bytes))
+
+    assert error.value.status == 503
+    assert margin_server.executor is not broken
+    assert margin_server.active == 0
+
+    health = margin_server.get_health()
+    assert health["status"] == "ok"
+    assert health["pool_restarts"] == 1
+
+    # The next request is processed by the new pool.
+    response = asyncio.run(post_margin(margin_server, pdf_bytes))
+    assert response.startswith(b"HTTP/1.1 200 OK")
+
+
+def test_health_reports_idle_broken_pool(margin_server):
+
+    # Start the worker and kill it while no request is processed.
+    margin_server.executor.submit(int).result()
+    for process in margin_server.executor._processes.values():
+        process.kill()
+        process.join()
+
+    # The pool notices the dead process in a background thread.
+    for _ in range(100):
+        if margin_server.is_pool_broken():
+            break
+        time.sleep(0.05)
+
+    health = margin_server.get_health()
+    assert health["status"] == "degraded"
+    assert health["pool_broken"]
+
+    # Requests do not fail because of it, but get a new pool.
+    response = asyncio.run(post_margin(margin_server, create_pdf()))
+    assert response.startswith(b"HTTP/1.1 200 OK")
+    assert margin_server.get_health()["pool_restarts"] == 1
@@ -0,0 +1,108 @@
+import os
+import sys
+import contextlib
+
+import pytest
+
+from addnotespace import watch
+from addnotespace.defaults import NoteValues
+from addnotespace.manifest import BulkManifest
+from addnotespace.watch import FolderWatcher, InotifyWaiter
+
+from tests.conftest import create_pdf
+
+
+def create_event(mask: int, name: bytes = b"") -> bytes:
+    padded = name + b"\0" * (-len(name) % 16) if name else b""
+    return watch.INOTIFY_EVENT_HEADER.pack(1, mask, 0, len(padded)) + padded
+
+
+@pytest.fixture
+def piped_waiter():
+    """
+    A waiter which reads its events from a pipe instead of inotify.
+    """
+
+    read_fd, write_fd = os.pipe()
+    waiter = InotifyWaiter.__new__(InotifyWaiter)
+    waiter.fd = read_fd
+    yield waiter, write_fd
+    # FolderWatcher.batches closes the waiter itself.
+    with contextlib.suppress(OSError):
+        os.close(read_fd)
+    os.close(write_fd)
+
+
+def test_wait_names(piped_waiter):
+
+    waiter, write_fd = piped_waiter
+    os.write(
+        write_fd,
+        create_event(watch.IN_CLOSE_WRITE, b"a.pdf")
+        + create_event(watch.IN_MOVED_TO, b"b.pdf"),
+    )
+
+    assert waiter.wait(1) == (["a.pdf", "b.pdf"], False)
+    assert waiter.wait(0) == ([], False)
+
+
+def test_wait_overflow(piped_waiter):
+
+    waiter, write_fd = piped_waiter
+    os.write(write_fd, create_event(watch.IN_Q_OVERFLOW))
+
+    assert waiter.wait(1) == ([], True)
+
+
+def test_rescan_after_overflow(tmp_path, piped_waiter):
+
+    waiter, write_fd = piped_waiter
+
+    watcher = FolderWatcher(tmp_path, settle_seconds=0, use_inotify=False)
+    watcher.inotify = waiter
+
+    # Created while the events were lost.
+    (tmp_path / "lost.pdf").write_bytes(create_pdf())
+    os.write(write_fd, create_event(watch.IN_Q_OVERFLOW))
+
+    batches = watcher.batches()
+    assert next(batches) == [str(tmp_path / "lost.pdf")]
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="inotify is only on linux")
+def test_inotify(tmp_path):
+
+    waiter = InotifyWaiter(tmp_path)
+    try:
+        (tmp_path / "a.pdf").write_bytes(b"%PDF-")
+        names, overflowed = waiter.wait(1)
+    finally:
+        waiter.close()
+
+    assert "a.pdf" in names
+    assert not overflowed
+
+
+def test_select_inputs(tmp_path):
+
+    values = NoteValues(bulk_folder=str(tmp_path), bulk_name_ending="_notes")
+    manifest = BulkManifest.for_folder(tmp_path)
+
+    for name in ("slides", "lecture.pdf", "lecture_notes.pdf", "old.pdf"):
+        (tmp_path / name).write_bytes(create_pdf())
+    (tmp_path / "fake.pdf").write_bytes(b"not a pdf")
+    # Recorded by an earlier run, whose source was removed since.
+    (tmp_path / "handout.pdf").write_bytes(create_pdf())
+    manifest.record(str(tmp_path / "old.pdf"), str(tmp_path / "handout.pdf"), "")
+
+    batch = sorted(str(p) for p in tmp_path.iterdir() if p.suffix != ".json")
+    os.remove(tmp_path / "old.pdf")
+    batch.remove(str(tmp_path / "old.pdf"))
+
+    in_paths, out_paths = watch.select_inputs(batch, values, manifest)
+
+    assert in_paths == [str(tmp_path / "lecture.pdf"), str(tmp_path / "slides")]
+    assert out_paths == [
+        str(tmp_path / "lecture_notes.pdf"),
+        str(tmp_path / "slides_notes.pdf"),
+    ]